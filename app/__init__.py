@@ -1,13 +1,21 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 from flask import Flask
 from pathlib import Path
+import os
 
 
-def create_app() -> Flask:
+def create_app(start_background: bool = True) -> Flask:
+	create_started = time.perf_counter()
 	app = Flask(__name__)
+	# Multipart file parts stream to disk, so the limit no longer bounds memory
+	from .services.uploads import StreamingRequest
+	app.request_class = StreamingRequest
 	app.config['SECRET_KEY'] = 'dev-secret-key'
 	app.config['UPLOAD_FOLDER'] = str(Path('data/uploads').resolve())
 	app.config['PROCESSED_FOLDER'] = str(Path('data/processed').resolve())
-	app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024
+	app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', '32')) * 1024 * 1024
 
 	from .routes import bp as main_bp
 	app.register_blueprint(main_bp)
@@ -20,6 +28,19 @@ def create_app() -> Flask:
 	def health():
 		return {'status': 'healthy'}, 200
 
+	from .services.metrics import init_app as init_metrics
+	init_metrics(app)
+	from .services.profiler import init_app as init_profiler
+	init_profiler(app)
+
+	from .services.lazy import record_app_ready
+	from .services.gcp_services import maybe_start_warmup
+	record_app_ready(_IMPORT_STARTED, create_started)
+	if start_background:
+		maybe_start_warmup()
+		from .routes import lifecycle
+		lifecycle.maybe_start_sweeper()
+
 	return app
 
 
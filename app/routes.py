@@ -1,22 +1,38 @@
-from flask import Blueprint, render_template, request, redirect, url_for, send_file, jsonify
+from flask import Blueprint, Response, abort, render_template, request, redirect, url_for, send_file, jsonify
 from werkzeug.utils import secure_filename
 from pathlib import Path
+import json
+import time
 import uuid
 import os
 
-from .services.ocr import extract_text_from_file
+from .services.ocr import ocr_file
+from .services.extraction import OCR_CLOUD_TIMEOUT, HedgedExtractor
 from .services.segment import segment_clauses
 from .services.summarize import summarize_text
-from .services.risk import analyze_risks
-from .services.embeddings import EmbeddingIndex
+from .services.embeddings import create_embedding_index
 from .services.rag_chat import RAGChatbot
-
-# Google Cloud services
-from .services.gcp_config import gcp_config
-from .services.gcp_ocr import gcp_ocr_service
-from .services.gcp_summarize import gcp_summarization_service
-from .services.gcp_chat import gcp_chatbot
-from .services.gcp_storage import gcp_storage_service
+from .services.dedup import NearDuplicateIndex
+from .services.query_cache import QueryCache
+from .services.metrics import record_cache, record_fallback, register_collector, render_prometheus
+from .services import admission, profiler
+from .services.uploads import UPLOAD_DIR, store_upload
+from .services.exports import EXPORTS, materialize_export, remove_exports, write_clauses
+from .services.lifecycle import LifecycleManager, record_artifacts
+from .services.revisions import (
+	align_clauses, carry_over_risks, changed_text, change_summary, load_previous_clauses, record_revision, risks_tied_to_clauses,
+)
+
+# Google Cloud services (imported and constructed on first use)
+from .services.gcp_services import (
+	gcp_config,
+	gcp_ocr_service,
+	gcp_summarization_service,
+	gcp_chatbot,
+	gcs_upload_pipeline,
+	gcp_storage_service,
+	gcp_startup_report,
+)
 
 
 bp = Blueprint('main', __name__)
@@ -24,13 +40,26 @@ bp = Blueprint('main', __name__)
 # Singletons for in-process use - lazy initialization
 embedding_index = None
 chatbot = None
+dedup_index = None
+# Answers to repeated questions, keyed by document version so re-indexing a document invalidates its answers
+answer_cache = QueryCache(max_entries=int(os.environ.get('CHAT_CACHE_SIZE', '1024')))
+register_collector(lambda: [('ldd_chat_cache_entries', 'gauge', 'Answers held in the chat answer cache.', {}, answer_cache.stats()['entries'])])
 
 def get_embedding_index():
 	global embedding_index
 	if embedding_index is None:
-		embedding_index = EmbeddingIndex(index_dir=Path('models/faiss_index'))
+		embedding_index = create_embedding_index(index_dir=Path('models/faiss_index'))
 	return embedding_index
 
+def get_dedup_index():
+	global dedup_index
+	if dedup_index is None:
+		dedup_index = NearDuplicateIndex(
+			index_dir=Path('models/faiss_index'),
+			threshold=float(os.environ.get('DEDUP_THRESHOLD', '0.9')),
+		)
+	return dedup_index
+
 def get_chatbot():
 	global chatbot
 	if chatbot is None:
@@ -43,12 +72,143 @@ def get_chatbot():
 	return chatbot
 
 
+def flush_background_work(timeout: float) -> None:
+	"""Finish queued embedding jobs before the process exits (worker recycling, shutdown).
+
+	GCS uploads need no flush: background mode spools them to disk and another
+	process picks them up.
+	"""
+	pipeline = getattr(embedding_index, 'pipeline', None)
+	if pipeline is not None and not pipeline.flush(timeout):
+		print(f"⚠️  Embedding jobs still queued after {timeout:.0f}s; those documents keep keyword-only retrieval")
+
+
+# Cascading delete and TTL retention for everything a document leaves behind
+lifecycle = LifecycleManager(
+	indexes=lambda: [get_embedding_index(), get_dedup_index()],
+	storage=gcp_storage_service,
+	upload_pipeline=gcs_upload_pipeline,
+	on_delete=[answer_cache.invalidate_doc, remove_exports],
+)
+
+
+def analyze_document(uid: str, text: str, clauses):
+	"""Summary and risks for a document.
+
+	An identical earlier upload lends its whole analysis; a near-duplicate only
+	lends the risks of the clauses both share word for word, and the rest of
+	the document is analyzed afresh.
+	"""
+	dedup = get_dedup_index()
+	identical = dedup.find_identical(text)
+	record_cache('identical_document', hits=int(bool(identical)), misses=int(not identical))
+	if identical and identical['summary'] and identical['risks']:
+		print(f"♻️  {uid} is identical to {identical['doc_id']}; reusing its analysis")
+		dedup.record_document(uid, text, clauses, summary=identical['summary'], risks=identical['risks'])
+		return identical['summary'], identical['risks']
+
+	carried, edited = None, text
+	duplicate = dedup.find_near_duplicate(text)
+	near = dedup.get_document(duplicate[0]) if duplicate else None
+	if near and near['risks']:
+		old_clauses = [dedup.clause_text(h) for h in near['clause_hashes']]
+		if all(c is not None for c in old_clauses) and risks_tied_to_clauses(near['risks'], old_clauses):
+			changes = align_clauses(old_clauses, clauses)
+			carried = carry_over_risks(near['risks'], changes, old_clauses, keep_untied=False)
+			edited = '\n\n'.join(clauses[c['new_index']] for c in changes if c['status'] in ('added', 'modified'))
+	record_cache('near_duplicate', hits=int(carried is not None), misses=int(carried is None))
+	if carried is not None:
+		print(f"♻️  {uid} is a near-duplicate of {duplicate[0]} ({duplicate[1]:.2f}); reusing risks of its shared clauses")
+
+	# Gemini calls share the LLM lane; when it is full the document gets the local analysis
+	with admission.optional_slot('llm', gcp_summarization_service.is_available()) as use_llm:
+		# One structured Gemini call covers summary and risks; the per-task calls are the fallback,
+		# and a near-duplicate takes them so only its new clauses are sent for risk analysis
+		analysis = None
+		if use_llm and carried is None and gcp_summarization_service.combined_analysis_enabled():
+			analysis = gcp_summarization_service.analyze_document(text)
+			if analysis is None:
+				record_fallback('gcp.gemini_analysis', 'per_task')
+
+		# Enhanced summarization with GCP services
+		if analysis:
+			summary = analysis['summary']
+		elif use_llm:
+			summary = gcp_summarization_service.summarize_with_gemini(text)
+			if not summary:
+				record_fallback('gcp.gemini_summary', 'textrank')
+				summary = summarize_text(text)  # Fallback
+		else:
+			summary = summarize_text(text)
+
+		# Enhanced risk analysis with GCP services; local scoring only runs on unseen clauses
+		if gcp_summarization_service.is_available():
+			if analysis:
+				gcp_risks = analysis['risks']
+			elif not use_llm:
+				gcp_risks = []
+			elif carried is not None:
+				gcp_risks = carried + (gcp_summarization_service.analyze_legal_risks(edited) if edited else [])
+			else:
+				gcp_risks = gcp_summarization_service.analyze_legal_risks(text)
+			if not gcp_risks:
+				record_fallback('gcp.gemini_risks', 'local')
+			risks = gcp_risks if gcp_risks else dedup.analyze_risks(clauses)
+		else:
+			risks = dedup.analyze_risks(clauses)
+
+	dedup.record_document(uid, text, clauses, summary=summary, risks=risks)
+	return summary, risks
+
+
+def cloud_extract_text(file_path: str, cancel) -> str:
+	# Document AI when a processor is configured, then Vision. A batch job still running
+	# after OCR_CLOUD_TIMEOUT is cancelled and the request keeps local OCR's text.
+	deadline = time.monotonic() + OCR_CLOUD_TIMEOUT
+	text = ''
+	if gcp_ocr_service.documentai_enabled():
+		text = gcp_ocr_service.extract_text_with_documentai(file_path, timeout=OCR_CLOUD_TIMEOUT, cancel=cancel)
+	if not text and not cancel.is_set() and time.monotonic() < deadline:
+		with open(file_path, 'rb') as handle:
+			text = gcp_ocr_service.extract_text_with_vision(handle, cancel=cancel)
+	return text
+
+
+# Cloud OCR and local Tesseract race; native PDF text skips OCR entirely
+text_extractor = HedgedExtractor(
+	cloud=cloud_extract_text,
+	local=lambda path, cancel: ocr_file(path, cancel),
+	cloud_available=lambda: gcp_ocr_service.is_available(),
+)
+
+
+def extract_text(file_path: Path) -> str:
+	return text_extractor.extract(str(file_path))
+
+
+def save_upload(file, doc_id: str, prefix: str = '') -> Path:
+	"""Move the streamed upload into place, record its content hash and add both to doc_id's manifest."""
+	prefix = prefix or doc_id
+	filename = secure_filename(file.filename)
+	stored_name = f"{prefix}_{filename}"
+	file_path, sha256, size = store_upload(file, UPLOAD_DIR / stored_name)
+	processed_dir = Path('data/processed')
+	processed_dir.mkdir(parents=True, exist_ok=True)
+	source_path = processed_dir / f'{prefix}_source.json'
+	source_path.write_text(
+		json.dumps({'filename': filename, 'path': str(file_path), 'sha256': sha256, 'size': size}), encoding='utf-8'
+	)
+	record_artifacts(doc_id, [file_path, source_path])
+	return file_path
+
+
 @bp.get('/')
 def index():
 	return render_template('index.html')
 
 
 @bp.post('/upload')
+@admission.limit('upload')
 def upload():
 	try:
 		if 'document' not in request.files:
@@ -57,62 +217,124 @@ def upload():
 		if file.filename == '':
 			return redirect(url_for('main.index'))
 
-		filename = secure_filename(file.filename)
 		uid = uuid.uuid4().hex
-		stored_name = f"{uid}_{filename}"
-		upload_dir = Path('data/uploads')
-		upload_dir.mkdir(parents=True, exist_ok=True)
-		file_path = upload_dir / stored_name
-		file.save(str(file_path))
-		
-		# Enhanced text extraction with GCP services
-		text = ""
-		if gcp_ocr_service.is_available():
-			# Try GCP OCR first
-			text = gcp_ocr_service.extract_text_with_vision(str(file_path))
-			if not text:
-				text = extract_text_from_file(str(file_path))  # Fallback
-		else:
-			text = extract_text_from_file(str(file_path))
-		
-		# Enhanced summarization with GCP services
-		if gcp_summarization_service.is_available():
-			summary = gcp_summarization_service.summarize_with_gemini(text)
-			if not summary:
-				summary = summarize_text(text)  # Fallback
-		else:
-			summary = summarize_text(text)
+		file_path = save_upload(file, uid)
+		text = extract_text(file_path)
 		
 		clauses = segment_clauses(text)
-		
-		# Enhanced risk analysis with GCP services
-		if gcp_summarization_service.is_available():
-			gcp_risks = gcp_summarization_service.analyze_legal_risks(text)
-			risks = gcp_risks if gcp_risks else analyze_risks(clauses)
-		else:
-			risks = analyze_risks(clauses)
+		summary, risks = analyze_document(uid, text, clauses)
 
 		# Index clauses for retrieval
 		get_embedding_index().add_document(doc_id=uid, clauses=clauses)
 
-		# Store in Cloud Storage if available
-		if gcp_storage_service.is_available():
-			gcp_storage_service.upload_document(str(file_path), uid, "original")
-			gcp_storage_service.upload_text_content(text, uid, "extracted_text")
-			gcp_storage_service.upload_text_content(summary, uid, "summary")
+		# Store in Cloud Storage if available (concurrent, or spooled in background mode)
+		gcs_upload_pipeline.submit(uid, [
+			gcs_upload_pipeline.file_artifact(str(file_path), "original"),
+			gcs_upload_pipeline.text_artifact(text, "extracted_text"),
+			gcs_upload_pipeline.text_artifact(summary, "summary"),
+		])
 
 		# Local storage (fallback)
 		processed_dir = Path('data/processed')
 		processed_dir.mkdir(parents=True, exist_ok=True)
 		(processed_dir / f'{uid}_summary.bin').write_bytes(summary.encode('utf-8'))
-		(processed_dir / f'{uid}_clauses.bin').write_bytes('\n\n'.join(clauses).encode('utf-8'))
+		write_clauses(processed_dir / f'{uid}_clauses.bin', clauses)
+		record_artifacts(uid, [processed_dir / f'{uid}{suffix}' for suffix in ('_summary.bin', '_clauses.bin', '_clauses.idx')])
 
 		return render_template('dashboard.html', doc_id=uid, summary=summary, risks=risks, clauses=clauses)
 	except Exception as e:
 		return f"Error processing document: {str(e)}", 500
 
 
+@bp.post('/revise/<doc_id>')
+@admission.limit('upload')
+def revise(doc_id: str):
+	"""Re-analyze a revised draft of doc_id, redoing work only for the clauses that changed."""
+	try:
+		processed_dir = Path('data/processed')
+		dedup = get_dedup_index()
+		old_clauses = load_previous_clauses(processed_dir, doc_id, dedup)
+		if old_clauses is None:
+			return redirect(url_for('main.index'))
+
+		file = request.files.get('document')
+		file_path = None
+		if file is not None and file.filename:
+			# Keep earlier versions' originals; revisions get their own upload name
+			file_path = save_upload(file, doc_id, f"{doc_id}_{uuid.uuid4().hex[:8]}")
+			text = extract_text(file_path)
+		else:
+			text = request.form.get('raw_text', '').strip()
+		if not text:
+			return redirect(url_for('main.index'))
+
+		clauses = segment_clauses(text)
+		changes = align_clauses(old_clauses, clauses)
+		counts = change_summary(changes)
+		edited = changed_text(changes)
+		prior = dedup.get_document(doc_id) or {}
+		prior_summary = prior.get('summary')
+		if prior_summary is None and (processed_dir / f'{doc_id}_summary.bin').exists():
+			prior_summary = (processed_dir / f'{doc_id}_summary.bin').read_text(encoding='utf-8')
+
+		# LLM work only sees the edit; unchanged clauses keep their cached risk scores
+		with admission.optional_slot('llm', bool(edited) and gcp_summarization_service.is_available()) as use_llm:
+			summary = ''
+			if not edited and prior_summary:
+				summary = prior_summary
+			elif use_llm and prior_summary:
+				summary = gcp_summarization_service.summarize_revision(prior_summary, edited)
+			if not summary:
+				summary = summarize_text(text)
+
+			risks = []
+			if gcp_summarization_service.is_available():
+				if not edited and prior.get('risks'):
+					risks = prior['risks']
+				elif use_llm:
+					# Risks on untouched clauses stand; only the edit gets a fresh look
+					risks = carry_over_risks(prior.get('risks') or [], changes, old_clauses)
+					risks += gcp_summarization_service.analyze_legal_risks(edited)
+			if not risks:
+				risks = dedup.analyze_risks(clauses)
+
+		get_embedding_index().add_document(doc_id=doc_id, clauses=clauses)
+		dedup.record_document(doc_id, text, clauses, summary=summary, risks=risks)
+		version = record_revision(processed_dir, doc_id, changes)
+
+		artifacts = [
+			gcs_upload_pipeline.text_artifact(text, f"extracted_text_v{version['version']}"),
+			gcs_upload_pipeline.text_artifact(summary, "summary"),
+		]
+		if file_path is not None:
+			artifacts.insert(0, gcs_upload_pipeline.file_artifact(str(file_path), f"original_v{version['version']}"))
+		gcs_upload_pipeline.submit(doc_id, artifacts)
+
+		(processed_dir / f'{doc_id}_summary.bin').write_bytes(summary.encode('utf-8'))
+		write_clauses(processed_dir / f'{doc_id}_clauses.bin', clauses)
+		record_artifacts(doc_id, [processed_dir / f'{doc_id}{suffix}' for suffix in
+			('_summary.bin', '_clauses.bin', '_clauses.idx', '_versions.json', '_changes.json')])
+
+		return render_template('dashboard.html', doc_id=doc_id, summary=summary, risks=risks, clauses=clauses,
+			changes=[c for c in changes if c['status'] != 'unchanged'], change_counts=counts, version=version['version'])
+	except Exception as e:
+		return f"Error processing revision: {str(e)}", 500
+
+
+@bp.get('/changes/<doc_id>')
+def get_changes(doc_id: str):
+	"""Redline-style change report for the latest revision."""
+	path = Path('data/processed') / f'{doc_id}_changes.json'
+	if not path.exists():
+		return jsonify({'version': 1, 'changes': []})
+	return send_file(str(path.resolve()), mimetype='application/json')
+
+
 @bp.post('/chat')
+@admission.limit('chat', busy=lambda retry_after: jsonify({
+	'answer': f"The assistant is busy right now; please try again in {retry_after} seconds.",
+	'citations': [],
+}))
 def chat():
 	try:
 		data = request.get_json(force=True)
@@ -120,7 +342,16 @@ def chat():
 		doc_id = data.get('doc_id')
 		if not query:
 			return jsonify({'answer': 'Please enter a question.', 'citations': []})
-		answer, citations = get_chatbot().answer(query=query, doc_id=doc_id)
+		index = get_embedding_index()
+		index.refresh()
+		cache_key = answer_cache.key(doc_id, query, index.document_version(doc_id))
+		cached = answer_cache.get(cache_key)
+		record_cache('chat_answer', hits=int(cached is not None), misses=int(cached is None))
+		if cached is not None:
+			answer, citations = cached
+		else:
+			answer, citations = get_chatbot().answer(query=query, doc_id=doc_id)
+			answer_cache.put(cache_key, (answer, citations))
 		return jsonify({
 			'answer': answer,
 			'citations': citations,
@@ -132,21 +363,27 @@ def chat():
 		}), 200
 
 
+def send_export(doc_id: str, artifact: str):
+	"""Serve an export straight from disk; send_file handles ETag/conditional GET and Range."""
+	fmt = request.args.get('format', 'txt').lower()
+	if fmt not in EXPORTS[artifact]:
+		return f"Unsupported export format: {fmt}", 400
+	risks = None
+	if artifact == 'clauses' and fmt != 'txt':
+		prior = get_dedup_index().get_document(doc_id)
+		risks = prior['risks'] if prior else None
+	path = materialize_export(doc_id, artifact, fmt, risks)
+	if path is None:
+		return redirect(url_for('main.index'))
+	download_name, mimetype = EXPORTS[artifact][fmt]
+	return send_file(str(path), mimetype=mimetype, as_attachment=True, download_name=download_name,
+		conditional=True, etag=True, max_age=0)
+
+
 @bp.get('/export/summary/<doc_id>')
 def export_summary(doc_id: str):
 	try:
-		path = Path('data/processed') / f'{doc_id}_summary.bin'
-		if not path.exists():
-			return redirect(url_for('main.index'))
-		data = path.read_bytes()
-		tmp = Path('data/processed') / f'{doc_id}_summary.txt'
-		tmp.write_bytes(data)
-		resp = send_file(str(tmp), as_attachment=True, download_name='summary.txt')
-		try:
-			tmp.unlink()
-		except Exception:
-			pass
-		return resp
+		return send_export(doc_id, 'summary')
 	except Exception as e:
 		return f"Error exporting summary: {str(e)}", 500
 
@@ -154,37 +391,20 @@ def export_summary(doc_id: str):
 @bp.get('/export/clauses/<doc_id>')
 def export_clauses(doc_id: str):
 	try:
-		path = Path('data/processed') / f'{doc_id}_clauses.bin'
-		if not path.exists():
-			return redirect(url_for('main.index'))
-		data = path.read_bytes()
-		tmp = Path('data/processed') / f'{doc_id}_clauses.txt'
-		tmp.write_bytes(data)
-		resp = send_file(str(tmp), as_attachment=True, download_name='clauses.txt')
-		try:
-			tmp.unlink()
-		except Exception:
-			pass
-		return resp
+		return send_export(doc_id, 'clauses')
 	except Exception as e:
 		return f"Error exporting clauses: {str(e)}", 500
 
 
 @bp.post('/delete/<doc_id>')
 def delete_doc(doc_id: str):
-	# Remove processed artifacts if present
-	processed_dir = Path('data/processed')
-	for suffix in ['_summary.bin', '_clauses.bin', '_summary.txt', '_clauses.txt']:
-		p = processed_dir / f'{doc_id}{suffix}'
-		try:
-			if p.exists():
-				p.unlink()
-		except Exception:
-			pass
+	# Indexes, caches, exports, GCS folder, uploads and processed artifacts
+	lifecycle.delete(doc_id)
 	return redirect(url_for('main.index'))
 
 
 @bp.post('/process_text')
+@admission.limit('upload')
 def process_text():
 	try:
 		text = request.form.get('raw_text', '').strip()
@@ -192,35 +412,26 @@ def process_text():
 			return redirect(url_for('main.index'))
 		uid = uuid.uuid4().hex
 		clauses = segment_clauses(text)
-		
-		# Enhanced summarization with GCP services
-		if gcp_summarization_service.is_available():
-			summary = gcp_summarization_service.summarize_with_gemini(text)
-			if not summary:
-				summary = summarize_text(text)  # Fallback
-		else:
-			summary = summarize_text(text)
-		
-		# Enhanced risk analysis with GCP services
-		if gcp_summarization_service.is_available():
-			gcp_risks = gcp_summarization_service.analyze_legal_risks(text)
-			risks = gcp_risks if gcp_risks else analyze_risks(clauses)
-		else:
-			risks = analyze_risks(clauses)
+		summary, risks = analyze_document(uid, text, clauses)
 		
 		# Store in Cloud Storage if available
-		if gcp_storage_service.is_available():
-			gcp_storage_service.upload_text_content(text, uid, "raw_text")
-			gcp_storage_service.upload_text_content(summary, uid, "summary")
+		gcs_upload_pipeline.submit(uid, [
+			gcs_upload_pipeline.text_artifact(text, "raw_text"),
+			gcs_upload_pipeline.text_artifact(summary, "summary"),
+		])
 		
 		# index for chat
 		get_embedding_index().add_document(doc_id=uid, clauses=clauses)
+		record_artifacts(uid)
 		return render_template('dashboard.html', doc_id=uid, summary=summary, risks=risks, clauses=clauses)
 	except Exception as e:
 		return f"Error processing text: {str(e)}", 500
 
 
 @bp.get('/insights/<doc_id>')
+@admission.limit('llm', busy=lambda retry_after: jsonify({
+	'insights': f"AI insights are busy right now; please try again in {retry_after} seconds.",
+}))
 def get_insights(doc_id: str):
 	"""Get AI-generated document insights."""
 	try:
@@ -234,6 +445,9 @@ def get_insights(doc_id: str):
 
 
 @bp.get('/questions/<doc_id>')
+@admission.limit('llm', busy=lambda retry_after: jsonify({'questions': [
+	f"Suggestions are busy right now; please try again in {retry_after} seconds.",
+]}))
 def get_suggested_questions(doc_id: str):
 	"""Get AI-suggested questions about the document."""
 	try:
@@ -267,3 +481,36 @@ def get_status():
 		return jsonify({'error': str(e)}), 500
 
 
+@bp.get('/metrics')
+def metrics():
+	"""Stage latencies, fallbacks and cache hit counts in Prometheus text format.
+
+	Counters live in each process: under gunicorn a scrape reports only the worker that answered it.
+	"""
+	return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.get('/admin/profiles')
+def list_profiles():
+	"""Recent request profiles; requires the PROFILE_SECRET in the X-Profile header."""
+	if not profiler.is_authorized(request):
+		abort(404)
+	return jsonify({'profiles': profiler.list_profiles()})
+
+
+@bp.get('/admin/profiles/<name>')
+def download_profile(name: str):
+	if not profiler.is_authorized(request):
+		abort(404)
+	path = profiler.profile_path(name)
+	if path is None:
+		abort(404)
+	return send_file(str(path), as_attachment=True, download_name=name)
+
+
+@bp.get('/status/startup')
+def get_startup_status():
+	"""Cold start timings; does not trigger service initialization."""
+	return jsonify(gcp_startup_report())
+
+
@@ -0,0 +1,167 @@
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional
+import math
+import os
+import threading
+import time
+
+from .metrics import Sample, record_fallback, register_collector
+
+
+class AdmissionRejected(Exception):
+	def __init__(self, lane: str, retry_after: int):
+		super().__init__(f"{lane} lane is full")
+		self.lane = lane
+		self.retry_after = retry_after
+
+
+class Lane:
+	"""Concurrency limit with a bounded wait queue.
+
+	Up to `limit` holders run at once and up to `queue` more wait (at most
+	`wait_seconds`) for a slot; anything beyond that is rejected immediately
+	with a Retry-After estimate instead of piling up threads and memory.
+	A limit of 0 disables the lane. `limit` and `queue` are for the whole
+	server until share() splits them between worker processes.
+	"""
+
+	def __init__(self, name: str, limit: int, queue: int, wait_seconds: float):
+		self.name = name
+		self.limit = limit
+		self.queue = queue
+		self.server_limit = limit
+		self.server_queue = queue
+		self.wait_seconds = wait_seconds
+		self.active = 0
+		self.waiting = 0
+		self.admitted = 0
+		self.rejected = 0
+		self._hold_seconds = 1.0  # moving average of how long a slot is held
+		self._cond = threading.Condition()
+
+	def retry_after(self) -> int:
+		if not self.limit:
+			return 1
+		return max(1, math.ceil(self._hold_seconds * (self.waiting + 1) / self.limit))
+
+	def _reject(self):
+		self.rejected += 1
+		return AdmissionRejected(self.name, self.retry_after())
+
+	def share(self, workers: int) -> None:
+		"""Keep this process's share of the server-wide limits, rounded up to at least one slot."""
+		with self._cond:
+			if self.server_limit:
+				self.limit = max(1, math.ceil(self.server_limit / workers))
+			self.queue = math.ceil(self.server_queue / workers)
+
+	def acquire(self) -> float:
+		"""Take a slot (waiting in the queue if needed); returns the acquire time for release()."""
+		with self._cond:
+			if self.limit and self.active >= self.limit:
+				if self.waiting >= self.queue:
+					raise self._reject()
+				self.waiting += 1
+				deadline = time.monotonic() + self.wait_seconds
+				try:
+					while self.active >= self.limit:
+						remaining = deadline - time.monotonic()
+						if remaining <= 0:
+							raise self._reject()
+						self._cond.wait(remaining)
+				finally:
+					self.waiting -= 1
+			self.active += 1
+			self.admitted += 1
+			return time.monotonic()
+
+	def release(self, acquired_at: float) -> None:
+		with self._cond:
+			self.active -= 1
+			self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.monotonic() - acquired_at)
+			self._cond.notify()
+
+
+def _lane_from_env(name: str, limit: int, queue: int, wait_seconds: float) -> Lane:
+	prefix = f'ADMISSION_{name.upper()}'
+	return Lane(
+		name,
+		int(os.environ.get(f'{prefix}_LIMIT', str(limit))),
+		int(os.environ.get(f'{prefix}_QUEUE', str(queue))),
+		float(os.environ.get(f'{prefix}_WAIT', str(wait_seconds))),
+	)
+
+
+# OCR-heavy uploads, LLM calls and chat never compete for the same slots,
+# so an upload burst cannot starve /chat
+lanes: Dict[str, Lane] = {
+	'upload': _lane_from_env('upload', 2, 4, 30.0),
+	'llm': _lane_from_env('llm', 4, 8, 20.0),
+	'chat': _lane_from_env('chat', 8, 16, 5.0),
+}
+
+
+def split_between_workers(workers: int) -> None:
+	"""Lanes live in each process; with `workers` processes every lane keeps its share."""
+	for lane in lanes.values():
+		lane.share(max(1, workers))
+
+
+def limit(lane_name: str, busy: Optional[Callable[[int], object]] = None):
+	"""Run a view inside `lane_name`; when the lane is full answer 429 with Retry-After.
+
+	`busy(retry_after)` builds the response body (a plain message by default).
+	"""
+	lane = lanes[lane_name]
+
+	def decorate(view):
+		@wraps(view)
+		def wrapper(*args, **kwargs):
+			from flask import make_response
+			try:
+				acquired_at = lane.acquire()
+			except AdmissionRejected as rejected:
+				body = busy(rejected.retry_after) if busy else f"Server is busy; please retry in {rejected.retry_after} seconds."
+				response = make_response(body, 429)
+				response.headers['Retry-After'] = str(rejected.retry_after)
+				return response
+			try:
+				return view(*args, **kwargs)
+			finally:
+				lane.release(acquired_at)
+		return wrapper
+	return decorate
+
+
+@contextmanager
+def optional_slot(lane_name: str, wanted: bool = True):
+	"""Yields True while holding a slot in lane_name, or False if it was not wanted or the lane
+	turned it away, so work already in progress can degrade instead of failing."""
+	if not wanted:
+		yield False
+		return
+	lane = lanes[lane_name]
+	try:
+		acquired_at = lane.acquire()
+	except AdmissionRejected:
+		record_fallback(f'admission.{lane_name}', 'local')
+		yield False
+		return
+	try:
+		yield True
+	finally:
+		lane.release(acquired_at)
+
+
+def _admission_samples() -> Iterable[Sample]:
+	for name, lane in lanes.items():
+		labels = {'lane': name}
+		yield ('ldd_admission_active', 'gauge', 'Requests holding an admission slot.', labels, lane.active)
+		yield ('ldd_admission_waiting', 'gauge', 'Requests queued for an admission slot.', labels, lane.waiting)
+		yield ('ldd_admission_limit', 'gauge', 'Concurrent slots per admission lane (0 = unlimited).', labels, lane.limit)
+		yield ('ldd_admission_admitted_total', 'counter', 'Requests admitted per lane.', labels, lane.admitted)
+		yield ('ldd_admission_rejected_total', 'counter', 'Requests turned away with 429 per lane.', labels, lane.rejected)
+
+
+register_collector(_admission_samples)
@@ -0,0 +1,99 @@
+from typing import List, Optional, Sequence, Set
+import math
+import os
+import re
+
+from .embeddings import LexicalScorer
+from .metrics import timed
+from .summarize import tokenize_sentences
+
+
+CHAT_CONTEXT_TOKENS = int(os.environ.get('CHAT_CONTEXT_TOKENS', '1200'))
+CHAT_CONTEXT_CANDIDATES = int(os.environ.get('CHAT_CONTEXT_CANDIDATES', '8'))
+CHAT_INSIGHTS_TOKENS = int(os.environ.get('CHAT_INSIGHTS_TOKENS', '1500'))
+CHARS_PER_TOKEN = 4
+ELLIPSIS = '…'
+
+
+def estimate_tokens(text: str) -> int:
+	# ~4 characters per token holds well enough for English legal prose
+	return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class ContextPacker(LexicalScorer):
+	"""Fits retrieved clauses into a prompt token budget.
+
+	Clauses that mostly repeat a better-ranked one are dropped, long clauses
+	are cut down to the sentences with the most BM25 query-term weight (kept
+	in reading order), and excerpts are taken by retrieval score until the
+	budget is spent.
+	"""
+
+	def __init__(self, budget_tokens: int = CHAT_CONTEXT_TOKENS, clause_tokens: Optional[int] = None, overlap: float = 0.8):
+		self.budget_tokens = budget_tokens
+		# No single clause may crowd out the rest of the evidence
+		self.clause_tokens = clause_tokens or max(64, budget_tokens // 3)
+		self.overlap = overlap
+
+	def _dedupe(self, clauses: List[str]) -> List[str]:
+		kept: List[str] = []
+		kept_tokens: List[Set[str]] = []
+		for clause in clauses:
+			tokens = set(self._tokenize(clause))
+			if not tokens:
+				continue
+			if any(len(tokens & other) / min(len(tokens), len(other)) >= self.overlap for other in kept_tokens):
+				continue
+			kept.append(clause)
+			kept_tokens.append(tokens)
+		return kept
+
+	def trim(self, query: str, clause: str, max_tokens: int) -> str:
+		"""The clause itself if it fits, else its most query-relevant sentences within max_tokens."""
+		clause = re.sub(r"\s+", " ", clause.strip())
+		if estimate_tokens(clause) <= max_tokens:
+			return clause
+		sentences = tokenize_sentences(clause)
+		idf = self._build_idf(sentences)
+		scores = [self._bm25_like(query, s, idf) for s in sentences]
+		# Sentences without query terms are padding; only fall back to the opening when none match
+		ranked = sorted((i for i, s in enumerate(scores) if s > 0), key=lambda i: (-scores[i], i)) or range(len(sentences))
+		chosen: List[int] = []
+		used = 0
+		for i in ranked:
+			cost = estimate_tokens(sentences[i]) + 1
+			if used + cost > max_tokens:
+				continue
+			chosen.append(i)
+			used += cost
+		if not chosen:
+			# One sentence longer than the whole allowance: keep its head
+			return clause[:max_tokens * CHARS_PER_TOKEN].rstrip() + ELLIPSIS
+		chosen.sort()
+		parts: List[str] = []
+		for n, i in enumerate(chosen):
+			if n and i != chosen[n - 1] + 1:
+				parts.append(ELLIPSIS)
+			parts.append(sentences[i])
+		if chosen[0]:
+			parts.insert(0, ELLIPSIS)
+		if chosen[-1] != len(sentences) - 1:
+			parts.append(ELLIPSIS)
+		return ' '.join(parts)
+
+	@timed('chat.pack_context')
+	def pack(self, query: str, clauses: Sequence[str], scores: Optional[Sequence[float]] = None) -> List[str]:
+		"""Excerpts to put in the prompt, best first, together within budget_tokens."""
+		if scores is not None:
+			order = sorted(range(len(clauses)), key=lambda i: -scores[i])
+			clauses = [clauses[i] for i in order]
+		packed: List[str] = []
+		remaining = self.budget_tokens
+		for clause in self._dedupe([c for c in clauses if c]):
+			allowance = min(self.clause_tokens, remaining)
+			if allowance < 16:
+				break
+			excerpt = self.trim(query, clause, allowance)
+			packed.append(excerpt)
+			remaining -= estimate_tokens(excerpt) + 1
+		return packed
@@ -0,0 +1,243 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+try:
+	import numpy as np  # type: ignore
+except Exception:
+	np = None
+
+from .metrics import record_cache, timed
+from .risk import build_risk_results, score_clause
+from .segment import clause_hash
+
+
+NUM_PERM = 64
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 31) - 1
+_rng = random.Random(1337)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text: str, size: int = 3) -> List[int]:
+	words = re.findall(r"[a-z0-9]+", text.lower())
+	if len(words) < size:
+		grams = [' '.join(words)] if words else []
+	else:
+		grams = [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+	return list({zlib.crc32(g.encode('utf-8')) % _PRIME for g in grams})
+
+
+def minhash(text: str) -> List[int]:
+	values = shingles(text)
+	if not values:
+		return [_PRIME] * NUM_PERM
+	if np is not None:
+		# Mersenne-prime universal hashing, vectorized over all shingles at once;
+		# every operand is below 2**31 so products fit in uint64
+		x = np.array(values, dtype=np.uint64)
+		a = np.array([p[0] for p in _PERMS], dtype=np.uint64)[:, None]
+		b = np.array([p[1] for p in _PERMS], dtype=np.uint64)[:, None]
+		return [int(v) for v in ((a * x + b) % np.uint64(_PRIME)).min(axis=1)]
+	return [min((a * v + b) % _PRIME for v in values) for a, b in _PERMS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+	"""Estimated Jaccard similarity of two MinHash signatures."""
+	return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / float(NUM_PERM)
+
+
+def content_hash(text: str) -> str:
+	# Whitespace-insensitive, like clause hashes
+	return hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+
+def _band_keys(sig: List[int]) -> List[str]:
+	return [f"{band}:{zlib.crc32(json.dumps(sig[band * ROWS:(band + 1) * ROWS]).encode('ascii')):08x}" for band in range(BANDS)]
+
+
+class NearDuplicateIndex:
+	"""MinHash/LSH sketches of documents plus the analysis results computed for
+	them, so repeat and near-identical uploads can reuse prior work.
+
+	Each distinct clause (by normalized hash) is stored once with its risk
+	score and the number of recorded documents that contain it; documents keep
+	only the list of clause hashes they contain.
+	"""
+
+	def __init__(self, index_dir: Path, threshold: float = 0.9):
+		self.db_path = Path(index_dir) / 'dedup.sqlite3'
+		self.db_path.parent.mkdir(parents=True, exist_ok=True)
+		self.threshold = threshold
+		self._local = threading.local()
+		with self._conn() as conn:
+			conn.executescript("""
+				CREATE TABLE IF NOT EXISTS signatures (kind TEXT NOT NULL, key TEXT NOT NULL, sig TEXT NOT NULL, PRIMARY KEY (kind, key));
+				CREATE TABLE IF NOT EXISTS bands (kind TEXT NOT NULL, bucket TEXT NOT NULL, key TEXT NOT NULL);
+				CREATE INDEX IF NOT EXISTS bands_bucket ON bands (kind, bucket);
+				CREATE INDEX IF NOT EXISTS bands_key ON bands (kind, key);
+				CREATE TABLE IF NOT EXISTS clauses (
+					hash TEXT PRIMARY KEY, text TEXT NOT NULL, risk_score INTEGER NOT NULL, risk_labels TEXT NOT NULL,
+					refs INTEGER NOT NULL DEFAULT 0
+				);
+				CREATE TABLE IF NOT EXISTS documents (
+					doc_id TEXT PRIMARY KEY, clause_hashes TEXT NOT NULL, summary TEXT, risks TEXT, created REAL NOT NULL
+				);
+			""")
+			# Databases from before whole-document reuse required identical text
+			if 'content_hash' not in [row[1] for row in conn.execute('PRAGMA table_info(documents)')]:
+				conn.execute('ALTER TABLE documents ADD COLUMN content_hash TEXT')
+			conn.execute('CREATE INDEX IF NOT EXISTS documents_content ON documents (content_hash)')
+			# Databases from before clause refcounts also kept clause sketches nothing queried
+			if 'refs' not in [row[1] for row in conn.execute('PRAGMA table_info(clauses)')]:
+				conn.execute('ALTER TABLE clauses ADD COLUMN refs INTEGER NOT NULL DEFAULT 0')
+				for (hashes,) in conn.execute('SELECT clause_hashes FROM documents').fetchall():
+					self._add_refs(conn, json.loads(hashes), 1)
+				conn.execute("DELETE FROM signatures WHERE kind = 'clause'")
+				conn.execute("DELETE FROM bands WHERE kind = 'clause'")
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(str(self.db_path), timeout=30.0)
+			conn.execute('PRAGMA journal_mode=WAL')
+			self._local.conn = conn
+		return conn
+
+	def _add_sketch(self, conn: sqlite3.Connection, kind: str, key: str, sig: List[int]) -> None:
+		if conn.execute('SELECT 1 FROM signatures WHERE kind = ? AND key = ?', (kind, key)).fetchone():
+			return
+		conn.execute('INSERT INTO signatures (kind, key, sig) VALUES (?, ?, ?)', (kind, key, json.dumps(sig)))
+		conn.executemany('INSERT INTO bands (kind, bucket, key) VALUES (?, ?, ?)', [(kind, b, key) for b in _band_keys(sig)])
+
+	def _query(self, kind: str, sig: List[int], threshold: float) -> List[Tuple[str, float]]:
+		conn = self._conn()
+		buckets = _band_keys(sig)
+		rows = conn.execute(
+			f"SELECT DISTINCT s.key, s.sig FROM bands b JOIN signatures s ON s.kind = b.kind AND s.key = b.key "
+			f"WHERE b.kind = ? AND b.bucket IN ({','.join('?' * len(buckets))})",
+			[kind, *buckets]
+		).fetchall()
+		matches = []
+		for key, other in rows:
+			sim = similarity(sig, json.loads(other))
+			if sim >= threshold:
+				matches.append((key, sim))
+		matches.sort(key=lambda m: m[1], reverse=True)
+		return matches
+
+	def find_near_duplicate(self, text: str, threshold: Optional[float] = None) -> Optional[Tuple[str, float]]:
+		"""Most similar previously recorded document, if it clears the threshold."""
+		matches = self._query('doc', minhash(text), self.threshold if threshold is None else threshold)
+		return matches[0] if matches else None
+
+	def clause_text(self, h: str) -> Optional[str]:
+		row = self._conn().execute('SELECT text FROM clauses WHERE hash = ?', (h,)).fetchone()
+		return row[0] if row else None
+
+	@timed('risk.cached')
+	def analyze_risks(self, clauses: List[str]) -> List[Dict]:
+		"""analyze_risks(), scoring only clauses that have never been seen before."""
+		hashes = [clause_hash(c) for c in clauses]
+		known = self._clause_scores(hashes)
+		fresh: Dict[str, Tuple[str, int, List[str]]] = {}
+		scores = []
+		for clause, h in zip(clauses, hashes):
+			if h not in known:
+				score, hits = score_clause(clause)
+				known[h] = (score, hits)
+				fresh[h] = (clause, score, hits)
+			scores.append(known[h])
+		record_cache('clause_risk', hits=len(clauses) - len(fresh), misses=len(fresh))
+		if fresh:
+			with self._conn() as conn:
+				conn.executemany(
+					'INSERT OR IGNORE INTO clauses (hash, text, risk_score, risk_labels) VALUES (?, ?, ?, ?)',
+					[(h, c, s, json.dumps(l)) for h, (c, s, l) in fresh.items()]
+				)
+		return build_risk_results(clauses, scores)
+
+	def _clause_scores(self, hashes: List[str]) -> Dict[str, Tuple[int, List[str]]]:
+		found: Dict[str, Tuple[int, List[str]]] = {}
+		unique = list(set(hashes))
+		for start in range(0, len(unique), 500):
+			chunk = unique[start:start + 500]
+			rows = self._conn().execute(
+				f"SELECT hash, risk_score, risk_labels FROM clauses WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+			).fetchall()
+			for h, score, labels in rows:
+				found[h] = (score, json.loads(labels))
+		return found
+
+	@staticmethod
+	def _add_refs(conn: sqlite3.Connection, hashes: List[str], delta: int) -> None:
+		"""Adjust the refcount of each distinct hash, dropping clauses no document contains any more."""
+		unique = list(set(hashes))
+		conn.executemany('UPDATE clauses SET refs = refs + ? WHERE hash = ?', [(delta, h) for h in unique])
+		if delta < 0:
+			conn.executemany('DELETE FROM clauses WHERE hash = ? AND refs <= 0', [(h,) for h in unique])
+
+	def record_document(self, doc_id: str, text: str, clauses: List[str], summary: Optional[str] = None,
+	                    risks: Optional[List[Dict]] = None) -> None:
+		hashes = [clause_hash(c) for c in clauses]
+		known = self._clause_scores(hashes)
+		with self._conn() as conn:
+			# A revised document replaces its previous sketch and clause references
+			previous = conn.execute('SELECT clause_hashes FROM documents WHERE doc_id = ?', (doc_id,)).fetchone()
+			conn.execute("DELETE FROM signatures WHERE kind = 'doc' AND key = ?", (doc_id,))
+			conn.execute("DELETE FROM bands WHERE kind = 'doc' AND key = ?", (doc_id,))
+			self._add_sketch(conn, 'doc', doc_id, minhash(text))
+			for clause, h in zip(clauses, hashes):
+				if h not in known:
+					score, hits = score_clause(clause)
+					conn.execute(
+						'INSERT OR IGNORE INTO clauses (hash, text, risk_score, risk_labels) VALUES (?, ?, ?, ?)',
+						(h, clause, score, json.dumps(hits))
+					)
+					known[h] = (score, hits)
+			self._add_refs(conn, hashes, 1)
+			if previous is not None:
+				self._add_refs(conn, json.loads(previous[0]), -1)
+			conn.execute(
+				'INSERT OR REPLACE INTO documents (doc_id, clause_hashes, summary, risks, created, content_hash) VALUES (?, ?, ?, ?, ?, ?)',
+				(doc_id, json.dumps(hashes), summary, json.dumps(risks) if risks is not None else None, time.time(), content_hash(text))
+			)
+
+	def find_identical(self, text: str) -> Optional[Dict]:
+		"""The most recent recorded document with exactly this text (up to whitespace)."""
+		row = self._conn().execute(
+			'SELECT doc_id FROM documents WHERE content_hash = ? ORDER BY created DESC LIMIT 1', (content_hash(text),)
+		).fetchone()
+		return self.get_document(row[0]) if row else None
+
+	def get_document(self, doc_id: str) -> Optional[Dict]:
+		row = self._conn().execute(
+			'SELECT clause_hashes, summary, risks FROM documents WHERE doc_id = ?', (doc_id,)
+		).fetchone()
+		if not row:
+			return None
+		return {
+			'doc_id': doc_id,
+			'clause_hashes': json.loads(row[0]),
+			'summary': row[1],
+			'risks': json.loads(row[2]) if row[2] else None,
+		}
+
+	def remove_document(self, doc_id: str) -> bool:
+		"""Forget a document and every clause no other document contains."""
+		with self._conn() as conn:
+			row = conn.execute('SELECT clause_hashes FROM documents WHERE doc_id = ?', (doc_id,)).fetchone()
+			if row is None:
+				return False
+			conn.execute('DELETE FROM documents WHERE doc_id = ?', (doc_id,))
+			conn.execute("DELETE FROM signatures WHERE kind = 'doc' AND key = ?", (doc_id,))
+			conn.execute("DELETE FROM bands WHERE kind = 'doc' AND key = ?", (doc_id,))
+			self._add_refs(conn, json.loads(row[0]), -1)
+		return True
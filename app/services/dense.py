@@ -0,0 +1,474 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import base64
+import json
+import os
+import re
+import threading
+import zlib
+try:
+	import numpy as np  # type: ignore
+except Exception:
+	np = None
+try:
+	import fcntl  # type: ignore
+except ImportError:
+	fcntl = None
+
+from .metrics import timed
+
+
+# Plain-language words mapped onto the legal concept they usually refer to, so
+# "can they fire me without warning" meets "termination without notice".
+LEGAL_CONCEPTS: Dict[str, str] = {}
+for _concept, _words in {
+	'termination': 'terminate terminated terminates termination fire fired firing dismiss dismissed dismissal sack sacked quit resign resignation cancel cancellation end ending layoff',
+	'notice': 'notice notify notified notification warning warn warned inform informed advance',
+	'payment': 'pay paid payment payments salary wage wages compensation fee fees invoice remuneration price cost',
+	'penalty': 'penalty penalties fine fines late damages liquidated charge charges',
+	'liability': 'liability liable responsible responsibility indemnify indemnification indemnity blame fault',
+	'confidentiality': 'confidential confidentiality secret secrets nda disclose disclosure private',
+	'dispute': 'dispute disputes sue lawsuit litigation court arbitration arbitrator tribunal mediation',
+	'renewal': 'renew renewal renews renewed extend extension automatic automatically',
+	'competition': 'compete competitor noncompete competition solicit nonsolicit',
+	'property': 'intellectual copyright patent patents invention inventions ownership own owns',
+	'lease': 'rent rental lease tenant landlord premises deposit',
+	'duration': 'term duration period months years days',
+}.items():
+	for _w in _words.split():
+		LEGAL_CONCEPTS[_w] = _concept
+
+
+class HashingVectorizer:
+	"""Dependency-free sentence encoder: signed feature hashing over words, word
+	bigrams, word-prefix stems and legal concepts, L2-normalized."""
+
+	def __init__(self, dim: int = 256):
+		self.dim = dim
+		self.model_version = f'hashing-v1-{dim}'
+
+	def _features(self, text: str) -> List[Tuple[str, float]]:
+		words = re.findall(r"[a-z0-9]+", text.lower())
+		feats: List[Tuple[str, float]] = []
+		for w in words:
+			feats.append(('w:' + w, 1.0))
+			if len(w) > 5:
+				# Crude stemming: terminate/termination/terminated share a prefix
+				feats.append(('p:' + w[:6], 0.5))
+			concept = LEGAL_CONCEPTS.get(w)
+			if concept:
+				feats.append(('c:' + concept, 2.0))
+		for a, b in zip(words, words[1:]):
+			feats.append((f'b:{a}_{b}', 0.5))
+		return feats
+
+	def encode(self, texts: List[str]):
+		out = np.zeros((len(texts), self.dim), dtype=np.float32)
+		for row, text in enumerate(texts):
+			for feat, weight in self._features(text):
+				h = zlib.crc32(feat.encode('utf-8'))
+				out[row, h % self.dim] += weight if (h >> 31) & 1 else -weight
+		norms = np.linalg.norm(out, axis=1, keepdims=True)
+		norms[norms == 0] = 1.0
+		return out / norms
+
+
+class SentenceTransformerVectorizer:
+	"""Small CPU embedding model, used when DENSE_MODEL names one and
+	sentence-transformers is installed."""
+
+	def __init__(self, model_name: str):
+		from sentence_transformers import SentenceTransformer  # type: ignore
+		self.model = SentenceTransformer(model_name, device='cpu')
+		self.dim = self.model.get_sentence_embedding_dimension()
+		self.model_version = f'st-{model_name}'
+
+	def encode(self, texts: List[str]):
+		return self.model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def create_vectorizer():
+	model_name = os.environ.get('DENSE_MODEL')
+	if model_name:
+		try:
+			return SentenceTransformerVectorizer(model_name)
+		except Exception as e:
+			print(f"⚠️  Dense model {model_name} unavailable, using hashing vectorizer: {e}")
+	return HashingVectorizer()
+
+
+class DenseIndex:
+	"""Float16 clause vectors persisted per document under index_dir/dense, searched
+	with an IVF (inverted file) coarse quantizer once the corpus is large enough.
+
+	Writers serialize on a lock file, replace the document's shard and append its
+	id to a change log; the log's size is the generation. Readers replay only the
+	log entries past their offset, so a refresh loads just the shards that changed
+	and appends their rows to the in-memory matrix instead of rebuilding it.
+	"""
+
+	def __init__(self, index_dir: Path, vectorizer=None, nprobe: int = 8, ivf_min_rows: int = 20000):
+		self.dir = Path(index_dir) / 'dense'
+		self.dir.mkdir(parents=True, exist_ok=True)
+		self.log_path = self.dir / '_changes.log'
+		self.lock_path = self.dir / '_write.lock'
+		self.centroids_path = self.dir / '_ivf_centroids.npy'
+		self.vectorizer = vectorizer or create_vectorizer()
+		self.nprobe = nprobe
+		self.ivf_min_rows = ivf_min_rows
+		self._lock = threading.RLock()
+		self._docs: Dict[str, dict] = {}
+		# Row storage grows by doubling; rows of removed or replaced documents are
+		# masked out of _alive and compacted away once they outnumber the live ones
+		self._vectors = None
+		self._alive = None
+		self._count = 0
+		self._dead = 0
+		self._rows: List[Tuple[str, int]] = []
+		self._centroids = None
+		self._lists: Optional[List] = None
+		self._trained_rows = 0
+		self.generation = -1
+		self.refresh()
+
+	def _shard_path(self, doc_id: str) -> Path:
+		return self.dir / f'{doc_id}.json'
+
+	def _read_generation(self) -> int:
+		try:
+			return self.log_path.stat().st_size
+		except OSError:
+			return 0
+
+	@contextmanager
+	def _write_lock(self):
+		with self._lock:
+			if fcntl is None:
+				yield
+				return
+			with open(self.lock_path, 'a+b') as fh:
+				fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+				try:
+					yield
+				finally:
+					fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+	def _log_change(self, doc_id: str) -> None:
+		# Must be called under _write_lock; appends are what move the generation
+		with open(self.log_path, 'ab') as fh:
+			fh.write(f'{doc_id}\n'.encode('utf-8'))
+
+	def refresh(self) -> None:
+		generation = self._read_generation()
+		if generation == self.generation:
+			return
+		with self._lock:
+			if generation < self.generation or self.generation < 0:
+				self._reload(generation)
+				return
+			with open(self.log_path, 'rb') as fh:
+				fh.seek(self.generation)
+				data = fh.read(generation - self.generation)
+			# A line still being appended is picked up by the next refresh
+			end = data.rfind(b'\n') + 1
+			for doc_id in dict.fromkeys(data[:end].decode('utf-8').split()):
+				self._sync_shard(doc_id)
+			self.generation += end
+
+	def _reload(self, generation: int) -> None:
+		"""Read every shard; for a new instance or a change log that was replaced."""
+		on_disk = {p.stem for p in self.dir.glob('*.json')}
+		for doc_id in list(self._docs):
+			if doc_id not in on_disk:
+				self._retire(doc_id)
+		for doc_id in on_disk:
+			self._sync_shard(doc_id)
+		# Entries logged while the shards were read are replayed by the next refresh
+		self.generation = generation
+
+	def _sync_shard(self, doc_id: str) -> None:
+		stamp = self._stamp(self._shard_path(doc_id))
+		if stamp is None:
+			self._retire(doc_id)
+			return
+		if doc_id in self._docs and self._docs[doc_id]['stamp'] == stamp:
+			return
+		shard = self._load_shard(doc_id)
+		if shard is None:
+			# Vectors from another model version are stale until re-embedded
+			self._retire(doc_id)
+		else:
+			self._place(doc_id, shard['clauses'], shard['vectors'], shard['stamp'])
+
+	@staticmethod
+	def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+		try:
+			stat = path.stat()
+		except OSError:
+			return None
+		return stat.st_mtime_ns, stat.st_size
+
+	def _load_shard(self, doc_id: str) -> Optional[dict]:
+		path = self._shard_path(doc_id)
+		stamp = self._stamp(path)
+		try:
+			data = json.loads(path.read_text(encoding='utf-8'))
+		except (OSError, ValueError):
+			return None
+		if data.get('model') != self.vectorizer.model_version:
+			return None
+		vectors = np.frombuffer(base64.b64decode(data['vectors']), dtype=np.float16).reshape(-1, data['dim'])
+		return {'clauses': data['clauses'], 'vectors': vectors, 'stamp': stamp}
+
+	def _place(self, doc_id: str, clauses: List[str], vectors, stamp) -> None:
+		# Must be called under _lock
+		self._retire(doc_id)
+		n = len(clauses)
+		self._reserve(n)
+		start = self._count
+		self._vectors[start:start + n] = vectors
+		self._alive[start:start + n] = True
+		self._rows.extend((doc_id, i) for i in range(n))
+		self._count += n
+		self._docs[doc_id] = {'clauses': clauses, 'stamp': stamp, 'rows': (start, start + n)}
+		if n and self._lists is not None:
+			self._assign_lists(start, start + n)
+
+	def _retire(self, doc_id: str) -> None:
+		shard = self._docs.pop(doc_id, None)
+		if shard is not None:
+			start, end = shard['rows']
+			self._alive[start:end] = False
+			self._dead += end - start
+
+	def _reserve(self, n: int) -> None:
+		capacity = 0 if self._vectors is None else len(self._vectors)
+		if self._count + n <= capacity:
+			return
+		capacity = max(1024, self._count + n, 2 * capacity)
+		vectors = np.zeros((capacity, self.vectorizer.dim), dtype=np.float16)
+		alive = np.zeros(capacity, dtype=bool)
+		if self._vectors is not None:
+			vectors[:self._count] = self._vectors[:self._count]
+			alive[:self._count] = self._alive[:self._count]
+		self._vectors, self._alive = vectors, alive
+
+	def _compact(self) -> None:
+		live = np.flatnonzero(self._alive[:self._count])
+		self._vectors = self._vectors[live]
+		self._alive = np.ones(len(live), dtype=bool)
+		self._rows = [self._rows[i] for i in live]
+		self._count, self._dead = len(live), 0
+		# Documents keep their order, so each one's rows stay contiguous
+		offsets: Dict[str, int] = {}
+		for row, (doc_id, _) in enumerate(self._rows):
+			offsets.setdefault(doc_id, row)
+		for doc_id, shard in self._docs.items():
+			begin = offsets.get(doc_id, 0)
+			shard['rows'] = (begin, begin + len(shard['clauses']))
+		self._lists = None
+
+	def _maintain_ivf(self) -> None:
+		"""Compact and (re)train or assign the IVF lists when the corpus has changed enough."""
+		live = self._count - self._dead
+		if self._dead > max(1024, live):
+			self._compact()
+		if live < self.ivf_min_rows:
+			self._centroids = None
+			self._lists = None
+			return
+		if self._centroids is None:
+			self._load_centroids()
+		# Retrain only when the corpus has grown or shrunk substantially since the last training
+		if self._centroids is None or live > 2 * self._trained_rows or live < self._trained_rows // 2:
+			self._train_ivf()
+			self._lists = None
+		if self._lists is None:
+			self._lists = [np.zeros(0, dtype=np.int64) for _ in range(len(self._centroids))]
+			self._assign_lists(0, self._count)
+
+	def _train_ivf(self, iterations: int = 8) -> None:
+		live = np.flatnonzero(self._alive[:self._count])
+		n = len(live)
+		nlist = max(16, int(np.sqrt(n)))
+		rng = np.random.default_rng(0)
+		sample = self._vectors[live[rng.choice(n, size=min(n, nlist * 64), replace=False)]].astype(np.float32)
+		centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+		for _ in range(iterations):
+			assign = np.argmax(sample @ centroids.T, axis=1)
+			for c in range(nlist):
+				members = sample[assign == c]
+				if len(members):
+					centroids[c] = members.mean(axis=0)
+			centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-6)
+		self._centroids = centroids
+		self._trained_rows = n
+		# Shared with other workers so only one of them pays for training
+		tmp = self.dir / f'_ivf_centroids.{os.getpid()}.tmp.npy'
+		np.save(tmp, centroids)
+		os.replace(tmp, self.centroids_path)
+		(self.dir / '_ivf_rows').write_text(str(n), encoding='utf-8')
+
+	def _load_centroids(self) -> None:
+		try:
+			centroids = np.load(self.centroids_path)
+			trained_rows = int((self.dir / '_ivf_rows').read_text(encoding='utf-8'))
+		except (OSError, ValueError):
+			return
+		if centroids.ndim == 2 and centroids.shape[1] == self._vectors.shape[1]:
+			self._centroids = centroids.astype(np.float32)
+			self._trained_rows = trained_rows
+
+	def _assign_lists(self, start: int, end: int, chunk: int = 16384) -> None:
+		"""Add rows [start, end) to the inverted list of their nearest centroid."""
+		for block_start in range(start, end, chunk):
+			block_end = min(end, block_start + chunk)
+			block = self._vectors[block_start:block_end].astype(np.float32)
+			assign = np.argmax(block @ self._centroids.T, axis=1)
+			for c in np.unique(assign):
+				rows = block_start + np.flatnonzero(assign == c)
+				self._lists[c] = np.concatenate([self._lists[c], rows])
+
+	def document_version(self, doc_id: Optional[str]):
+		"""Changes whenever doc_id's vectors are rewritten or removed (any write for doc_id=None)."""
+		self.refresh()
+		if doc_id is None:
+			return self.generation
+		shard = self._docs.get(doc_id)
+		return shard['stamp'] if shard is not None else None
+
+	def stale_documents(self) -> List[str]:
+		"""Documents on disk whose vectors came from another model version."""
+		self.refresh()
+		with self._lock:
+			return [p.stem for p in self.dir.glob('*.json') if p.stem not in self._docs]
+
+	def read_clauses(self, doc_id: str) -> List[str]:
+		try:
+			return json.loads(self._shard_path(doc_id).read_text(encoding='utf-8'))['clauses']
+		except (OSError, ValueError, KeyError):
+			return []
+
+	@timed('index.dense_add')
+	def add_document(self, doc_id: str, clauses: List[str]) -> None:
+		vectors = self.vectorizer.encode(clauses) if clauses else np.zeros((0, self.vectorizer.dim), dtype=np.float32)
+		self.add_vectors(doc_id, clauses, vectors)
+
+	def add_vectors(self, doc_id: str, clauses: List[str], vectors) -> None:
+		vectors = np.asarray(vectors, dtype=np.float16).reshape(len(clauses), -1)
+		payload = {
+			'model': self.vectorizer.model_version,
+			'dim': int(vectors.shape[1]),
+			'clauses': clauses,
+			'vectors': base64.b64encode(vectors.tobytes()).decode('ascii'),
+		}
+		path = self._shard_path(doc_id)
+		with self._write_lock():
+			tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+			tmp.write_text(json.dumps(payload), encoding='utf-8')
+			stamp = self._stamp(tmp)
+			os.replace(tmp, path)
+			self._log_change(doc_id)
+			self._place(doc_id, clauses, vectors, stamp)
+
+	def remove_document(self, doc_id: str) -> bool:
+		with self._write_lock():
+			self._retire(doc_id)
+			try:
+				self._shard_path(doc_id).unlink()
+			except FileNotFoundError:
+				return False
+			self._log_change(doc_id)
+		return True
+
+	@timed('index.dense_search')
+	def search(self, query: str, k: int = 5, doc_id: Optional[str] = None, min_score: float = 0.05,
+	           with_doc_id: bool = False) -> List[tuple]:
+		if not query.strip():
+			return []
+		self.refresh()
+		q = self.vectorizer.encode([query])[0]
+		with self._lock:
+			if doc_id is not None:
+				shard = self._docs.get(doc_id)
+				if not shard or not len(shard['clauses']):
+					return []
+				start, end = shard['rows']
+				scores = self._vectors[start:end].astype(np.float32) @ q
+				top = np.argsort(-scores)[:k]
+				return [(int(i), float(scores[i]), shard['clauses'][i], doc_id)[:4 if with_doc_id else 3]
+				        for i in top if scores[i] >= min_score]
+			if not self._docs:
+				return []
+			self._maintain_ivf()
+			if self._lists is not None:
+				probes = np.argsort(-(self._centroids @ q))[:self.nprobe]
+				candidates = np.concatenate([self._lists[c] for c in probes])
+			else:
+				candidates = np.arange(self._count)
+			candidates = candidates[self._alive[candidates]]
+			scores = self._vectors[candidates].astype(np.float32) @ q
+			top = np.argsort(-scores)[:k]
+			results = []
+			for j in top:
+				if scores[j] < min_score:
+					continue
+				did, pos = self._rows[candidates[j]]
+				results.append((pos, float(scores[j]), self._docs[did]['clauses'][pos], did)[:4 if with_doc_id else 3])
+			return results
+
+
+class HybridIndex:
+	"""Lexical index and DenseIndex behind the EmbeddingIndex interface, with
+	reciprocal rank fusion of both result lists."""
+
+	def __init__(self, lexical, dense: DenseIndex, rrf_k: int = 60, pipeline=None):
+		self.lexical = lexical
+		self.dense = dense
+		self.rrf_k = rrf_k
+		# Optional EmbeddingPipeline; dense vectors are then added in the background
+		self.pipeline = pipeline
+
+	@property
+	def generation(self) -> int:
+		return self.lexical.generation + self.dense.generation
+
+	def refresh(self) -> None:
+		self.lexical.refresh()
+		self.dense.refresh()
+
+	def document_version(self, doc_id: Optional[str]):
+		# Background embedding changes the answer too, once the vectors land
+		return self.lexical.document_version(doc_id), self.dense.document_version(doc_id)
+
+	def add_document(self, doc_id: str, clauses: List[str]) -> None:
+		self.lexical.add_document(doc_id, clauses)
+		if self.pipeline is not None:
+			self.pipeline.submit(doc_id, clauses)
+		else:
+			self.dense.add_document(doc_id, clauses)
+
+	def remove_document(self, doc_id: str) -> bool:
+		if self.pipeline is not None:
+			self.pipeline.cancel(doc_id)
+		removed = self.lexical.remove_document(doc_id)
+		return self.dense.remove_document(doc_id) or removed
+
+	def search(self, query: str, k: int = 5, doc_id: Optional[str] = None, with_doc_id: bool = False) -> List[tuple]:
+		lexical = self.lexical.search(query, k=k * 4, doc_id=doc_id, with_doc_id=True)
+		dense = self.dense.search(query, k=k * 4, doc_id=doc_id, with_doc_id=True)
+		if not dense:
+			return [r if with_doc_id else r[:3] for r in lexical[:k]]
+		# Lexical fallback results (score 0.0) carry no ranking signal
+		lexical = [r for r in lexical if r[1] > 0]
+		# Keyed by document too: the same boilerplate clause in two documents is two results
+		fused: Dict[Tuple[str, int], float] = {}
+		clauses: Dict[Tuple[str, int], str] = {}
+		for results in (lexical, dense):
+			for rank, (pos, _, clause, did) in enumerate(results):
+				key = (did, pos)
+				fused[key] = fused.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+				clauses[key] = clause
+		ranked = sorted(fused.items(), key=lambda x: x[1], reverse=True)[:k]
+		return [(pos, score, clauses[(did, pos)], did)[:4 if with_doc_id else 3] for (did, pos), score in ranked]
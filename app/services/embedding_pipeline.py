@@ -0,0 +1,208 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import queue
+import sqlite3
+import threading
+import time
+try:
+	import fcntl  # type: ignore
+except ImportError:
+	fcntl = None
+
+from .dense import DenseIndex, np
+from .metrics import record_cache, timed
+from .segment import clause_hash
+
+
+class VectorCache:
+	"""On-disk clause vector cache keyed by (model version, clause hash)."""
+
+	def __init__(self, path: Path):
+		self.path = Path(path)
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		self._local = threading.local()
+		with self._conn() as conn:
+			conn.execute(
+				'CREATE TABLE IF NOT EXISTS vectors ('
+				'model TEXT NOT NULL, hash TEXT NOT NULL, dim INTEGER NOT NULL, vec BLOB NOT NULL, '
+				'PRIMARY KEY (model, hash))'
+			)
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(str(self.path), timeout=30.0)
+			conn.execute('PRAGMA journal_mode=WAL')
+			self._local.conn = conn
+		return conn
+
+	def get_many(self, model: str, hashes: List[str]) -> Dict[str, 'np.ndarray']:
+		found: Dict[str, 'np.ndarray'] = {}
+		conn = self._conn()
+		for start in range(0, len(hashes), 500):
+			chunk = hashes[start:start + 500]
+			rows = conn.execute(
+				f"SELECT hash, dim, vec FROM vectors WHERE model = ? AND hash IN ({','.join('?' * len(chunk))})",
+				[model, *chunk]
+			).fetchall()
+			for h, dim, vec in rows:
+				found[h] = np.frombuffer(vec, dtype=np.float16).reshape(dim)
+		return found
+
+	def put_many(self, model: str, items: Dict[str, 'np.ndarray']) -> None:
+		with self._conn() as conn:
+			conn.executemany(
+				'INSERT OR REPLACE INTO vectors (model, hash, dim, vec) VALUES (?, ?, ?, ?)',
+				[(model, h, int(v.shape[0]), np.asarray(v, dtype=np.float16).tobytes()) for h, v in items.items()]
+			)
+
+
+class EmbeddingPipeline:
+	"""Embeds clauses for a DenseIndex off the request path.
+
+	Jobs queued by submit() are gathered into batches across documents,
+	identical clauses are embedded once, and every vector is cached on disk by
+	model version and clause hash, so re-indexing after a model change only
+	encodes clauses the new model has not seen.
+	"""
+
+	def __init__(self, dense_index: DenseIndex, cache: VectorCache, batch_size: int = 256,
+	             batch_window: float = 0.2, background: bool = True):
+		self.dense_index = dense_index
+		self.cache = cache
+		self.batch_size = batch_size
+		self.batch_window = batch_window
+		self.background = background
+		self._queue: 'queue.Queue[Tuple[str, List[str]]]' = queue.Queue()
+		# Queued jobs per document; a cancelled id is forgotten once its jobs have drained
+		self._pending: Dict[str, int] = {}
+		self._cancelled = set()
+		self._lock = threading.Lock()
+		self._worker: Optional[threading.Thread] = None
+		self._idle = threading.Event()
+		self._idle.set()
+		self.stats = {'clauses': 0, 'unique': 0, 'cache_hits': 0, 'encoded': 0}
+
+	@property
+	def model_version(self) -> str:
+		return self.dense_index.vectorizer.model_version
+
+	def submit(self, doc_id: str, clauses: List[str]) -> None:
+		with self._lock:
+			self._cancelled.discard(doc_id)
+		if not self.background:
+			self.dense_index.add_vectors(doc_id, clauses, self.embed(clauses))
+			return
+		with self._lock:
+			self._pending[doc_id] = self._pending.get(doc_id, 0) + 1
+			self._queue.put((doc_id, clauses))
+			self._idle.clear()
+		self.start()
+
+	def cancel(self, doc_id: str) -> None:
+		"""Drop doc_id's queued jobs; once this returns no pending vectors for it are written."""
+		with self._lock:
+			if doc_id in self._pending:
+				self._cancelled.add(doc_id)
+
+	def start(self) -> None:
+		with self._lock:
+			if self._worker is None or not self._worker.is_alive():
+				self._worker = threading.Thread(target=self._run, name='embedding-pipeline', daemon=True)
+				self._worker.start()
+
+	def flush(self, timeout: Optional[float] = None) -> bool:
+		"""Block until every submitted document has been embedded."""
+		return self._idle.wait(timeout)
+
+	@timed('embedding.embed')
+	def embed(self, clauses: List[str]):
+		"""Vectors for clauses, deduplicated and served from the cache where possible."""
+		if not clauses:
+			return np.zeros((0, self.dense_index.vectorizer.dim), dtype=np.float16)
+		hashes = [clause_hash(c) for c in clauses]
+		unique: Dict[str, str] = {}
+		for h, c in zip(hashes, clauses):
+			unique.setdefault(h, c)
+		vectors = self.cache.get_many(self.model_version, list(unique))
+		missing = [h for h in unique if h not in vectors]
+		for start in range(0, len(missing), self.batch_size):
+			chunk = missing[start:start + self.batch_size]
+			encoded = self.dense_index.vectorizer.encode([unique[h] for h in chunk]).astype(np.float16)
+			fresh = dict(zip(chunk, encoded))
+			self.cache.put_many(self.model_version, fresh)
+			vectors.update(fresh)
+		self.stats['clauses'] += len(clauses)
+		self.stats['unique'] += len(unique)
+		self.stats['cache_hits'] += len(unique) - len(missing)
+		self.stats['encoded'] += len(missing)
+		record_cache('clause_vectors', hits=len(unique) - len(missing), misses=len(missing))
+		return np.stack([vectors[h] for h in hashes])
+
+	def _next_batch(self) -> List[Tuple[str, List[str]]]:
+		jobs = [self._queue.get()]
+		pending = len(jobs[0][1])
+		deadline = time.monotonic() + self.batch_window
+		while pending < self.batch_size:
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				break
+			try:
+				job = self._queue.get(timeout=remaining)
+			except queue.Empty:
+				break
+			jobs.append(job)
+			pending += len(job[1])
+		return jobs
+
+	def _run(self) -> None:
+		while True:
+			jobs = self._next_batch()
+			try:
+				# One embed call for the whole batch dedupes boilerplate across documents
+				all_clauses = [c for _, clauses in jobs for c in clauses]
+				vectors = self.embed(all_clauses)
+				offset = 0
+				for doc_id, clauses in jobs:
+					doc_vectors = vectors[offset:offset + len(clauses)]
+					offset += len(clauses)
+					# Checked and written under one lock, so a cancel() cannot slip in between
+					with self._lock:
+						if doc_id not in self._cancelled:
+							self.dense_index.add_vectors(doc_id, clauses, doc_vectors)
+			except Exception as e:
+				print(f"❌ Embedding pipeline error: {e}")
+			finally:
+				with self._lock:
+					for doc_id, _ in jobs:
+						self._pending[doc_id] -= 1
+						if not self._pending[doc_id]:
+							del self._pending[doc_id]
+							self._cancelled.discard(doc_id)
+						self._queue.task_done()
+					if self._queue.unfinished_tasks == 0:
+						self._idle.set()
+
+	def reindex_stale(self) -> int:
+		"""Queue documents embedded by another model version for re-embedding."""
+		stale = self.dense_index.stale_documents()
+		for doc_id in stale:
+			self.submit(doc_id, self.dense_index.read_clauses(doc_id))
+		return len(stale)
+
+	def reindex_stale_once(self, lock_path: Path) -> int:
+		"""reindex_stale() in one process at a time; the others skip it while the lock is held."""
+		if fcntl is None:
+			return self.reindex_stale()
+		with open(lock_path, 'a+b') as fh:
+			try:
+				fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except OSError:
+				return 0
+			try:
+				queued = self.reindex_stale()
+				# Held until the vectors land, so no other worker queues the same documents
+				self.flush()
+				return queued
+			finally:
+				fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
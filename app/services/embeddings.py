@@ -1,24 +1,39 @@
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple, Optional, Dict
 import json
+import os
 import re
 import math
+import threading
+try:
+	import fcntl  # type: ignore
+except ImportError:
+	fcntl = None
+	import msvcrt  # type: ignore
 
+from .metrics import register_collector, timed
 
-class EmbeddingIndex:
-	def __init__(self, index_dir: Path):
-		self.index_dir = Path(index_dir)
-		self.index_dir.mkdir(parents=True, exist_ok=True)
-		self.docid_to_offsets_path = self.index_dir / 'doc_offsets.json'
-		self.docid_to_offsets = {}
-		self._load()
 
-	def _load(self) -> None:
-		if self.docid_to_offsets_path.exists():
-			self.docid_to_offsets = json.loads(self.docid_to_offsets_path.read_text(encoding='utf-8'))
+@lru_cache(maxsize=2048)
+def _tokenize_query(query: str) -> Tuple[str, ...]:
+	# Queries are re-tokenized for every clause scored; memoize them
+	return tuple(re.findall(r"[a-z0-9]+", query.lower()))
 
-	def _save(self) -> None:
-		self.docid_to_offsets_path.write_text(json.dumps(self.docid_to_offsets), encoding='utf-8')
+
+def _query_cache_samples():
+	info = _tokenize_query.cache_info()
+	help_text = 'Cache lookups by cache and result (hit/miss).'
+	yield ('ldd_cache_requests_total', 'counter', help_text, {'cache': 'query_tokens', 'result': 'hit'}, info.hits)
+	yield ('ldd_cache_requests_total', 'counter', help_text, {'cache': 'query_tokens', 'result': 'miss'}, info.misses)
+
+
+register_collector(_query_cache_samples)
+
+
+class LexicalScorer:
+	"""BM25-style clause scoring shared by every index backend."""
 
 	def _tokenize(self, text: str) -> List[str]:
 		return re.findall(r"[a-z0-9]+", text.lower())
@@ -36,7 +51,7 @@ class EmbeddingIndex:
 		return idf
 
 	def _bm25_like(self, query: str, clause: str, idf: Dict[str, float]) -> float:
-		q_tokens = self._tokenize(query)
+		q_tokens = _tokenize_query(query)
 		c_tokens = self._tokenize(clause)
 		if not q_tokens or not c_tokens:
 			return 0.0
@@ -67,27 +82,130 @@ class EmbeddingIndex:
 			score *= 1.2
 		return score
 
+
+class EmbeddingIndex(LexicalScorer):
+	"""Lexical clause index shared safely between threads and worker processes.
+
+	Writers serialize on an exclusive lock file, merge on top of the latest
+	on-disk state and publish it with an atomic rename followed by a
+	generation bump. Readers never lock: they compare the generation file
+	with the one they loaded and reload only when it moved.
+	"""
+
+	def __init__(self, index_dir: Path):
+		self.index_dir = Path(index_dir)
+		self.index_dir.mkdir(parents=True, exist_ok=True)
+		self.docid_to_offsets_path = self.index_dir / 'doc_offsets.json'
+		self.generation_path = self.index_dir / 'doc_offsets.gen'
+		self.lock_path = self.index_dir / 'doc_offsets.lock'
+		self.docid_to_offsets = {}
+		self.generation = -1
+		self._lock = threading.RLock()
+		self._load()
+
+	def _read_generation(self) -> int:
+		try:
+			return int(self.generation_path.read_text(encoding='utf-8') or 0)
+		except (OSError, ValueError):
+			return 0
+
+	def _load(self) -> None:
+		generation = self._read_generation()
+		data = {}
+		if self.docid_to_offsets_path.exists():
+			data = json.loads(self.docid_to_offsets_path.read_text(encoding='utf-8'))
+		with self._lock:
+			self.docid_to_offsets = data
+			self.generation = generation
+
+	def refresh(self) -> None:
+		# Cheap staleness check: one small file read per call
+		if self._read_generation() != self.generation:
+			self._load()
+
+	@contextmanager
+	def _write_lock(self):
+		with self._lock:
+			with open(self.lock_path, 'a+b') as fh:
+				if fcntl is not None:
+					fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+				else:
+					fh.seek(0)
+					msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+				try:
+					# Merge on top of whatever other processes committed meanwhile
+					self.refresh()
+					yield
+				finally:
+					if fcntl is not None:
+						fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+					else:
+						fh.seek(0)
+						msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+	def _atomic_write(self, path: Path, data: str) -> None:
+		tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+		with open(tmp, 'w', encoding='utf-8') as fh:
+			fh.write(data)
+			fh.flush()
+			os.fsync(fh.fileno())
+		os.replace(tmp, path)
+
+	def _save(self) -> None:
+		# Must be called under _write_lock
+		self._atomic_write(self.docid_to_offsets_path, json.dumps(self.docid_to_offsets))
+		self.generation += 1
+		self._atomic_write(self.generation_path, str(self.generation))
+
+	@timed('index.add')
 	def add_document(self, doc_id: str, clauses: List[str]) -> None:
 		idf = self._build_idf(clauses)
-		self.docid_to_offsets[doc_id] = {'clauses': clauses, 'idf': idf}
-		self._save()
+		with self._write_lock():
+			# Copy-on-write so concurrent readers keep a consistent snapshot
+			updated = dict(self.docid_to_offsets)
+			# The generation this write publishes doubles as the document's version
+			updated[doc_id] = {'clauses': clauses, 'idf': idf, 'version': self.generation + 1}
+			self.docid_to_offsets = updated
+			self._save()
 
-	def search(self, query: str, k: int = 5, doc_id: Optional[str] = None) -> List[Tuple[int, float, str]]:
-		results: List[Tuple[int, float, str]] = []
+	def remove_document(self, doc_id: str) -> bool:
+		with self._write_lock():
+			if doc_id not in self.docid_to_offsets:
+				return False
+			updated = dict(self.docid_to_offsets)
+			del updated[doc_id]
+			self.docid_to_offsets = updated
+			self._save()
+		return True
+
+	def document_version(self, doc_id: Optional[str]):
+		"""Changes whenever doc_id is re-indexed or removed (any write for doc_id=None)."""
+		self.refresh()
+		if doc_id is None:
+			return self.generation
+		meta = self.docid_to_offsets.get(doc_id)
+		return None if meta is None else meta.get('version', 0)
+
+	@timed('index.search')
+	def search(self, query: str, k: int = 5, doc_id: Optional[str] = None, with_doc_id: bool = False) -> List[tuple]:
+		"""Top-k (position, score, clause) results, with the clause's doc_id appended when with_doc_id is set."""
+		results: List[tuple] = []
 		threshold = 0.01
+		self.refresh()
+		docid_to_offsets = self.docid_to_offsets
 		
 		if doc_id is None:
 			# Search across all documents
-			for did, meta in self.docid_to_offsets.items():
+			for did, meta in docid_to_offsets.items():
 				clauses = meta['clauses']
 				idf = meta.get('idf', self._build_idf(clauses))
 				for i, clause in enumerate(clauses):
 					score = self._bm25_like(query, clause, idf)
 					if score >= threshold:  # Threshold for relevance
-						results.append((i, score, clause))
+						results.append((i, score, clause, did))
 		else:
 			# Search within specific document
-			meta = self.docid_to_offsets.get(doc_id)
+			meta = docid_to_offsets.get(doc_id)
 			if not meta:
 				return []
 			clauses = meta['clauses']
@@ -95,7 +213,7 @@ class EmbeddingIndex:
 			for i, clause in enumerate(clauses):
 				score = self._bm25_like(query, clause, idf)
 				if score >= threshold:  # Threshold for relevance
-					results.append((i, score, clause))
+					results.append((i, score, clause, doc_id))
 		
 		# Sort by score and return top k
 		results.sort(key=lambda x: x[1], reverse=True)
@@ -103,7 +221,36 @@ class EmbeddingIndex:
 		# Fallback: if nothing matched, return top-k longest clauses as context
 		if not top and 'clauses' in locals():
 			longest = sorted([(i, len(c), c) for i, c in enumerate(clauses)], key=lambda x: x[1], reverse=True)[:k]
-			return [(i, 0.0, c) for i, _, c in longest]
-		return top
+			top = [(i, 0.0, c, doc_id if doc_id is not None else did) for i, _, c in longest]
+		return top if with_doc_id else [r[:3] for r in top]
 
 
+def create_embedding_index(index_dir: Path):
+	"""Build the index backend selected by INDEX_BACKEND ('json' or 'sqlite'),
+	fused with dense vector retrieval when RETRIEVAL_MODE is 'hybrid'."""
+	backend = os.environ.get('INDEX_BACKEND', 'json').lower()
+	if backend == 'sqlite':
+		from .embeddings_sqlite import SQLiteEmbeddingIndex
+		index = SQLiteEmbeddingIndex(index_dir=index_dir)
+	else:
+		index = EmbeddingIndex(index_dir=index_dir)
+	if os.environ.get('RETRIEVAL_MODE', 'lexical').lower() == 'hybrid':
+		from .dense import DenseIndex, HybridIndex, np
+		if np is None:
+			print("⚠️  RETRIEVAL_MODE=hybrid needs numpy; using lexical retrieval")
+		else:
+			from .embedding_pipeline import EmbeddingPipeline, VectorCache
+			dense = DenseIndex(index_dir=index_dir)
+			pipeline = EmbeddingPipeline(
+				dense,
+				VectorCache(Path(index_dir) / 'vector_cache.sqlite3'),
+				background=os.environ.get('EMBEDDING_PIPELINE', 'background').lower() == 'background',
+			)
+			# Documents embedded by a previous model version are re-embedded from the cache,
+			# off the request path and by one worker at a time
+			threading.Thread(
+				target=pipeline.reindex_stale_once, args=(dense.dir / '_reindex.lock',),
+				name='dense-reindex', daemon=True,
+			).start()
+			index = HybridIndex(index, dense, pipeline=pipeline)
+	return index
@@ -0,0 +1,242 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Tuple, Optional, Dict
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from .embeddings import LexicalScorer
+from .metrics import timed
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS documents (
+	doc_id TEXT PRIMARY KEY,
+	seq INTEGER NOT NULL,
+	idf TEXT NOT NULL,
+	version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS clauses (
+	id INTEGER PRIMARY KEY,
+	doc_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clauses_doc ON clauses (doc_id, position);
+CREATE VIRTUAL TABLE IF NOT EXISTS clause_fts USING fts5 (tokens);
+"""
+# Clauses FTS5 pre-selects for a global search before BM25 re-scoring (0 = no cap)
+SQLITE_SEARCH_CANDIDATES = int(os.environ.get('SQLITE_SEARCH_CANDIDATES', '2000'))
+
+
+class SQLiteEmbeddingIndex(LexicalScorer):
+	"""EmbeddingIndex backed by an embedded SQLite database with an FTS5 posting index.
+
+	FTS5 selects candidate clauses (any clause sharing a query token) and they are
+	re-scored with the same BM25-style scorer as the JSON index. Per-document
+	searches see every candidate, so rankings match the JSON index exactly.
+	Global searches keep only the max_candidates best by FTS5's own bm25() so
+	cost does not grow with the corpus; that bm25() weighs terms across the whole
+	corpus rather than per document, so a clause it ranks below the cap is lost
+	even if the re-scorer would have put it in the top k. max_candidates=0 turns
+	the cap off. The database runs in WAL mode so readers in other threads and
+	processes never block on a writer.
+	"""
+
+	def __init__(self, index_dir: Path, max_candidates: int = SQLITE_SEARCH_CANDIDATES):
+		self.index_dir = Path(index_dir)
+		self.index_dir.mkdir(parents=True, exist_ok=True)
+		self.db_path = self.index_dir / 'clauses.sqlite3'
+		self.max_candidates = max_candidates
+		self._local = threading.local()
+		# Shared by every request thread; _idf_lock guards both fields
+		self._idf_cache: Dict[str, Dict[str, float]] = {}
+		self._idf_cache_generation = -1
+		self._idf_lock = threading.Lock()
+		with self._conn() as conn:
+			conn.executescript(SCHEMA)
+			if 'version' not in [row[1] for row in conn.execute('PRAGMA table_info(documents)')]:
+				conn.execute('ALTER TABLE documents ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+			conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0')")
+		legacy = self.index_dir / 'doc_offsets.json'
+		if legacy.exists() and self._count_documents() == 0:
+			self.migrate_from_json(legacy)
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(str(self.db_path), timeout=30.0)
+			conn.execute('PRAGMA journal_mode=WAL')
+			conn.execute('PRAGMA synchronous=NORMAL')
+			self._local.conn = conn
+		return conn
+
+	@contextmanager
+	def _write_txn(self):
+		# Take the write lock up front so concurrent writers queue instead of failing to upgrade
+		conn = self._conn()
+		conn.execute('BEGIN IMMEDIATE')
+		try:
+			yield conn
+		except Exception:
+			conn.rollback()
+			raise
+		conn.commit()
+
+	def _count_documents(self) -> int:
+		return self._conn().execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+	@property
+	def generation(self) -> int:
+		row = self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+		return int(row[0]) if row else 0
+
+	def refresh(self) -> None:
+		# Every query reads the committed database state; nothing to reload
+		pass
+
+	def document_version(self, doc_id: Optional[str]):
+		"""Changes whenever doc_id is re-indexed or removed (any write for doc_id=None)."""
+		if doc_id is None:
+			return self.generation
+		row = self._conn().execute('SELECT version FROM documents WHERE doc_id = ?', (doc_id,)).fetchone()
+		return row[0] if row else None
+
+	def _bump_generation(self, conn: sqlite3.Connection) -> None:
+		conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+
+	def _write_document(self, conn: sqlite3.Connection, doc_id: str, clauses: List[str], idf: Dict[str, float]) -> None:
+		# Re-adding a document keeps its original position, like a dict key update
+		row = conn.execute('SELECT seq FROM documents WHERE doc_id = ?', (doc_id,)).fetchone()
+		if row:
+			seq = row[0]
+			self._delete_clauses(conn, doc_id)
+		else:
+			seq = conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM documents').fetchone()[0]
+		# The generation this write publishes doubles as the document's version
+		conn.execute(
+			"INSERT OR REPLACE INTO documents (doc_id, seq, idf, version) "
+			"VALUES (?, ?, ?, (SELECT CAST(value AS INTEGER) + 1 FROM meta WHERE key = 'generation'))",
+			(doc_id, seq, json.dumps(idf))
+		)
+		for position, clause in enumerate(clauses):
+			cur = conn.execute('INSERT INTO clauses (doc_id, position, text) VALUES (?, ?, ?)', (doc_id, position, clause))
+			conn.execute('INSERT INTO clause_fts (rowid, tokens) VALUES (?, ?)', (cur.lastrowid, ' '.join(self._tokenize(clause))))
+
+	def _delete_clauses(self, conn: sqlite3.Connection, doc_id: str) -> None:
+		conn.execute('DELETE FROM clause_fts WHERE rowid IN (SELECT id FROM clauses WHERE doc_id = ?)', (doc_id,))
+		conn.execute('DELETE FROM clauses WHERE doc_id = ?', (doc_id,))
+
+	@timed('index.add')
+	def add_document(self, doc_id: str, clauses: List[str]) -> None:
+		idf = self._build_idf(clauses)
+		with self._write_txn() as conn:
+			self._write_document(conn, doc_id, clauses, idf)
+			self._bump_generation(conn)
+
+	def remove_document(self, doc_id: str) -> bool:
+		with self._write_txn() as conn:
+			self._delete_clauses(conn, doc_id)
+			removed = conn.execute('DELETE FROM documents WHERE doc_id = ?', (doc_id,)).rowcount > 0
+			if removed:
+				self._bump_generation(conn)
+		return removed
+
+	def migrate_from_json(self, json_path: Path) -> int:
+		"""Import documents from a legacy doc_offsets.json in one transaction."""
+		data = json.loads(Path(json_path).read_text(encoding='utf-8'))
+		with self._write_txn() as conn:
+			for doc_id, meta in data.items():
+				clauses = meta['clauses']
+				self._write_document(conn, doc_id, clauses, meta.get('idf') or self._build_idf(clauses))
+			self._bump_generation(conn)
+		return len(data)
+
+	def _idf_for(self, doc_ids: List[str]) -> Dict[str, Dict[str, float]]:
+		generation = self.generation
+		with self._idf_lock:
+			if generation != self._idf_cache_generation:
+				self._idf_cache = {}
+				self._idf_cache_generation = generation
+			cache = self._idf_cache
+			missing = [d for d in doc_ids if d not in cache]
+		fetched: Dict[str, Dict[str, float]] = {}
+		for start in range(0, len(missing), 500):
+			chunk = missing[start:start + 500]
+			rows = self._conn().execute(
+				f"SELECT doc_id, idf FROM documents WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk
+			).fetchall()
+			for did, idf in rows:
+				fetched[did] = json.loads(idf)
+		with self._idf_lock:
+			# Results read at an older generation are not cached into a newer one
+			if self._idf_cache_generation == generation:
+				self._idf_cache.update(fetched)
+			found = {d: cache[d] for d in doc_ids if d in cache}
+		found.update(fetched)
+		return found
+
+	def _match_expression(self, query: str) -> Optional[str]:
+		tokens = list(dict.fromkeys(self._tokenize(query)))
+		if not tokens:
+			return None
+		return ' OR '.join(f'"{t}"' for t in tokens)
+
+	@timed('index.search')
+	def search(self, query: str, k: int = 5, doc_id: Optional[str] = None, with_doc_id: bool = False) -> List[tuple]:
+		threshold = 0.01
+		conn = self._conn()
+		match = self._match_expression(query)
+
+		if doc_id is not None:
+			if not conn.execute('SELECT 1 FROM documents WHERE doc_id = ?', (doc_id,)).fetchone():
+				return []
+			fallback_doc: Optional[str] = doc_id
+		else:
+			row = conn.execute('SELECT doc_id FROM documents ORDER BY seq DESC LIMIT 1').fetchone()
+			fallback_doc = row[0] if row else None
+
+		candidates = []
+		if match:
+			if doc_id is not None:
+				candidates = conn.execute(
+					'SELECT d.seq, c.position, c.doc_id, c.text FROM clause_fts f '
+					'JOIN clauses c ON c.id = f.rowid JOIN documents d ON d.doc_id = c.doc_id '
+					'WHERE clause_fts MATCH ? AND c.doc_id = ?', (match, doc_id)
+				).fetchall()
+			else:
+				candidates = conn.execute(
+					'SELECT d.seq, c.position, c.doc_id, c.text FROM '
+					'(SELECT rowid FROM clause_fts WHERE clause_fts MATCH ? ORDER BY bm25(clause_fts) LIMIT ?) f '
+					'JOIN clauses c ON c.id = f.rowid JOIN documents d ON d.doc_id = c.doc_id',
+					(match, self.max_candidates or -1)
+				).fetchall()
+		# Score in document/clause order so ties break exactly like the JSON index
+		candidates.sort(key=lambda r: (r[0], r[1]))
+		idf_by_doc = self._idf_for(list({r[2] for r in candidates}))
+
+		results: List[tuple] = []
+		for _, position, did, clause in candidates:
+			score = self._bm25_like(query, clause, idf_by_doc.get(did, {}))
+			if score >= threshold:  # Threshold for relevance
+				results.append((position, score, clause, did))
+		results.sort(key=lambda x: x[1], reverse=True)
+		top = results[:k]
+		# Fallback: if nothing matched, return top-k longest clauses as context
+		if not top and fallback_doc is not None:
+			rows = conn.execute(
+				'SELECT position, text FROM clauses WHERE doc_id = ? ORDER BY LENGTH(text) DESC, position LIMIT ?',
+				(fallback_doc, k)
+			).fetchall()
+			top = [(i, 0.0, c, fallback_doc) for i, c in rows]
+		return top if with_doc_id else [r[:3] for r in top]
+
+
+if __name__ == '__main__':
+	# python -m app.services.embeddings_sqlite models/faiss_index
+	target = Path(sys.argv[1] if len(sys.argv) > 1 else 'models/faiss_index')
+	index = SQLiteEmbeddingIndex(target)
+	print(f"✅ SQLite index at {index.db_path}: {index._count_documents()} documents")
@@ -0,0 +1,163 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import glob
+import hashlib
+import json
+import os
+
+
+PROCESSED_DIR = Path('data/processed')
+EXPORT_CACHE_DIR = PROCESSED_DIR / 'exports'
+CLAUSE_SEPARATOR = '\n\n'
+
+# artifact -> format -> (download name, mimetype)
+EXPORTS = {
+	'summary': {
+		'txt': ('summary.txt', 'text/plain; charset=utf-8'),
+		'json': ('summary.json', 'application/json'),
+	},
+	'clauses': {
+		'txt': ('clauses.txt', 'text/plain; charset=utf-8'),
+		'json': ('clauses.json', 'application/json'),
+		'ndjson': ('clauses.ndjson', 'application/x-ndjson'),
+	},
+}
+
+
+def artifact_path(doc_id: str, artifact: str) -> Path:
+	return PROCESSED_DIR / f'{doc_id}_{artifact}.bin'
+
+
+def clause_index_path(path: Path) -> Path:
+	return path.with_suffix('.idx')
+
+
+def write_clauses(path: Path, clauses: List[str]) -> None:
+	"""Store clauses as the plain-text export plus a sidecar with each clause's
+	byte length, so clauses that contain blank lines keep their boundaries."""
+	encoded = [c.encode('utf-8') for c in clauses]
+	for target, data in (
+		(clause_index_path(path), ''.join(f'{len(c)}\n' for c in encoded).encode('ascii')),
+		(path, CLAUSE_SEPARATOR.encode('utf-8').join(encoded)),
+	):
+		tmp = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+		tmp.write_bytes(data)
+		os.replace(tmp, target)
+
+
+def _clause_lengths(path: Path) -> Optional[List[int]]:
+	try:
+		lengths = [int(line) for line in clause_index_path(path).read_text(encoding='ascii').split()]
+	except (OSError, ValueError):
+		return None
+	# A sidecar from another write than the text file is no use
+	expected = sum(lengths) + len(CLAUSE_SEPARATOR.encode('utf-8')) * max(len(lengths) - 1, 0)
+	return lengths if expected == path.stat().st_size else None
+
+
+def iter_stored_clauses(path: Path, chunk_size: int = 1 << 16) -> Iterator[str]:
+	"""Stream the clauses of a stored `_clauses.bin` without reading it whole."""
+	lengths = _clause_lengths(path)
+	if lengths is not None:
+		separator = len(CLAUSE_SEPARATOR.encode('utf-8'))
+		with open(path, 'rb') as fh:
+			for n, length in enumerate(lengths):
+				if n:
+					fh.seek(separator, os.SEEK_CUR)
+				yield fh.read(length).decode('utf-8')
+		return
+	# Artifacts written before the sidecar existed: blank lines are the only boundary
+	with open(path, encoding='utf-8', newline='') as fh:
+		buffer = ''
+		for chunk in iter(lambda: fh.read(chunk_size), ''):
+			buffer += chunk
+			*clauses, buffer = buffer.split(CLAUSE_SEPARATOR)
+			yield from clauses
+		yield buffer
+
+
+def _iter_clauses(path: Path) -> Iterator[Dict]:
+	"""Clauses of a stored `_clauses.bin` with their character offsets in the text export."""
+	start = 0
+	for index, clause in enumerate(iter_stored_clauses(path)):
+		end = start + len(clause)
+		if clause:
+			yield {'index': index, 'start': start, 'end': end, 'text': clause}
+		start = end + len(CLAUSE_SEPARATOR)
+
+
+def _risks_by_clause(risks: Optional[List[Dict]]):
+	indexed: Dict[int, Dict] = {}
+	other: List[Dict] = []
+	for risk in risks or []:
+		if isinstance(risk.get('clause_index'), int):
+			indexed[risk['clause_index']] = risk
+		else:
+			other.append(risk)
+	return indexed, other
+
+
+def generate_export(doc_id: str, artifact: str, fmt: str, source: Path, risks: Optional[List[Dict]] = None) -> Iterator[str]:
+	"""Yield a structured export piece by piece instead of building the whole document."""
+	if artifact == 'summary':
+		yield json.dumps({'doc_id': doc_id, 'summary': source.read_text(encoding='utf-8')})
+		return
+	indexed, other = _risks_by_clause(risks)
+	if fmt == 'ndjson':
+		for clause in _iter_clauses(source):
+			clause['risk'] = indexed.get(clause['index'])
+			yield json.dumps(clause) + '\n'
+		return
+	yield f'{{"doc_id": {json.dumps(doc_id)}, "clauses": ['
+	for n, clause in enumerate(_iter_clauses(source)):
+		clause['risk'] = indexed.get(clause['index'])
+		yield (', ' if n else '') + json.dumps(clause)
+	yield f'], "risks": {json.dumps(other)}}}'
+
+
+def export_etag(source: Path, fmt: str, version: str = '') -> str:
+	stat = source.stat()
+	return hashlib.sha1(f'{source.name}:{fmt}:{stat.st_mtime_ns}:{stat.st_size}:{version}'.encode('utf-8')).hexdigest()
+
+
+def materialize_export(doc_id: str, artifact: str, fmt: str, risks: Optional[List[Dict]] = None) -> Optional[Path]:
+	"""Path of the file to serve for an export, or None if the document is unknown.
+
+	Text exports are the stored artifact itself. Structured formats are
+	generated once per artifact version into EXPORT_CACHE_DIR (named by ETag,
+	written atomically) so later downloads, conditional GETs and range
+	requests are served straight from disk.
+	"""
+	source = artifact_path(doc_id, artifact)
+	if not source.exists():
+		return None
+	if fmt == 'txt':
+		return source.resolve()
+	risk_version = hashlib.sha1(json.dumps(risks, sort_keys=True).encode('utf-8')).hexdigest()[:12] if risks else ''
+	etag = export_etag(source, fmt, risk_version)
+	EXPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+	target = EXPORT_CACHE_DIR / f'{doc_id}_{artifact}.{etag[:16]}.{fmt}'
+	if not target.exists():
+		tmp = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+		with open(tmp, 'w', encoding='utf-8') as out:
+			for chunk in generate_export(doc_id, artifact, fmt, source, risks):
+				out.write(chunk)
+		os.replace(tmp, target)
+		# Older renderings of this export are superseded
+		for stale in EXPORT_CACHE_DIR.glob(f'{glob.escape(doc_id)}_{artifact}.*.{fmt}'):
+			if stale != target:
+				try:
+					stale.unlink()
+				except OSError:
+					pass
+	return target.resolve()
+
+
+def remove_exports(doc_id: str) -> None:
+	if not EXPORT_CACHE_DIR.exists():
+		return
+	for path in EXPORT_CACHE_DIR.glob(f'{glob.escape(doc_id)}_*'):
+		try:
+			path.unlink()
+		except OSError:
+			pass
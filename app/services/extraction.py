@@ -0,0 +1,119 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+import os
+import re
+import threading
+import time
+
+from .metrics import count, timed
+from .ocr import native_text
+
+
+# Seconds the cloud extractor gets on its own before local OCR starts racing it (0 = start both)
+OCR_HEDGE_DELAY = float(os.environ.get('OCR_HEDGE_DELAY', '2.0'))
+# Cloud results arriving later than this are abandoned in favour of the local result
+OCR_CLOUD_TIMEOUT = float(os.environ.get('OCR_CLOUD_TIMEOUT', '30'))
+MIN_CHARS = 40
+MIN_WORD_RATIO = 0.5
+
+WORD = re.compile(r"[A-Za-z][a-z]{1,19}|[A-Z]{2,20}|\d+(?:[.,]\d+)*%?")
+COMMON_WORDS = frozenset("""
+a an and any are as at be by for from has have if in is it may no not of on or shall such that the this to under upon
+which will with within without party parties agreement contract term terms payment notice days date written law
+""".split())
+
+# An extractor gets the file path and an event it should check to stop early
+Extractor = Callable[[str, threading.Event], str]
+
+
+def text_quality(text: str) -> float:
+	"""Share of tokens that look like words or numbers, with a bonus if common words show up."""
+	tokens = text.split()
+	if not tokens:
+		return 0.0
+	wordlike = sum(1 for t in tokens if WORD.fullmatch(t.strip('.,;:()[]"\'')))
+	common = sum(1 for t in tokens if t.strip('.,;:()[]"\'').lower() in COMMON_WORDS)
+	return min(1.0, wordlike / len(tokens) + (0.1 if common / len(tokens) > 0.05 else 0.0))
+
+
+def is_good_text(text: Optional[str]) -> bool:
+	return bool(text) and len(text.strip()) >= MIN_CHARS and text_quality(text) >= MIN_WORD_RATIO
+
+
+class HedgedExtractor:
+	"""Race cloud OCR against local Tesseract and keep the first result that looks like text.
+
+	Native text (text files, PDFs with a text layer) is returned without any OCR.
+	Otherwise the cloud extractor starts first and local OCR joins after
+	hedge_delay seconds, or immediately once the cloud returns something
+	unusable. The loser is told to stop via its cancel event; Python threads
+	can't be killed, so extractors check the event between pages or batches.
+	"""
+
+	def __init__(self, cloud: Optional[Extractor], local: Extractor, cloud_available: Callable[[], bool] = lambda: True,
+	             hedge_delay: float = OCR_HEDGE_DELAY, cloud_timeout: float = OCR_CLOUD_TIMEOUT, max_workers: int = 8):
+		self.cloud = cloud
+		self.local = local
+		self.cloud_available = cloud_available
+		self.hedge_delay = hedge_delay
+		self.cloud_timeout = cloud_timeout
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr-hedge')
+
+	@timed('ocr.hedged')
+	def extract(self, file_path: str) -> str:
+		text = native_text(file_path)
+		if text is not None:
+			count('ldd_ocr_winner_total', source='native')
+			return text
+		if self.cloud is None or not self.cloud_available():
+			count('ldd_ocr_winner_total', source='local')
+			return self.local(file_path, threading.Event())
+
+		cancels = {'cloud': threading.Event(), 'local': threading.Event()}
+		pending = {self._executor.submit(self.cloud, file_path, cancels['cloud']): 'cloud'}
+		deadline = time.monotonic() + self.cloud_timeout
+		best = ''
+		if self.hedge_delay > 0:
+			done, _ = wait(pending, timeout=self.hedge_delay)
+			for future in done:
+				result = self._result(future)
+				if is_good_text(result):
+					count('ldd_ocr_winner_total', source='cloud')
+					return result
+				best = result
+				pending.pop(future)
+		pending[self._executor.submit(self.local, file_path, cancels['local'])] = 'local'
+
+		while pending:
+			# Local OCR always runs to completion; only a lone cloud call is bounded
+			only_cloud = set(pending.values()) == {'cloud'}
+			done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()) if only_cloud else None,
+				return_when=FIRST_COMPLETED)
+			if not done:
+				break
+			for future in done:
+				source = pending.pop(future)
+				result = self._result(future)
+				if is_good_text(result):
+					self._cancel(pending, cancels)
+					count('ldd_ocr_winner_total', source=source)
+					return result
+				if len(result.strip()) > len(best.strip()):
+					best = result
+		self._cancel(pending, cancels)
+		count('ldd_ocr_winner_total', source='none')
+		return best
+
+	@staticmethod
+	def _result(future) -> str:
+		try:
+			return future.result() or ''
+		except Exception as e:
+			print(f"OCR extractor error: {e}")
+			return ''
+
+	@staticmethod
+	def _cancel(pending, cancels) -> None:
+		for future, source in pending.items():
+			cancels[source].set()
+			future.cancel()
@@ -5,7 +5,9 @@ import os
 from typing import List, Tuple, Optional
 import google.generativeai as genai
 
+from .context_pack import CHAT_CONTEXT_CANDIDATES, CHAT_INSIGHTS_TOKENS, ContextPacker
 from .gcp_config import gcp_config
+from .metrics import record_fallback, timed
 
 
 class GCPChatbot:
@@ -15,6 +17,8 @@ class GCPChatbot:
         self.embedding_index = embedding_index
         self.gemini_model = None
         self.gcp_config = gcp_config
+        self.context_packer = ContextPacker()
+        self.insights_packer = ContextPacker(budget_tokens=CHAT_INSIGHTS_TOKENS)
         self._initialize_model()
     
     def _initialize_model(self):
@@ -28,11 +32,13 @@ class GCPChatbot:
         except Exception as e:
             print(f"⚠️  Gemini chatbot initialization failed: {e}")
     
+    @timed('gcp.gemini_chat')
     def answer(self, query: str, doc_id: Optional[str] = None) -> Tuple[str, List[str]]:
         """
         Generate answer using Gemini AI with document context.
         """
         if not self.gemini_model:
+            record_fallback('gcp.gemini_chat', 'rag_chat')
             return self._fallback_answer(query, doc_id)
         
         try:
@@ -50,16 +56,21 @@ class GCPChatbot:
             
         except Exception as e:
             print(f"Gemini chat error: {e}")
+            record_fallback('gcp.gemini_chat', 'rag_chat')
             return self._fallback_answer(query, doc_id)
     
     def _get_document_context(self, query: str, doc_id: Optional[str]) -> List[str]:
-        """Get relevant document context for the query."""
+        """
+        Get relevant document context for the query, packed into the
+        CHAT_CONTEXT_TOKENS budget (deduplicated, long clauses trimmed to
+        their most relevant sentences).
+        """
         if not self.embedding_index:
             return []
         
         try:
-            results = self.embedding_index.search(query=query, k=5, doc_id=doc_id)
-            return [result[2] for result in results if result[2]]
+            results = [r for r in self.embedding_index.search(query=query, k=CHAT_CONTEXT_CANDIDATES, doc_id=doc_id) if r[2]]
+            return self.context_packer.pack(query, [r[2] for r in results], [r[1] for r in results])
         except Exception as e:
             print(f"Context retrieval error: {e}")
             return []
@@ -111,7 +122,7 @@ class GCPChatbot:
             if not all_clauses:
                 return "No document content available for analysis."
             
-            document_text = "\n\n".join(all_clauses)
+            document_text = "\n\n".join(self.insights_packer.pack("", all_clauses))
             
             prompt = f"""
             Analyze this legal document and provide comprehensive insights including:
@@ -137,7 +148,7 @@ class GCPChatbot:
                - Financial implications
             
             Document content:
-            {document_text[:6000]}  # Limit to avoid token limits
+            {document_text}
             
             Provide a structured, easy-to-understand analysis.
             """
@@ -170,7 +181,7 @@ class GCPChatbot:
             if not clauses:
                 return ["What is this document about?"]
             
-            document_text = "\n\n".join(clauses)
+            document_text = "\n\n".join(self.insights_packer.pack("", clauses))
             
             prompt = f"""
             Based on this legal document, suggest 5-7 important questions 
@@ -184,7 +195,7 @@ class GCPChatbot:
             - Dispute resolution
             
             Document content:
-            {document_text[:4000]}
+            {document_text}
             
             Provide questions in a simple, conversational format.
             """
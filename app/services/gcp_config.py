@@ -52,6 +52,10 @@ class GCPConfig:
     
     def get_storage_client(self) -> Optional[storage.Client]:
         """Get Google Cloud Storage client."""
+        if os.getenv('STORAGE_EMULATOR_HOST'):
+            # Local fake GCS / emulator (e.g. fake-gcs-server) for development and tests
+            from google.auth.credentials import AnonymousCredentials
+            return storage.Client(project=self.project_id or 'local-emulator', credentials=AnonymousCredentials())
         if not self.project_id or not self.credentials:
             return None
         return storage.Client(project=self.project_id, credentials=self.credentials)
@@ -0,0 +1,137 @@
+"""
+Asynchronous Document AI batch processing for documents too large for the online API.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from google.cloud import documentai
+
+
+DOCUMENTAI_POLL_INTERVAL = float(os.getenv('DOCUMENTAI_POLL_INTERVAL', '5'))
+DOCUMENTAI_BATCH_TIMEOUT = float(os.getenv('DOCUMENTAI_BATCH_TIMEOUT', '900'))
+DOCUMENTAI_GCS_PREFIX = os.getenv('DOCUMENTAI_GCS_PREFIX', 'documentai')
+
+
+class _BatchJob:
+    def __init__(self, job_id: str, operation, future: Future, deadline: float):
+        self.job_id = job_id
+        self.operation = operation
+        self.future = future
+        self.deadline = deadline
+
+
+class DocumentAIBatchRunner:
+    """
+    Runs Document AI batch_process_documents jobs.
+    The input file is staged in Cloud Storage and each submit() returns a Future
+    right away. One shared poller thread checks every outstanding long-running
+    operation, so no request thread sits in a polling loop. When an operation
+    finishes, the JSON shards it wrote are merged back into page-ordered text.
+    """
+
+    def __init__(self, documentai_client, bucket, poll_interval: float = DOCUMENTAI_POLL_INTERVAL,
+                 timeout: float = DOCUMENTAI_BATCH_TIMEOUT, prefix: str = DOCUMENTAI_GCS_PREFIX):
+        self.documentai_client = documentai_client
+        self.bucket = bucket
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.prefix = prefix.strip('/')
+        self._jobs: List[_BatchJob] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def submit(self, file_path: str, processor_name: str, mime_type: str) -> Future:
+        """
+        Stage the file in GCS and start a batch job; the Future resolves to the
+        document text. Cancelling the Future cancels the operation.
+        """
+        job_id = uuid.uuid4().hex
+        input_name = f"{self.prefix}/{job_id}/input/{Path(file_path).name}"
+        self.bucket.blob(input_name).upload_from_filename(file_path, content_type=mime_type)
+        operation = self.documentai_client.batch_process_documents(request={
+            'name': processor_name,
+            'input_documents': {'gcs_documents': {'documents': [
+                {'gcs_uri': f"gs://{self.bucket.name}/{input_name}", 'mime_type': mime_type},
+            ]}},
+            'document_output_config': {'gcs_output_config': {
+                'gcs_uri': f"gs://{self.bucket.name}/{self.prefix}/{job_id}/output/",
+            }},
+        })
+        future: Future = Future()
+        with self._lock:
+            self._jobs.append(_BatchJob(job_id, operation, future, time.monotonic() + self.timeout))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='documentai-poller', daemon=True)
+                self._worker.start()
+        print(f"📄 Document AI batch job {job_id} started for {Path(file_path).name}")
+        return future
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                jobs = list(self._jobs)
+                if not jobs:
+                    self._worker = None
+                    return
+            for job in jobs:
+                try:
+                    finished = self._poll(job)
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                    finished = True
+                if finished:
+                    with self._lock:
+                        self._jobs.remove(job)
+                    self._cleanup(job.job_id)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _poll(self, job: _BatchJob) -> bool:
+        if job.future.cancelled():
+            self._cancel_operation(job)
+            return True
+        if not job.operation.done():
+            if time.monotonic() > job.deadline:
+                self._cancel_operation(job)
+                job.future.set_exception(TimeoutError(f"Document AI batch job {job.job_id} timed out"))
+                return True
+            return False
+        error = job.operation.exception()
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(self.collect_text(f"{self.prefix}/{job.job_id}/output/"))
+        return True
+
+    @staticmethod
+    def _cancel_operation(job: _BatchJob) -> None:
+        try:
+            job.operation.cancel()
+        except Exception:
+            pass
+
+    def collect_text(self, output_prefix: str) -> str:
+        """Merge the Document JSON shards under output_prefix in shard order."""
+        shards: List[Tuple[int, str, str]] = []
+        for blob in self.bucket.list_blobs(prefix=output_prefix):
+            if not blob.name.endswith('.json'):
+                continue
+            document = documentai.Document.from_json(blob.download_as_bytes(), ignore_unknown_fields=True)
+            shards.append((int(document.shard_info.shard_index), blob.name, document.text))
+        shards.sort()
+        return ''.join(text for _, _, text in shards)
+
+    def _cleanup(self, job_id: str) -> None:
+        """Remove the staged input and shard output; failures only leave garbage behind."""
+        try:
+            for blob in self.bucket.list_blobs(prefix=f"{self.prefix}/{job_id}/"):
+                blob.delete()
+        except Exception as e:
+            print(f"⚠️  Document AI batch cleanup failed for {job_id}: {e}")
@@ -2,12 +2,18 @@
 Enhanced OCR service using Google Document AI and Cloud Vision.
 """
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
 from pathlib import Path
-from typing import List, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
 import io
 from PIL import Image
 
 from .gcp_config import gcp_config
+from .metrics import record_fallback, timed
+from .ocr import PyPDF2, iter_document_pages, ocr_image
 from google.cloud import documentai
 
 # Try to import Vision API, fallback gracefully if not available
@@ -18,43 +24,123 @@ except ImportError:
     vision = None
     VISION_API_AVAILABLE = False
 
+# Inline request payload limits; larger files go to the local OCR fallback
+VISION_MAX_INLINE_BYTES = 20 * 1024 * 1024
+DOCUMENTAI_MAX_INLINE_BYTES = 20 * 1024 * 1024
+# Documents above either limit use the asynchronous batch API instead of process_document
+DOCUMENTAI_ONLINE_MAX_PAGES = int(os.getenv('DOCUMENTAI_ONLINE_MAX_PAGES', '15'))
+
+# Multi-page documents are rasterized and sent to batch_annotate_images;
+# 16 images is the API's per-request maximum
+MULTIPAGE_SUFFIXES = {'.pdf', '.tif', '.tiff'}
+VISION_BATCH_SIZE = int(os.getenv('VISION_BATCH_SIZE', '16'))
+VISION_MAX_IN_FLIGHT = int(os.getenv('VISION_MAX_IN_FLIGHT', '4'))
+VISION_PAGE_DPI = int(os.getenv('VISION_PAGE_DPI', '200'))
+
 
 class GCPOCRService:
     """Enhanced OCR service using Google Cloud services."""
     
-    def __init__(self):
+    def __init__(self, vision_client=None, documentai_client=None, documentai_batch_runner=None):
         self.gcp_config = gcp_config
-        self.documentai_client = gcp_config.get_documentai_client()
-        self.vision_client = None
-        if gcp_config.is_gcp_enabled() and VISION_API_AVAILABLE:
+        self.documentai_client = documentai_client or gcp_config.get_documentai_client()
+        self.documentai_processor_id = os.getenv('DOCUMENT_AI_PROCESSOR_ID')
+        self._documentai_batch_runner = documentai_batch_runner
+        self.vision_client = vision_client
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if self.vision_client is None and gcp_config.is_gcp_enabled() and VISION_API_AVAILABLE:
             try:
                 self.vision_client = vision.ImageAnnotatorClient()
             except Exception as e:
                 print(f"⚠️  Vision API client initialization failed: {e}")
                 self.vision_client = None
     
-    def extract_text_with_documentai(self, file_path: str, processor_id: Optional[str] = None) -> str:
+    def documentai_enabled(self) -> bool:
+        return bool(self.documentai_client and self.documentai_processor_id)
+    
+    def documentai_mode(self, file_path: str) -> str:
+        """'online' for small documents, 'batch' above the online page or size limits."""
+        if os.path.getsize(file_path) > DOCUMENTAI_MAX_INLINE_BYTES:
+            return 'batch'
+        return 'batch' if self._page_count(file_path) > DOCUMENTAI_ONLINE_MAX_PAGES else 'online'
+    
+    @staticmethod
+    def _page_count(file_path: str) -> int:
+        suffix = Path(file_path).suffix.lower()
+        try:
+            if suffix == '.pdf' and PyPDF2 is not None:
+                with open(file_path, 'rb') as handle:
+                    return len(PyPDF2.PdfReader(handle).pages)
+            if suffix in ('.tif', '.tiff'):
+                with Image.open(file_path) as image:
+                    return getattr(image, 'n_frames', 1)
+        except Exception:
+            pass
+        return 1
+    
+    def _processor_name(self, processor_id: str) -> str:
+        return f"projects/{self.gcp_config.project_id}/locations/{self.gcp_config.location}/processors/{processor_id}"
+    
+    def _batch_runner(self):
+        if self._documentai_batch_runner is None:
+            from .gcp_storage import gcp_storage_service
+            if not gcp_storage_service.bucket:
+                return None
+            from .gcp_documentai import DocumentAIBatchRunner
+            self._documentai_batch_runner = DocumentAIBatchRunner(self.documentai_client, gcp_storage_service.bucket)
+        return self._documentai_batch_runner
+    
+    def submit_documentai_batch(self, file_path: str, processor_id: Optional[str] = None) -> Optional[Future]:
+        """
+        Start an asynchronous Document AI batch job; returns a Future of the text,
+        or None if batch processing is unavailable (no processor or bucket).
+        """
+        processor_id = processor_id or self.documentai_processor_id
+        runner = self._batch_runner() if self.documentai_client and processor_id else None
+        if runner is None:
+            return None
+        return runner.submit(file_path, self._processor_name(processor_id), self._get_mime_type(file_path))
+    
+    @timed('gcp.documentai')
+    def extract_text_with_documentai(self, source: Union[str, BinaryIO], processor_id: Optional[str] = None,
+                                     timeout: Optional[float] = None, cancel: Optional[threading.Event] = None) -> str:
         """
         Extract text using Google Document AI.
-        Requires a Document AI processor to be set up.
+        Requires a Document AI processor to be set up (DOCUMENT_AI_PROCESSOR_ID).
+        Accepts a path or an open binary file handle. Documents over the online
+        page or size limits are sent through the batch API, waiting up to timeout;
+        setting `cancel` abandons the wait and cancels the batch operation.
         """
+        processor_id = processor_id or self.documentai_processor_id
         if not self.documentai_client or not processor_id:
             return ""
         
+        name = self._source_name(source)
+        if self._get_mime_type(name) == 'application/octet-stream':
+            return ""
+        if name and os.path.exists(name) and self.documentai_mode(name) == 'batch':
+            try:
+                future = self.submit_documentai_batch(name, processor_id)
+                return self._wait_future(future, timeout, cancel) if future is not None else ""
+            except Exception as e:
+                print(f"Document AI batch error: {e}")
+                return ""
+        
         try:
-            # Read the file
-            with open(file_path, 'rb') as image:
-                image_content = image.read()
+            # The request carries the document inline, so it is read once, only if it fits
+            image_content = self._read_source(source, DOCUMENTAI_MAX_INLINE_BYTES)
+            if image_content is None:
+                return ""
             
             # Configure the process request
             raw_document = documentai.RawDocument(
                 content=image_content,
-                mime_type=self._get_mime_type(file_path)
+                mime_type=self._get_mime_type(self._source_name(source))
             )
             
             # Create the request
             request = documentai.ProcessRequest(
-                name=f"projects/{self.gcp_config.project_id}/locations/{self.gcp_config.location}/processors/{processor_id}",
+                name=self._processor_name(processor_id),
                 raw_document=raw_document
             )
             
@@ -69,16 +155,24 @@ class GCPOCRService:
             print(f"Document AI error: {e}")
             return ""
     
-    def extract_text_with_vision(self, file_path: str) -> str:
+    @timed('gcp.vision')
+    def extract_text_with_vision(self, source: Union[str, BinaryIO], cancel: Optional[threading.Event] = None) -> str:
         """
         Extract text using Google Cloud Vision API.
+        Accepts a path or an open binary file handle; PDFs and TIFFs are
+        OCR'd page by page.
         """
         if not self.vision_client:
             return ""
         
+        name = self._source_name(source)
+        if Path(name).suffix.lower() in MULTIPAGE_SUFFIXES:
+            return self.extract_pages_with_vision(name, cancel=cancel)
+        
         try:
-            with open(file_path, 'rb') as image_file:
-                content = image_file.read()
+            content = self._read_source(source, VISION_MAX_INLINE_BYTES)
+            if content is None:
+                return ""
             
             image = vision.Image(content=content)
             response = self.vision_client.text_detection(image=image)
@@ -92,6 +186,7 @@ class GCPOCRService:
             print(f"Vision API error: {e}")
             return ""
     
+    @timed('gcp.vision_image')
     def extract_text_from_image(self, image: Image.Image) -> str:
         """
         Extract text from PIL Image using Vision API.
@@ -100,12 +195,7 @@ class GCPOCRService:
             return ""
         
         try:
-            # Convert PIL image to bytes
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-            
-            image = vision.Image(content=img_byte_arr)
+            image = vision.Image(content=self._encode_image(image))
             response = self.vision_client.text_detection(image=image)
             texts = response.text_annotations
             
@@ -117,6 +207,146 @@ class GCPOCRService:
             print(f"Vision API error: {e}")
             return ""
     
+    @timed('gcp.vision_pages')
+    def extract_pages_with_vision(self, file_path: str, dpi: int = VISION_PAGE_DPI,
+                                  cancel: Optional[threading.Event] = None) -> str:
+        """
+        OCR a PDF or multi-page TIFF with batch_annotate_images.
+        Pages are rasterized lazily and sent in batches of VISION_BATCH_SIZE with
+        at most VISION_MAX_IN_FLIGHT batches outstanding; pages Vision fails on
+        are OCR'd locally. Page order is preserved.
+        """
+        if not self.vision_client:
+            return ""
+        
+        try:
+            pages = (self._encode_image(page) for page in iter_document_pages(file_path, dpi=dpi))
+            return '\n'.join(self.ocr_pages_with_vision(pages, cancel=cancel))
+        except Exception as e:
+            print(f"Vision API error: {e}")
+            return ""
+    
+    def ocr_pages_with_vision(self, pages: Iterable[bytes], cancel: Optional[threading.Event] = None) -> List[str]:
+        """Text of each encoded page image, in input order; stops submitting batches once `cancel` is set."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=VISION_MAX_IN_FLIGHT, thread_name_prefix='vision-batch')
+        texts: Dict[int, str] = {}
+        in_flight = {}
+        
+        def collect(done):
+            for future in done:
+                start, batch = in_flight.pop(future)
+                for offset, text in enumerate(self._batch_texts(future, batch)):
+                    texts[start + offset] = text
+        
+        batches = self._batches(pages)
+        for start, batch in batches:
+            if cancel is not None and cancel.is_set():
+                for future in in_flight:
+                    future.cancel()
+                return []
+            in_flight[self._executor.submit(self._annotate_batch, batch)] = (start, batch)
+            if len(in_flight) >= VISION_MAX_IN_FLIGHT:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(list(in_flight))
+        return [texts[i] for i in range(len(texts))]
+    
+    @staticmethod
+    def _wait_future(future: Future, timeout: Optional[float], cancel: Optional[threading.Event]) -> str:
+        """Result of future, checking `cancel` every half second."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if cancel is not None and cancel.is_set():
+                future.cancel()
+                return ""
+            step = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if step <= 0:
+                future.cancel()
+                return ""
+            try:
+                return future.result(timeout=step)
+            except FuturesTimeout:
+                continue
+    
+    @staticmethod
+    def _batches(pages: Iterable[bytes]) -> Iterator[tuple]:
+        batch: List[bytes] = []
+        start = 0
+        for page in pages:
+            batch.append(page)
+            if len(batch) == VISION_BATCH_SIZE:
+                yield start, batch
+                start += len(batch)
+                batch = []
+        if batch:
+            yield start, batch
+    
+    def _annotate_batch(self, batch: List[bytes]) -> List[Optional[str]]:
+        """One batch_annotate_images call; None marks pages Vision returned an error for."""
+        response = self.vision_client.batch_annotate_images(requests=[
+            {'image': {'content': content}, 'features': [{'type_': 'DOCUMENT_TEXT_DETECTION'}]}
+            for content in batch
+        ])
+        texts: List[Optional[str]] = []
+        for result in response.responses:
+            if result.error.message:
+                texts.append(None)
+            elif result.full_text_annotation.text:
+                texts.append(result.full_text_annotation.text)
+            else:
+                texts.append(result.text_annotations[0].description if result.text_annotations else "")
+        return texts
+    
+    def _batch_texts(self, future, batch: List[bytes]) -> List[str]:
+        """Results of a finished batch, with failed pages OCR'd locally."""
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Vision batch error: {e}")
+            results = [None] * len(batch)
+        results = list(results) + [None] * (len(batch) - len(results))
+        texts = []
+        for content, text in zip(batch, results):
+            if text is None:
+                record_fallback('gcp.vision_page', 'tesseract')
+                try:
+                    with Image.open(io.BytesIO(content)) as page:
+                        text = ocr_image(page)
+                except Exception as e:
+                    print(f"Local OCR fallback error: {e}")
+                    text = ""
+            texts.append(text)
+        return texts
+    
+    @staticmethod
+    def _encode_image(image: Image.Image) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        return buffer.getvalue()
+    
+    @staticmethod
+    def _source_name(source: Union[str, BinaryIO]) -> str:
+        return source if isinstance(source, str) else str(getattr(source, 'name', ''))
+    
+    @staticmethod
+    def _read_source(source: Union[str, BinaryIO], max_bytes: int) -> Optional[bytes]:
+        """Contents of a path or handle, or None if larger than max_bytes (checked before reading)."""
+        handle = open(source, 'rb') if isinstance(source, str) else source
+        try:
+            size = os.fstat(handle.fileno()).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            size = None
+        try:
+            if size is not None and size > max_bytes:
+                print(f"⚠️  {size} byte document exceeds the inline request limit; using local OCR")
+                return None
+            handle.seek(0)
+            return handle.read()
+        finally:
+            if handle is not source:
+                handle.close()
+    
     def _get_mime_type(self, file_path: str) -> str:
         """Get MIME type based on file extension."""
         path = Path(file_path)
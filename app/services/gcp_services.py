@@ -0,0 +1,41 @@
+"""
+Lazily constructed Google Cloud services.
+
+Importing this module does not import any Google client library. Each
+service module is imported, and its global instance built, on first
+attribute access (or by the optional background warm-up).
+"""
+import os
+
+from .lazy import LazyService, start_background_warmup, startup_report
+
+
+gcp_config = LazyService('.gcp_config:gcp_config')
+gcp_ocr_service = LazyService('.gcp_ocr:gcp_ocr_service')
+gcp_summarization_service = LazyService('.gcp_summarize:gcp_summarization_service')
+gcp_chatbot = LazyService('.gcp_chat:gcp_chatbot')
+gcp_storage_service = LazyService('.gcp_storage:gcp_storage_service')
+gcs_upload_pipeline = LazyService('.gcp_storage_pipeline:gcs_upload_pipeline')
+
+# Warm-up order: config first since every other service depends on it
+GCP_SERVICES = {
+    'gcp_config': gcp_config,
+    'gcp_ocr_service': gcp_ocr_service,
+    'gcp_summarization_service': gcp_summarization_service,
+    'gcp_chatbot': gcp_chatbot,
+    'gcp_storage_service': gcp_storage_service,
+    'gcs_upload_pipeline': gcs_upload_pipeline,
+}
+
+
+def maybe_start_warmup():
+    """Start background warm-up when GCP_WARMUP is enabled."""
+    if os.getenv('GCP_WARMUP', '0').lower() not in ('1', 'true', 'yes'):
+        return None
+    delay = float(os.getenv('GCP_WARMUP_DELAY', '2.0'))
+    return start_background_warmup(GCP_SERVICES, delay=delay)
+
+
+def gcp_startup_report() -> dict:
+    """Cold start timings and which services have been initialized so far."""
+    return startup_report(GCP_SERVICES)
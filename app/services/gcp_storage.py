@@ -2,23 +2,40 @@
 Google Cloud Storage service for document management.
 """
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Iterable, Iterator, Tuple
 import uuid
 from datetime import datetime
 
 from .gcp_config import gcp_config
+from .metrics import timed
+
+
+# Maximum number of calls the GCS JSON API accepts in one batch request
+DELETE_BATCH_SIZE = 100
+
+# Server-side projection for listings; only these fields are sent back
+LIST_FIELDS = 'name,size,timeCreated,updated,metadata'
 
 
 class GCPStorageService:
     """Google Cloud Storage service for document storage."""
     
-    def __init__(self, bucket_name: Optional[str] = None):
+    def __init__(self, bucket_name: Optional[str] = None, storage_client=None, client_factory=None):
         self.gcp_config = gcp_config
         self.bucket_name = bucket_name or os.getenv('GCS_BUCKET_NAME')
-        self.storage_client = gcp_config.get_storage_client()
+        self.storage_client = storage_client or gcp_config.get_storage_client()
+        # Batch contexts live on the client, so concurrent batches each need their own client
+        self._client_factory = client_factory or gcp_config.get_storage_client
+        self._thread_local = threading.local()
+        self.pool_size = int(os.getenv('GCS_POOL_SIZE', '16'))
         self.bucket = None
         self._initialize_bucket()
+        if self.bucket:
+            self._configure_connection_pool(self.storage_client)
     
     def _initialize_bucket(self):
         """Initialize Cloud Storage bucket."""
@@ -35,6 +52,22 @@ class GCPStorageService:
             print(f"⚠️  Cloud Storage bucket error: {e}")
             self.bucket = None
     
+    def _configure_connection_pool(self, client):
+        """
+        Size a client's HTTP connection pool so concurrent uploads reuse
+        keep-alive connections instead of queueing on the default 10.
+        Applied to the shared client and to every per-thread client.
+        """
+        try:
+            from requests.adapters import HTTPAdapter
+            http = client._http
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            http.mount('https://', adapter)
+            http.mount('http://', adapter)
+        except Exception as e:
+            print(f"⚠️  Cloud Storage connection pool not configured: {e}")
+    
+    @timed('gcs.upload')
     def upload_document(self, file_path: str, doc_id: str, file_type: str = "document") -> Optional[str]:
         """
         Upload document to Cloud Storage.
@@ -47,18 +80,15 @@ class GCPStorageService:
             # Create GCS path
             gcs_path = f"documents/{doc_id}/{file_type}_{doc_id}"
             
-            # Upload file
+            # Metadata is sent with the upload itself, no separate patch round trip
             blob = self.bucket.blob(gcs_path)
-            blob.upload_from_filename(file_path)
-            
-            # Set metadata
             blob.metadata = {
                 'doc_id': doc_id,
                 'file_type': file_type,
                 'upload_time': datetime.utcnow().isoformat(),
                 'original_filename': Path(file_path).name
             }
-            blob.patch()
+            blob.upload_from_filename(file_path)
             
             print(f"✅ Document uploaded to GCS: {gcs_path}")
             return gcs_path
@@ -67,6 +97,7 @@ class GCPStorageService:
             print(f"❌ Upload error: {e}")
             return None
     
+    @timed('gcs.upload')
     def upload_text_content(self, content: str, doc_id: str, content_type: str = "text") -> Optional[str]:
         """
         Upload text content to Cloud Storage.
@@ -78,14 +109,12 @@ class GCPStorageService:
             gcs_path = f"documents/{doc_id}/{content_type}_{doc_id}.txt"
             
             blob = self.bucket.blob(gcs_path)
-            blob.upload_from_string(content, content_type='text/plain')
-            
             blob.metadata = {
                 'doc_id': doc_id,
                 'content_type': content_type,
                 'upload_time': datetime.utcnow().isoformat()
             }
-            blob.patch()
+            blob.upload_from_string(content, content_type='text/plain')
             
             return gcs_path
             
@@ -129,30 +158,68 @@ class GCPStorageService:
     def list_documents(self, doc_id: Optional[str] = None) -> List[dict]:
         """
         List documents in storage.
+        Materializes the whole listing; prefer iter_documents for large buckets.
         """
         if not self.bucket:
             return []
         
         try:
-            prefix = f"documents/{doc_id}/" if doc_id else "documents/"
-            blobs = self.bucket.list_blobs(prefix=prefix)
-            
-            documents = []
-            for blob in blobs:
-                doc_info = {
-                    'name': blob.name,
-                    'size': blob.size,
-                    'created': blob.time_created,
-                    'updated': blob.updated,
-                    'metadata': blob.metadata or {}
-                }
-                documents.append(doc_info)
-            
-            return documents
+            return list(self.iter_documents(doc_id))
         except Exception as e:
             print(f"❌ List error: {e}")
             return []
     
+    def iter_documents(self, doc_id: Optional[str] = None, page_size: int = 1000,
+                       fields: str = LIST_FIELDS, page_token: Optional[str] = None) -> Iterator[dict]:
+        """
+        Stream document listings one page at a time.
+        Memory stays bounded by page_size regardless of bucket size.
+        """
+        token = page_token
+        while True:
+            documents, token = self.list_documents_page(doc_id, page_size, token, fields)
+            yield from documents
+            if not token:
+                break
+    
+    def list_documents_page(self, doc_id: Optional[str] = None, page_size: int = 1000,
+                            page_token: Optional[str] = None,
+                            fields: str = LIST_FIELDS) -> Tuple[List[dict], Optional[str]]:
+        """
+        Fetch a single page of the listing.
+        Returns (documents, next_page_token); the token is None on the last page.
+        """
+        if not self.bucket:
+            return [], None
+        
+        prefix = f"documents/{doc_id}/" if doc_id else "documents/"
+        blobs, next_token = self._list_blob_page(prefix, page_size, page_token, fields)
+        documents = []
+        for blob in blobs:
+            documents.append({
+                'name': blob.name,
+                'size': blob.size,
+                'created': blob.time_created,
+                'updated': blob.updated,
+                'metadata': blob.metadata or {}
+            })
+        return documents, next_token
+    
+    def _list_blob_page(self, prefix: str, page_size: int, page_token: Optional[str],
+                        fields: str) -> Tuple[list, Optional[str]]:
+        """Fetch one listing page with server-side field projection."""
+        iterator = self.storage_client.list_blobs(
+            self.bucket,
+            prefix=prefix,
+            page_size=page_size,
+            page_token=page_token,
+            fields=f"items({fields}),nextPageToken"
+        )
+        page = next(iterator.pages, None)
+        if page is None:
+            return [], None
+        return list(page), iterator.next_page_token
+    
     def delete_document(self, gcs_path: str) -> bool:
         """
         Delete document from Cloud Storage.
@@ -176,20 +243,88 @@ class GCPStorageService:
             return False
         
         try:
-            prefix = f"documents/{doc_id}/"
-            blobs = self.bucket.list_blobs(prefix=prefix)
-            
-            deleted_count = 0
-            for blob in blobs:
-                blob.delete()
-                deleted_count += 1
-            
+            deleted_count = self.delete_prefix(f"documents/{doc_id}/")
             print(f"✅ Deleted {deleted_count} files for document {doc_id}")
             return True
         except Exception as e:
             print(f"❌ Folder delete error: {e}")
             return False
     
+    @timed('gcs.delete')
+    def delete_prefix(self, prefix: str, max_in_flight: int = 8) -> int:
+        """
+        Delete every object under a prefix using batched requests.
+        Names are streamed page by page and at most max_in_flight batches
+        run concurrently, so memory stays constant for any object count.
+        """
+        if not self.bucket:
+            return 0
+        
+        return self.delete_blobs_batched(self._iter_names(prefix), max_in_flight=max_in_flight)
+    
+    def _iter_names(self, prefix: str, page_size: int = 1000) -> Iterator[str]:
+        """Stream object names under a prefix, fetching only the name field."""
+        token = None
+        while True:
+            blobs, token = self._list_blob_page(prefix, page_size, token, 'name')
+            for blob in blobs:
+                yield blob.name
+            if not token:
+                break
+    
+    def delete_blobs_batched(self, names: Iterable[str], batch_size: int = DELETE_BATCH_SIZE,
+                             max_in_flight: int = 8) -> int:
+        """
+        Delete objects by name in batches of up to batch_size calls each.
+        Returns the number of deletes issued.
+        """
+        if not self.bucket:
+            return 0
+        
+        names = iter(names)
+        deleted = 0
+        with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='gcs-delete') as executor:
+            pending = set()
+            while True:
+                chunk = list(islice(names, batch_size))
+                if not chunk:
+                    break
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    deleted += sum(f.result() for f in done)
+                pending.add(executor.submit(self._delete_batch, chunk))
+            deleted += sum(f.result() for f in pending)
+        return deleted
+    
+    def _delete_batch(self, names: List[str]) -> int:
+        """Delete one chunk of objects in a single batch request."""
+        client = self._thread_client()
+        if client is None:
+            # No per-thread client available; delete with the shared client one by one
+            for name in names:
+                try:
+                    self.bucket.blob(name).delete()
+                except Exception as e:
+                    print(f"❌ Delete error: {e}")
+            return len(names)
+        
+        bucket = client.bucket(self.bucket_name)
+        # Missing objects (already deleted) must not fail the whole batch
+        with client.batch(raise_exception=False):
+            for name in names:
+                bucket.blob(name).delete()
+        return len(names)
+    
+    def _thread_client(self):
+        """Storage client owned by the current thread."""
+        client = getattr(self._thread_local, 'client', None)
+        if client is None:
+            client = self._client_factory()
+            if client is not None:
+                self._configure_connection_pool(client)
+            self._thread_local.client = client
+        return client
+    
     def get_document_metadata(self, gcs_path: str) -> Optional[dict]:
         """
         Get document metadata.
@@ -0,0 +1,203 @@
+"""
+Artifact upload pipeline for Cloud Storage.
+
+Uploads all artifacts of a document concurrently over the storage service's
+pooled client, either inline or from a durable on-disk spool drained by a
+background worker with retry and backoff.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from .gcp_storage import gcp_storage_service
+from .metrics import register_collector, timed
+
+
+class StorageUploadPipeline:
+    """Concurrent, optionally background, uploader for document artifacts."""
+
+    def __init__(self, storage_service=None, max_workers: int = 4, spool_dir: Optional[str] = None,
+                 max_attempts: int = 6, mode: Optional[str] = None):
+        self.storage_service = storage_service or gcp_storage_service
+        self.max_workers = max_workers
+        self.spool_dir = Path(spool_dir or os.getenv('GCS_SPOOL_DIR', 'data/gcs_spool'))
+        self.max_attempts = max_attempts
+        # 'sync' uploads on the request thread, 'background' spools and returns immediately
+        self.mode = (mode or os.getenv('GCS_UPLOAD_MODE', 'sync')).lower()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gcs-upload')
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._lock = threading.Lock()
+        if self.mode == 'background' and self.storage_service.is_available():
+            self.start()
+
+    @staticmethod
+    def file_artifact(path: str, name: str) -> dict:
+        """Describe a local file to upload as `documents/{doc_id}/{name}_{doc_id}`."""
+        return {'type': 'file', 'path': str(path), 'name': name}
+
+    @staticmethod
+    def text_artifact(content: str, name: str) -> dict:
+        """Describe text content to upload as `documents/{doc_id}/{name}_{doc_id}.txt`."""
+        return {'type': 'text', 'content': content, 'name': name}
+
+    def submit(self, doc_id: str, artifacts: List[dict]) -> None:
+        """Upload artifacts using the configured mode."""
+        if not self.storage_service.is_available() or not artifacts:
+            return
+        if self.mode == 'background':
+            self.enqueue(doc_id, artifacts)
+        else:
+            self.upload_artifacts(doc_id, artifacts)
+
+    @timed('gcs.upload_batch')
+    def upload_artifacts(self, doc_id: str, artifacts: List[dict]) -> List[Optional[str]]:
+        """
+        Upload artifacts concurrently.
+        Returns the GCS path for each artifact in order, None for failures.
+        """
+        if len(artifacts) == 1:
+            return [self._upload_one(doc_id, artifacts[0])]
+        return list(self._executor.map(lambda a: self._upload_one(doc_id, a), artifacts))
+
+    def _upload_one(self, doc_id: str, artifact: dict) -> Optional[str]:
+        if artifact['type'] == 'file':
+            if not Path(artifact['path']).exists():
+                return None
+            return self.storage_service.upload_document(artifact['path'], doc_id, artifact['name'])
+        return self.storage_service.upload_text_content(artifact['content'], doc_id, artifact['name'])
+
+    def enqueue(self, doc_id: str, artifacts: List[dict]) -> Path:
+        """Persist an upload job to the spool and wake the background worker."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        job = {'doc_id': doc_id, 'artifacts': artifacts, 'attempts': 0, 'next_attempt': 0.0}
+        job_path = self.spool_dir / f"{time.time_ns()}_{doc_id}.json"
+        self._write_job(job_path, job)
+        self.start()
+        self._wakeup.set()
+        return job_path
+
+    def discard_jobs(self, doc_id: str) -> int:
+        """
+        Drop spooled upload jobs for a deleted document so they cannot recreate its files.
+        A job already claimed by a worker still finishes.
+        """
+        if not self.spool_dir.exists():
+            return 0
+        discarded = 0
+        for job_path in self.spool_dir.glob(f"*_{glob.escape(doc_id)}.json"):
+            try:
+                job_path.unlink()
+                discarded += 1
+            except OSError:
+                pass
+        return discarded
+
+    def start(self) -> None:
+        """Start the background worker, recovering jobs left by a previous process."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._recover_inflight()
+            self._worker = threading.Thread(target=self._run, name='gcs-spool-worker', daemon=True)
+            self._worker.start()
+
+    def pending_jobs(self) -> int:
+        """Number of jobs waiting in the spool."""
+        if not self.spool_dir.exists():
+            return 0
+        return len(list(self.spool_dir.glob('*.json')))
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"❌ GCS spool worker error: {e}")
+            self._wakeup.wait(timeout=5.0)
+            self._wakeup.clear()
+
+    def drain(self) -> int:
+        """
+        Process every due job in the spool once.
+        Returns the number of jobs completed.
+        """
+        if not self.spool_dir.exists():
+            return 0
+        completed = 0
+        now = time.time()
+        for job_path in sorted(self.spool_dir.glob('*.json')):
+            # Claim the job by renaming it so concurrent workers never share it
+            claimed = job_path.with_name(f"{job_path.name}.{os.getpid()}.inflight")
+            try:
+                job = json.loads(job_path.read_text(encoding='utf-8'))
+                if job.get('next_attempt', 0.0) > now:
+                    continue
+                os.replace(job_path, claimed)
+            except (OSError, ValueError):
+                continue
+
+            results = self.upload_artifacts(job['doc_id'], job['artifacts'])
+            remaining = [a for a, r in zip(job['artifacts'], results)
+                         if r is None and not (a['type'] == 'file' and not Path(a['path']).exists())]
+            if not remaining:
+                claimed.unlink()
+                completed += 1
+                continue
+
+            job['artifacts'] = remaining
+            job['attempts'] += 1
+            if job['attempts'] >= self.max_attempts:
+                failed_dir = self.spool_dir / 'failed'
+                failed_dir.mkdir(exist_ok=True)
+                self._write_job(failed_dir / job_path.name, job)
+                print(f"❌ Giving up on GCS upload for {job['doc_id']} after {job['attempts']} attempts")
+            else:
+                job['next_attempt'] = time.time() + min(300.0, 2.0 ** job['attempts'])
+                self._write_job(job_path, job)
+            claimed.unlink()
+        return completed
+
+    def _recover_inflight(self) -> None:
+        """Return jobs claimed by processes that no longer exist to the spool."""
+        if not self.spool_dir.exists():
+            return
+        for claimed in self.spool_dir.glob('*.inflight'):
+            job_name, pid = claimed.name[:-len('.inflight')].rsplit('.', 1)
+            if pid.isdigit() and int(pid) != os.getpid() and self._pid_alive(int(pid)):
+                continue
+            try:
+                os.replace(claimed, self.spool_dir / job_name)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def _write_job(path: Path, job: dict) -> None:
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(job), encoding='utf-8')
+        os.replace(tmp, path)
+
+
+# Global upload pipeline instance
+gcs_upload_pipeline = StorageUploadPipeline()
+
+
+def _spool_samples():
+    if gcs_upload_pipeline.mode == 'background':
+        yield ('ldd_gcs_spool_pending_jobs', 'gauge', 'Upload jobs waiting in the GCS spool.', {}, gcs_upload_pipeline.pending_jobs())
+
+
+register_collector(_spool_samples)
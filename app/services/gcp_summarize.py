@@ -1,8 +1,10 @@
 """
 Enhanced summarization service using Google Vertex AI and Gemini.
 """
+import json
 import os
-from typing import List, Optional
+import re
+from typing import Dict, List, Optional
 import google.generativeai as genai
 
 # Try to import Vertex AI models, fallback gracefully if not available
@@ -21,6 +23,52 @@ except ImportError:
     PREVIEW_VERTEX_AI_AVAILABLE = False
 
 from .gcp_config import gcp_config
+from .metrics import timed
+
+
+GEMINI_COMBINED_ANALYSIS = os.getenv('GEMINI_COMBINED_ANALYSIS', '1') != '0'
+RISK_LEVELS = {'High': 100, 'Medium': 60, 'Low': 30}
+
+_STRING = {'type': 'STRING'}
+RISK_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'risk_level': {'type': 'STRING', 'enum': list(RISK_LEVELS)},
+        'description': _STRING,
+        'reason': _STRING,
+        'action': _STRING,
+        'clause': _STRING,
+    },
+    'required': ['risk_level', 'description'],
+}
+CLAUSE_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'type': _STRING,
+        'description': _STRING,
+        'details': _STRING,
+        'importance': {'type': 'STRING', 'enum': list(RISK_LEVELS)},
+    },
+    'required': ['type', 'description'],
+}
+
+
+def supports_json_mode() -> bool:
+    """
+    Whether the installed google-generativeai accepts response_mime_type and
+    response_schema. The pinned 0.3.2 does not, so with it the schema goes in
+    the prompt and _decode_analysis is what validates the reply.
+    """
+    config = getattr(getattr(genai, 'types', None), 'GenerationConfig', None)
+    return 'response_schema' in getattr(config, '__dataclass_fields__', {})
+
+
+def analysis_schema(include_clauses: bool = False) -> dict:
+    """Response schema for the combined analysis call."""
+    properties = {'summary': _STRING, 'risks': {'type': 'ARRAY', 'items': RISK_SCHEMA}}
+    if include_clauses:
+        properties['clauses'] = {'type': 'ARRAY', 'items': CLAUSE_SCHEMA}
+    return {'type': 'OBJECT', 'properties': properties, 'required': list(properties)}
 
 
 class GCPSummarizationService:
@@ -30,6 +78,8 @@ class GCPSummarizationService:
         self.gcp_config = gcp_config
         self.gemini_model = None
         self.vertex_model = None
+        # Without JSON mode in the installed SDK the prompt asks for JSON instead
+        self._structured_output = supports_json_mode()
         self._initialize_models()
     
     def _initialize_models(self):
@@ -55,6 +105,7 @@ class GCPSummarizationService:
         except Exception as e:
             print(f"⚠️  AI model initialization failed: {e}")
     
+    @timed('gcp.gemini_summary')
     def summarize_with_gemini(self, text: str, max_length: int = 500) -> str:
         """
         Summarize text using Gemini API.
@@ -79,6 +130,100 @@ class GCPSummarizationService:
             print(f"Gemini summarization error: {e}")
             return self._fallback_summary(text)
     
+    def combined_analysis_enabled(self) -> bool:
+        return GEMINI_COMBINED_ANALYSIS and self.gemini_model is not None
+    
+    @timed('gcp.gemini_analysis')
+    def analyze_document(self, text: str, max_length: int = 500, include_clauses: bool = False) -> Optional[Dict]:
+        """
+        Summary, risks and (optionally) key clauses from a single Gemini request.
+        The reply follows a JSON schema (enforced by the SDK's JSON mode when it
+        has one, otherwise requested in the prompt) and is validated in one pass.
+        Returns None when Gemini is unavailable or the reply does not validate,
+        so callers can fall back to the per-task methods.
+        """
+        if not self.gemini_model:
+            return None
+        
+        wanted = "a summary, the risks" + (" and the key clauses" if include_clauses else "")
+        prompt = f"""
+            Analyze the following legal document and return {wanted} as JSON.
+            - summary: a clear, plain-language summary under {max_length} words covering the
+              key points, important clauses and main obligations.
+            - risks: clauses that might be problematic for the signer, each with risk_level
+              (High/Medium/Low), description, reason (why it is concerning), action (suggested
+              next step) and clause (a short quote of the clause).
+            {"- clauses: key clauses, each with type (e.g. Payment Terms, Termination, Liability), description, details and importance (High/Medium/Low)." if include_clauses else ""}
+            
+            Document text:
+            {text[:4000]}
+            """
+        
+        try:
+            response = self._generate_json(prompt, analysis_schema(include_clauses))
+            return self._decode_analysis(response.text, include_clauses)
+        except Exception as e:
+            print(f"Gemini combined analysis error: {e}")
+            return None
+    
+    def _generate_json(self, prompt: str, schema: dict):
+        if self._structured_output:
+            try:
+                return self.gemini_model.generate_content(prompt, generation_config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': schema,
+                })
+            except (TypeError, ValueError, KeyError) as e:
+                # Older google-generativeai releases have no JSON mode
+                print(f"⚠️  Gemini structured output unavailable, prompting for JSON instead: {e}")
+                self._structured_output = False
+        return self.gemini_model.generate_content(
+            f"{prompt}\nRespond with only a JSON object matching this schema:\n{json.dumps(schema)}"
+        )
+    
+    def _decode_analysis(self, raw: str, include_clauses: bool) -> Optional[Dict]:
+        """Validate the combined reply; None if it is not the expected shape."""
+        raw = re.sub(r'^\s*```(?:json)?\s*|\s*```\s*$', '', raw or '')
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            print("⚠️  Gemini combined analysis returned invalid JSON")
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get('summary'), str) or not data['summary'].strip():
+            return None
+        risks = [self._normalize_risk(r) for r in data.get('risks') or [] if isinstance(r, dict) and r.get('description')]
+        analysis = {'summary': data['summary'].strip(), 'risks': risks}
+        if include_clauses:
+            analysis['clauses'] = [
+                {
+                    'type': str(c.get('type') or 'General'),
+                    'description': str(c['description']),
+                    'details': str(c.get('details') or ''),
+                    'importance': self._level(c.get('importance')),
+                }
+                for c in data.get('clauses') or [] if isinstance(c, dict) and c.get('description')
+            ]
+        return analysis
+    
+    @staticmethod
+    def _level(value) -> str:
+        level = str(value or '').strip().title()
+        return level if level in RISK_LEVELS else 'Medium'
+    
+    def _normalize_risk(self, risk: dict) -> dict:
+        level = self._level(risk.get('risk_level'))
+        description = str(risk['description'])
+        return {
+            'risk_level': level,
+            'risk_percent': RISK_LEVELS[level],
+            'description': description,
+            'reason': str(risk.get('reason') or ''),
+            'action': str(risk.get('action') or ''),
+            'labels': [f"{level} risk"],
+            'preview': str(risk.get('clause') or description)[:240],
+        }
+    
+    @timed('gcp.vertex_summary')
     def summarize_with_vertex(self, text: str, max_length: int = 500) -> str:
         """
         Summarize text using Vertex AI.
@@ -109,6 +254,38 @@ class GCPSummarizationService:
             print(f"Vertex AI summarization error: {e}")
             return self._fallback_summary(text)
     
+    @timed('gcp.gemini_revision')
+    def summarize_revision(self, previous_summary: str, changes_text: str, max_length: int = 500) -> str:
+        """
+        Update an existing summary for a revised draft using only the changed clauses.
+        Returns an empty string when Gemini is unavailable so callers can fall back.
+        """
+        if not self.gemini_model:
+            return ""
+        
+        try:
+            prompt = f"""
+            Below is a plain-language summary of a legal document, followed by the clauses
+            that changed in a revised draft. Changes use [-removed-] and {{+added+}} markers.
+            Rewrite the summary so it describes the revised document, and end with a short
+            "What changed" section covering the edits that matter to the signer.
+            Keep it under {max_length} words and use plain language.
+            
+            Current summary:
+            {previous_summary}
+            
+            Changed clauses:
+            {changes_text[:4000]}
+            """
+            
+            response = self.gemini_model.generate_content(prompt)
+            return response.text.strip()
+            
+        except Exception as e:
+            print(f"Gemini revision summary error: {e}")
+            return ""
+    
+    @timed('gcp.gemini_risks')
     def analyze_legal_risks(self, text: str) -> List[dict]:
         """
         Analyze legal risks using AI.
@@ -139,6 +316,7 @@ class GCPSummarizationService:
             print(f"Risk analysis error: {e}")
             return self._fallback_risk_analysis(text)
     
+    @timed('gcp.gemini_clauses')
     def extract_key_clauses(self, text: str) -> List[dict]:
         """
         Extract and categorize key legal clauses.
@@ -0,0 +1,120 @@
+from importlib import import_module
+from typing import Any, Dict, Iterable, List, Optional
+import threading
+import time
+
+
+_startup: Dict[str, Any] = {
+	'app_ready_s': None,
+	'create_app_s': None,
+	'services': {},
+	'warmup': {'enabled': False, 'started': False, 'completed': False, 'duration_s': None},
+}
+_startup_lock = threading.Lock()
+
+
+class LazyService:
+	"""Proxy for a module-level service instance that is imported and built on first use.
+
+	`target` is `'module:attribute'`, relative to this package when it starts with a dot.
+	"""
+
+	def __init__(self, target: str):
+		module, _, attr = target.partition(':')
+		object.__setattr__(self, '_module', module)
+		object.__setattr__(self, '_attr', attr)
+		object.__setattr__(self, '_instance', None)
+		object.__setattr__(self, '_lock', threading.Lock())
+
+	def lazy_resolve(self, trigger: str = 'request') -> Any:
+		instance = self._instance
+		if instance is not None:
+			return instance
+		with self._lock:
+			if self._instance is None:
+				start = time.perf_counter()
+				module = import_module(self._module, package=__package__)
+				object.__setattr__(self, '_instance', getattr(module, self._attr))
+				with _startup_lock:
+					_startup['services'][self._attr] = {
+						'init_s': round(time.perf_counter() - start, 4),
+						'trigger': trigger,
+					}
+			return self._instance
+
+	def lazy_loaded(self) -> bool:
+		return self._instance is not None
+
+	def __getattr__(self, name: str) -> Any:
+		return getattr(self.lazy_resolve(), name)
+
+	def __setattr__(self, name: str, value: Any) -> None:
+		setattr(self.lazy_resolve(), name, value)
+
+	def __repr__(self) -> str:
+		state = 'loaded' if self.lazy_loaded() else 'not loaded'
+		return f"<LazyService {self._module}:{self._attr} ({state})>"
+
+
+def preload_modules(names: Iterable[str]) -> List[str]:
+	"""Import modules ahead of time, e.g. in a preforking master, and return the ones that loaded.
+
+	Only libraries and modules without import-time side effects belong here:
+	service instances, their clients and threads must still be built after the fork.
+	"""
+	loaded = []
+	for name in names:
+		try:
+			import_module(name, package=__package__)
+		except Exception:
+			# Optional dependency that is not installed
+			continue
+		loaded.append(name)
+	return loaded
+
+
+def record_app_ready(import_started: float, create_started: float) -> None:
+	now = time.perf_counter()
+	with _startup_lock:
+		_startup['app_ready_s'] = round(now - import_started, 4)
+		_startup['create_app_s'] = round(now - create_started, 4)
+	print(f"⏱️  App ready in {_startup['app_ready_s']:.2f}s (create_app {_startup['create_app_s']:.2f}s)")
+
+
+def warm_up(services: Dict[str, LazyService], delay: float = 0.0) -> None:
+	"""Resolve services in order, off the request path."""
+	if delay > 0:
+		time.sleep(delay)
+	start = time.perf_counter()
+	with _startup_lock:
+		_startup['warmup']['started'] = True
+	for name, service in services.items():
+		try:
+			service.lazy_resolve(trigger='warmup')
+		except Exception as e:
+			print(f"⚠️  Warm-up of {name} failed: {e}")
+	with _startup_lock:
+		_startup['warmup']['completed'] = True
+		_startup['warmup']['duration_s'] = round(time.perf_counter() - start, 4)
+	print(f"⏱️  Background warm-up finished in {_startup['warmup']['duration_s']:.2f}s")
+
+
+def start_background_warmup(services: Dict[str, LazyService], delay: float = 2.0) -> Optional[threading.Thread]:
+	with _startup_lock:
+		_startup['warmup']['enabled'] = True
+	thread = threading.Thread(target=warm_up, args=(services, delay), name='service-warmup', daemon=True)
+	thread.start()
+	return thread
+
+
+def startup_report(services: Optional[Dict[str, LazyService]] = None) -> Dict[str, Any]:
+	with _startup_lock:
+		report = {
+			'app_ready_s': _startup['app_ready_s'],
+			'create_app_s': _startup['create_app_s'],
+			'services': {k: dict(v) for k, v in _startup['services'].items()},
+			'warmup': dict(_startup['warmup']),
+		}
+	for name, service in (services or {}).items():
+		report['services'].setdefault(name, {})['initialized'] = service.lazy_loaded()
+	return report
@@ -0,0 +1,201 @@
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import glob
+import json
+import os
+import re
+import threading
+import time
+try:
+	import fcntl  # type: ignore
+except ImportError:
+	fcntl = None
+
+from .metrics import count
+
+
+PROCESSED_DIR = Path('data/processed')
+UPLOAD_DIR = Path('data/uploads')
+# 0 keeps documents until they are deleted explicitly
+DOC_TTL_DAYS = float(os.environ.get('DOC_TTL_DAYS', '0'))
+RETENTION_SWEEP_INTERVAL = float(os.environ.get('RETENTION_SWEEP_INTERVAL', '3600'))
+RETENTION_SWEEP_OPS = float(os.environ.get('RETENTION_SWEEP_OPS', '20'))
+DOC_ID = re.compile(r'^[A-Za-z0-9-]+$')
+MANIFEST_SUFFIX = '_manifest.json'
+
+
+def manifest_path(doc_id: str) -> Path:
+	return PROCESSED_DIR / f'{doc_id}{MANIFEST_SUFFIX}'
+
+
+def load_manifest(doc_id: str) -> Optional[Dict]:
+	try:
+		return json.loads(manifest_path(doc_id).read_text(encoding='utf-8'))
+	except (OSError, ValueError):
+		return None
+
+
+def record_artifacts(doc_id: str, paths: Iterable[Path] = ()) -> Dict:
+	"""Add local artifact paths to a document's manifest, creating it on first use.
+
+	The manifest also remembers when the document was created and last
+	updated (retention is measured from the update) and its GCS prefix.
+	"""
+	now = time.time()
+	manifest = load_manifest(doc_id) or {'doc_id': doc_id, 'created': now, 'artifacts': [], 'gcs_prefix': f'documents/{doc_id}/'}
+	for path in paths:
+		name = str(path)
+		if name not in manifest['artifacts']:
+			manifest['artifacts'].append(name)
+	manifest['updated'] = now
+	path = manifest_path(doc_id)
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+	tmp.write_text(json.dumps(manifest), encoding='utf-8')
+	os.replace(tmp, path)
+	return manifest
+
+
+def local_artifacts(doc_id: str) -> List[Path]:
+	"""Every local file of a document: manifest entries plus anything named after it
+	(documents from before manifests existed, revision uploads), manifest last."""
+	found: Dict[str, Path] = {}
+	for name in (load_manifest(doc_id) or {}).get('artifacts', []):
+		found[str(Path(name))] = Path(name)
+	for directory in (PROCESSED_DIR, UPLOAD_DIR):
+		for path in directory.glob(f'{glob.escape(doc_id)}_*'):
+			found.setdefault(str(path), path)
+	manifest = str(manifest_path(doc_id))
+	found.pop(manifest, None)
+	return sorted(found.values()) + [manifest_path(doc_id)]
+
+
+class RateLimiter:
+	"""Spaces out operations to at most `rate` per second (0 = unlimited)."""
+
+	def __init__(self, rate: float):
+		self.interval = 1.0 / rate if rate > 0 else 0.0
+		self._next = 0.0
+
+	def wait(self) -> None:
+		if not self.interval:
+			return
+		now = time.monotonic()
+		if self._next > now:
+			time.sleep(self._next - now)
+		self._next = max(now, self._next) + self.interval
+
+
+def remove_local_artifacts(doc_id: str, limiter: Optional[RateLimiter] = None) -> int:
+	removed = 0
+	for path in local_artifacts(doc_id):
+		if limiter is not None:
+			limiter.wait()
+		try:
+			path.unlink()
+			removed += 1
+		except FileNotFoundError:
+			pass
+		except OSError as e:
+			print(f"⚠️  Could not delete {path}: {e}")
+	return removed
+
+
+class LifecycleManager:
+	"""Deletes documents everywhere they live and expires them after DOC_TTL_DAYS.
+
+	A delete removes the document from the clause and near-duplicate indexes,
+	drops its pending GCS uploads and its GCS folder, runs the `on_delete`
+	hooks (caches, exports) and unlinks every local artifact. The manifest
+	goes last, so an interrupted delete is finished by the next sweep.
+	"""
+
+	def __init__(self, indexes: Callable[[], Iterable], storage=None, upload_pipeline=None,
+	             on_delete: Iterable[Callable[[str], object]] = (), ttl_days: float = DOC_TTL_DAYS,
+	             sweep_interval: float = RETENTION_SWEEP_INTERVAL, sweep_ops: float = RETENTION_SWEEP_OPS):
+		self.indexes = indexes
+		self.storage = storage
+		self.upload_pipeline = upload_pipeline
+		self.on_delete = list(on_delete)
+		self.ttl_days = ttl_days
+		self.sweep_interval = sweep_interval
+		self.sweep_ops = sweep_ops
+		self._sweeper: Optional[threading.Thread] = None
+
+	def delete(self, doc_id: str, limiter: Optional[RateLimiter] = None, reason: str = 'request') -> bool:
+		if not DOC_ID.match(doc_id):
+			return False
+		if self.upload_pipeline is not None:
+			self.upload_pipeline.discard_jobs(doc_id)
+		for index in self.indexes():
+			try:
+				index.remove_document(doc_id)
+			except Exception as e:
+				print(f"⚠️  Index removal failed for {doc_id}: {e}")
+		for hook in self.on_delete:
+			hook(doc_id)
+		if self.storage is not None and self.storage.is_available():
+			if limiter is not None:
+				limiter.wait()
+			self.storage.delete_document_folder(doc_id)
+		removed = remove_local_artifacts(doc_id, limiter)
+		count('ldd_documents_deleted_total', reason=reason)
+		print(f"🗑️  Deleted {doc_id} ({removed} local files, reason: {reason})")
+		return True
+
+	def expired(self, now: Optional[float] = None) -> Iterator[str]:
+		"""Documents last updated more than ttl_days ago, by manifest or (legacy) summary mtime."""
+		if not self.ttl_days or not PROCESSED_DIR.exists():
+			return
+		cutoff = (now or time.time()) - self.ttl_days * 86400
+		seen = set()
+		for path in PROCESSED_DIR.glob(f'*{MANIFEST_SUFFIX}'):
+			doc_id = path.name[:-len(MANIFEST_SUFFIX)]
+			seen.add(doc_id)
+			manifest = load_manifest(doc_id) or {}
+			if manifest.get('updated', path.stat().st_mtime) < cutoff:
+				yield doc_id
+		for path in PROCESSED_DIR.glob('*_summary.bin'):
+			doc_id = path.name[:-len('_summary.bin')]
+			if doc_id not in seen and path.stat().st_mtime < cutoff:
+				yield doc_id
+
+	def sweep(self, now: Optional[float] = None) -> int:
+		"""Delete expired documents, spacing file and GCS operations to sweep_ops per second."""
+		limiter = RateLimiter(self.sweep_ops)
+		deleted = 0
+		for doc_id in list(self.expired(now)):
+			if self.delete(doc_id, limiter, reason='retention'):
+				deleted += 1
+		return deleted
+
+	def _sweep_locked(self) -> int:
+		# Only one process sweeps at a time; the others skip this round
+		if fcntl is None:
+			return self.sweep()
+		PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+		with open(PROCESSED_DIR / '.sweep.lock', 'a+b') as fh:
+			try:
+				fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except OSError:
+				return 0
+			try:
+				return self.sweep()
+			finally:
+				fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+	def _run(self) -> None:
+		while True:
+			try:
+				self._sweep_locked()
+			except Exception as e:
+				print(f"❌ Retention sweep error: {e}")
+			time.sleep(self.sweep_interval)
+
+	def maybe_start_sweeper(self) -> Optional[threading.Thread]:
+		"""Start the background retention sweeper when DOC_TTL_DAYS is set."""
+		if not self.ttl_days or (self._sweeper is not None and self._sweeper.is_alive()):
+			return self._sweeper
+		self._sweeper = threading.Thread(target=self._run, name='retention-sweeper', daemon=True)
+		self._sweeper.start()
+		return self._sweeper
@@ -0,0 +1,197 @@
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Tuple
+import os
+import threading
+import time
+
+
+# METRICS_ENABLED=0 turns every helper below into a no-op; `timed` then returns
+# the function undecorated, so disabled instrumentation costs nothing per call
+ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# A collector returns (name, type, help, labels, value) samples read at scrape time
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+	return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+	pairs = labels + extra
+	if not pairs:
+		return ''
+	escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+	return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+	return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+	"""In-process counters and latency histograms rendered in Prometheus text format."""
+
+	def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+		self.buckets = buckets
+		self._lock = threading.Lock()
+		self._help: Dict[str, Tuple[str, str]] = {}
+		self._counters: Dict[str, Dict[Labels, float]] = {}
+		# name -> labels -> [count per bucket..., +Inf count, sum]
+		self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+		self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+	def describe(self, name: str, kind: str, help_text: str) -> None:
+		self._help[name] = (kind, help_text)
+
+	def inc(self, name: str, amount: float = 1, **labels) -> None:
+		key = _labels(labels)
+		with self._lock:
+			series = self._counters.setdefault(name, {})
+			series[key] = series.get(key, 0) + amount
+
+	def observe(self, name: str, value: float, **labels) -> None:
+		key = _labels(labels)
+		slot = bisect_left(self.buckets, value)
+		with self._lock:
+			series = self._histograms.setdefault(name, {})
+			counts = series.get(key)
+			if counts is None:
+				counts = series[key] = [0] * (len(self.buckets) + 2)
+			counts[slot] += 1
+			counts[-1] += value
+
+	def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+		self._collectors.append(collector)
+
+	def render(self) -> str:
+		with self._lock:
+			counters = {name: dict(series) for name, series in self._counters.items()}
+			histograms = {name: {k: list(v) for k, v in series.items()} for name, series in self._histograms.items()}
+		# Collector samples join the counter/gauge family of the same name
+		for collector in self._collectors:
+			try:
+				samples = list(collector())
+			except Exception:
+				continue
+			for name, kind, help_text, labels, value in samples:
+				self._help.setdefault(name, (kind, help_text))
+				counters.setdefault(name, {})[_labels(labels)] = value
+
+		lines: List[str] = []
+		for name in sorted(set(counters) | set(histograms)):
+			kind, help_text = self._help.get(name, ('histogram' if name in histograms else 'counter', name))
+			lines.append(f'# HELP {name} {help_text}')
+			lines.append(f'# TYPE {name} {kind}')
+			for labels, value in sorted(counters.get(name, {}).items()):
+				lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+			for labels, counts in sorted(histograms.get(name, {}).items()):
+				cumulative = 0
+				for bound, count in zip(self.buckets, counts):
+					cumulative += count
+					lines.append(f'{name}_bucket{_format_labels(labels, (("le", repr(bound)),))} {cumulative}')
+				cumulative += counts[len(self.buckets)]
+				lines.append(f'{name}_bucket{_format_labels(labels, (("le", "+Inf"),))} {cumulative}')
+				lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(counts[-1])}')
+				lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+		return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+registry.describe('ldd_stage_seconds', 'histogram', 'Time spent in each processing stage.')
+registry.describe('ldd_stage_errors_total', 'counter', 'Exceptions raised out of a processing stage.')
+registry.describe('ldd_fallback_total', 'counter', 'Times a stage fell back to a slower or local path.')
+registry.describe('ldd_cache_requests_total', 'counter', 'Cache lookups by cache and result (hit/miss).')
+registry.describe('ldd_ocr_winner_total', 'counter', 'Hedged extractions by the source whose text was used.')
+registry.describe('ldd_ocr_blank_pages_total', 'counter', 'Scanned pages skipped by OCR preprocessing as blank.')
+registry.describe('ldd_documents_deleted_total', 'counter', 'Documents deleted with all their artifacts, by reason.')
+registry.describe('ldd_request_seconds', 'histogram', 'HTTP request latency by endpoint.')
+registry.describe('ldd_requests_total', 'counter', 'HTTP requests by endpoint and status code.')
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+	if ENABLED:
+		registry.observe('ldd_stage_seconds', seconds, stage=stage)
+
+
+@contextmanager
+def _stage_timer(stage: str):
+	start = time.perf_counter()
+	try:
+		yield
+	except BaseException:
+		registry.inc('ldd_stage_errors_total', stage=stage)
+		raise
+	finally:
+		registry.observe('ldd_stage_seconds', time.perf_counter() - start, stage=stage)
+
+
+def timer(stage: str):
+	"""`with timer('ocr.local'): ...` records the block's latency under that stage."""
+	return _stage_timer(stage) if ENABLED else nullcontext()
+
+
+def timed(stage: str):
+	"""Decorator form of timer()."""
+	def decorate(fn):
+		if not ENABLED:
+			return fn
+
+		@wraps(fn)
+		def wrapper(*args, **kwargs):
+			with _stage_timer(stage):
+				return fn(*args, **kwargs)
+		return wrapper
+	return decorate
+
+
+def record_fallback(stage: str, fallback: str) -> None:
+	if ENABLED:
+		registry.inc('ldd_fallback_total', stage=stage, fallback=fallback)
+
+
+def count(name: str, amount: float = 1, **labels) -> None:
+	if ENABLED:
+		registry.inc(name, amount, **labels)
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0) -> None:
+	if not ENABLED:
+		return
+	if hits:
+		registry.inc('ldd_cache_requests_total', hits, cache=cache, result='hit')
+	if misses:
+		registry.inc('ldd_cache_requests_total', misses, cache=cache, result='miss')
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> None:
+	registry.register_collector(collector)
+
+
+def render_prometheus() -> str:
+	return registry.render()
+
+
+def init_app(app) -> None:
+	"""Per-endpoint request latency and status counts."""
+	if not ENABLED:
+		return
+	from flask import g, request
+
+	@app.before_request
+	def _start_timer():
+		g._metrics_started = time.perf_counter()
+
+	@app.after_request
+	def _record_request(response):
+		started = g.pop('_metrics_started', None)
+		if started is not None:
+			endpoint = request.endpoint or 'unmatched'
+			registry.observe('ldd_request_seconds', time.perf_counter() - started, endpoint=endpoint)
+			registry.inc('ldd_requests_total', endpoint=endpoint, status=response.status_code)
+		return response
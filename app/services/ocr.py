@@ -1,9 +1,10 @@
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional
 import os
 import platform
+import threading
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageSequence
 import io
 try:
 	import pdf2image  # type: ignore
@@ -14,6 +15,10 @@ try:
 except Exception:
 	PyPDF2 = None
 
+from . import preprocess
+from .metrics import count, record_fallback, timed
+from .tesseract_pool import create_tesseract_pool
+
 
 def _configure_tesseract_on_windows() -> None:
 	if platform.system().lower() != 'windows':
@@ -33,52 +38,165 @@ def _configure_tesseract_on_windows() -> None:
 
 _configure_tesseract_on_windows()
 
+# Warm in-process engines when tesserocr is available; pytesseract otherwise
+tesseract_pool = create_tesseract_pool()
+
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.tiff', '.bmp'}
 
-def extract_text_from_file(file_path: str) -> str:
+
+def native_text(file_path: str) -> Optional[str]:
+	"""Text available without OCR (plain-text files, PDFs with a text layer), else None."""
+	path = Path(file_path)
+	suffix = path.suffix.lower()
+	if suffix in IMAGE_SUFFIXES:
+		return None
+	if suffix != '.pdf':
+		# treat as plain text
+		return path.read_text(encoding='utf-8', errors='ignore')
+	if PyPDF2 is None:
+		return None
+	try:
+		# A handle keeps PyPDF2 reading lazily; given a path it loads the whole file
+		with open(path, 'rb') as handle:
+			reader = PyPDF2.PdfReader(handle)
+			buf: List[str] = []
+			for page in reader.pages:
+				try:
+					buf.append(page.extract_text() or '')
+				except Exception:
+					pass
+		native = '\n'.join(buf).strip()
+		if len(native) > 50:  # accept shorter too
+			return native
+	except Exception:
+		pass
+	return None
+
+
+@timed('ocr.local')
+def extract_text_from_file(file_path: str, cancel: Optional[threading.Event] = None) -> str:
+	text = native_text(file_path)
+	if text is not None:
+		return text
+	if Path(file_path).suffix.lower() == '.pdf':
+		record_fallback('ocr.pdf_text', 'tesseract')
+	return ocr_file(file_path, cancel)
+
+
+def ocr_file(file_path: str, cancel: Optional[threading.Event] = None) -> str:
+	"""Tesseract OCR of an image or scanned PDF; a set `cancel` event stops between pages."""
 	path = Path(file_path)
 	collected_text: List[str] = []
-	if path.suffix.lower() in {'.png', '.jpg', '.jpeg', '.tiff', '.bmp'}:
-		collected_text.append(ocr_image(Image.open(path)))
+	if path.suffix.lower() in IMAGE_SUFFIXES:
+		with Image.open(path) as image:
+			if preprocess.is_enabled():
+				page = preprocess.prepare_page(image, rescale=True)
+				collected_text.append(ocr_image(page) if page is not None else '')
+			else:
+				collected_text.append(ocr_image(image))
 	elif path.suffix.lower() == '.pdf':
-		# Prefer native text if available
-		if PyPDF2 is not None:
-			try:
-				reader = PyPDF2.PdfReader(str(path))
-				buf: List[str] = []
-				for page in reader.pages:
-					try:
-						buf.append(page.extract_text() or '')
-					except Exception:
-						pass
-				native_text = '\n'.join(buf).strip()
-				if len(native_text) > 50:  # accept shorter too
-					return native_text
-			except Exception:
-				pass
-		# OCR fallback using pdf2image if present
+		# OCR using pdf2image if present
 		if pdf2image is not None:
 			try:
-				poppler_path: Optional[str] = os.environ.get('POPPLER_PATH')
-				kwargs = {'poppler_path': poppler_path} if poppler_path else {}
-				pages = pdf2image.convert_from_path(str(path), dpi=300, **kwargs)
-				for page in pages:
-					collected_text.append(ocr_image(page))
+				collected_text.extend(_ocr_pdf_pages(str(path), poppler_kwargs(), cancel))
 			except Exception:
 				try:
-					pages = pdf2image.convert_from_path(str(path), dpi=300)
-					for page in pages:
-						collected_text.append(ocr_image(page))
+					collected_text.extend(_ocr_pdf_pages(str(path), {}, cancel))
 				except Exception:
 					collected_text.append('')
-	else:
-		# treat as plain text
-		collected_text.append(path.read_text(encoding='utf-8', errors='ignore'))
 	return '\n'.join(collected_text)
 
 
+def poppler_kwargs() -> dict:
+	poppler_path: Optional[str] = os.environ.get('POPPLER_PATH')
+	return {'poppler_path': poppler_path} if poppler_path else {}
+
+
+def pdf_page_count(path: str, **kwargs) -> int:
+	return pdf2image.pdfinfo_from_path(path, **kwargs).get('Pages', 0)
+
+
+def render_pdf_page(path: str, number: int, dpi: int, **kwargs) -> Image.Image:
+	return pdf2image.convert_from_path(path, dpi=dpi, first_page=number, last_page=number, **kwargs)[0]
+
+
+def pdf_image_dpis(path: str) -> List[Optional[float]]:
+	"""Resolution of the largest image on each PDF page (a scanned page is one image), None where unknown."""
+	if PyPDF2 is None:
+		return []
+	try:
+		with open(path, 'rb') as handle:
+			return [_page_image_dpi(page) for page in PyPDF2.PdfReader(handle).pages]
+	except Exception:
+		return []
+
+
+def _page_image_dpi(page) -> Optional[float]:
+	try:
+		page_inches = max(float(page.mediabox.width), float(page.mediabox.height)) / 72.0
+		xobjects = page['/Resources']['/XObject'].get_object()
+		images = [x.get_object() for x in xobjects.values()]
+		pixels = [max(int(x['/Width']), int(x['/Height'])) for x in images if x.get('/Subtype') == '/Image']
+	except Exception:
+		return None
+	return max(pixels) / page_inches if pixels and page_inches > 0 else None
+
+
+def iter_pdf_pages(path: str, dpi: int = 300, **kwargs) -> Iterator[Image.Image]:
+	# Rasterize one page at a time so memory stays flat on long scans
+	for number in range(1, pdf_page_count(path, **kwargs) + 1):
+		yield render_pdf_page(path, number, dpi, **kwargs)
+
+
+def iter_document_pages(path: str, dpi: int = 300) -> Iterator[Image.Image]:
+	"""Page images of a PDF or (multi-page) TIFF, produced lazily in page order."""
+	if Path(path).suffix.lower() == '.pdf':
+		if pdf2image is None:
+			raise RuntimeError('pdf2image is not installed')
+		yield from iter_pdf_pages(path, dpi=dpi, **poppler_kwargs())
+		return
+	with Image.open(path) as image:
+		for frame in ImageSequence.Iterator(image):
+			yield frame.copy()
+
+
+def _ocr_pdf_pages(path: str, kwargs: dict, cancel: Optional[threading.Event] = None) -> List[str]:
+	texts: List[str] = []
+	if not preprocess.is_enabled():
+		for page in iter_pdf_pages(path, **kwargs):
+			if cancel is not None and cancel.is_set():
+				break
+			texts.append(ocr_image(page))
+		return texts
+	# Each page is rendered once, at its scan resolution (rendering finer adds no detail);
+	# a downscaled copy picks the OCR DPI (or skips a blank page) and the render is resized to it
+	source_dpis = pdf_image_dpis(path)
+	for number in range(1, pdf_page_count(path, **kwargs) + 1):
+		if cancel is not None and cancel.is_set():
+			break
+		source_dpi = source_dpis[number - 1] if number <= len(source_dpis) else None
+		render_dpi = int(min(preprocess.OCR_MAX_DPI, max(preprocess.OCR_MIN_DPI, source_dpi or preprocess.OCR_MAX_DPI)))
+		image = render_pdf_page(path, number, render_dpi, **kwargs)
+		dpi = preprocess.choose_page_dpi(preprocess.resample(image, preprocess.PROBE_DPI / render_dpi))
+		page = preprocess.prepare_page(preprocess.resample(image, dpi / render_dpi)) if dpi else None
+		if page is None:
+			count('ldd_ocr_blank_pages_total')
+			continue
+		texts.append(ocr_image(page))
+	return texts
+
+
+@timed('ocr.tesseract_page')
 def ocr_image(image: Image.Image) -> str:
 	# Convert to grayscale for better OCR
 	gray = image.convert('L')
+	if tesseract_pool is not None:
+		try:
+			return tesseract_pool.image_to_string(gray)
+		except Exception as e:
+			print(f"⚠️  tesserocr failed, falling back to pytesseract: {e}")
+			record_fallback('ocr.tesserocr', 'pytesseract')
 	return pytesseract.image_to_string(gray)
 
 
@@ -0,0 +1,149 @@
+from typing import Optional, Tuple
+import os
+try:
+	import numpy as np  # type: ignore
+except Exception:
+	np = None
+
+from PIL import Image
+
+from .metrics import timed
+
+
+OCR_PREPROCESS = os.environ.get('OCR_PREPROCESS', '1') != '0'
+# Tesseract reads best when a text line is ~40px tall (cap height ~30px)
+OCR_TARGET_LINE_PX = float(os.environ.get('OCR_TARGET_LINE_PX', '40'))
+OCR_MIN_DPI = int(os.environ.get('OCR_MIN_DPI', '150'))
+OCR_MAX_DPI = int(os.environ.get('OCR_MAX_DPI', '400'))
+PROBE_DPI = 100
+MIN_CONTRAST = 60  # gray levels between ink and paper; less than this is an empty page
+BORDER_FRACTION = 0.6  # rows/columns darker than this are scanner borders, not text
+DESKEW_WIDTH = 600
+MAX_SKEW = 5.0
+
+
+def is_enabled() -> bool:
+	return OCR_PREPROCESS and np is not None
+
+
+def _gray(image: Image.Image):
+	return np.asarray(image if image.mode == 'L' else image.convert('L'), dtype=np.uint8)
+
+
+def ink_mask(gray):
+	"""Otsu binarization from the histogram; returns a boolean ink mask (all False on empty pages)."""
+	hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+	levels = np.arange(256, dtype=np.float64)
+	weight = np.cumsum(hist)
+	mass = np.cumsum(hist * levels)
+	total, total_mass = weight[-1], mass[-1]
+	background = total - weight
+	with np.errstate(divide='ignore', invalid='ignore'):
+		ink_mean = mass / weight
+		paper_mean = (total_mass - mass) / background
+		between = weight * background * (ink_mean - paper_mean) ** 2
+	between[~np.isfinite(between)] = 0
+	threshold = int(np.argmax(between))
+	if weight[threshold] == 0 or background[threshold] == 0 or paper_mean[threshold] - ink_mean[threshold] < MIN_CONTRAST:
+		return np.zeros(gray.shape, dtype=bool)
+	return gray <= threshold
+
+
+def content_box(ink) -> Optional[Tuple[int, int, int, int]]:
+	"""(top, bottom, left, right) around the ink, ignoring dark scanner borders; None if blank."""
+	rows = ink.mean(axis=1)
+	cols = ink.mean(axis=0)
+	row_idx = np.nonzero((rows > 0) & (rows < BORDER_FRACTION))[0]
+	col_idx = np.nonzero((cols > 0) & (cols < BORDER_FRACTION))[0]
+	if not len(row_idx) or not len(col_idx):
+		return None
+	top, bottom, left, right = row_idx[0], row_idx[-1] + 1, col_idx[0], col_idx[-1] + 1
+	# Specks alone are not a page worth OCR
+	if ink[top:bottom, left:right].sum() < max(25, 0.0005 * ink.size):
+		return None
+	return int(top), int(bottom), int(left), int(right)
+
+
+def line_height(ink) -> Optional[float]:
+	"""Median height in px of the text lines (runs of inked rows)."""
+	rows = ink.mean(axis=1) > 0.002
+	edges = np.diff(np.concatenate(([0], rows.view(np.int8), [0])))
+	starts, ends = np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]
+	heights = (ends - starts)[(ends - starts) >= 2]
+	return float(np.median(heights)) if len(heights) else None
+
+
+def _row_score(mask: Image.Image, angle: float) -> float:
+	rows = np.asarray(mask.rotate(angle, resample=Image.NEAREST), dtype=np.float32).sum(axis=1)
+	return float(np.square(np.diff(rows)).sum())
+
+
+def estimate_skew(ink) -> float:
+	"""Skew angle in degrees: the rotation whose row profile is sharpest (coarse, then fine search)."""
+	step = max(1, ink.shape[1] // DESKEW_WIDTH)
+	mask = Image.fromarray((ink[::step, ::step] * 255).astype(np.uint8))
+	best = max(np.arange(-MAX_SKEW, MAX_SKEW + 0.01, 1.0), key=lambda a: _row_score(mask, a))
+	return float(max(np.arange(best - 0.8, best + 0.81, 0.2), key=lambda a: _row_score(mask, a)))
+
+
+def deskewed_line_height(ink, angle: float) -> Optional[float]:
+	"""line_height() of the mask rotated by angle; on a skewed page every tilted line
+	overlaps its neighbours' rows and they would measure as one tall run."""
+	if abs(angle) >= 0.2:
+		mask = Image.fromarray((ink * 255).astype(np.uint8)).rotate(angle, resample=Image.NEAREST, expand=True)
+		ink = np.asarray(mask) > 127
+	return line_height(ink)
+
+
+def _choose_dpi(line_px: Optional[float], dpi: float) -> int:
+	if not line_px:
+		return 300
+	wanted = dpi * OCR_TARGET_LINE_PX / line_px
+	return int(min(OCR_MAX_DPI, max(OCR_MIN_DPI, round(wanted / 25) * 25)))
+
+
+def resample(image: Image.Image, scale: float) -> Image.Image:
+	"""image resized by scale; a render at one DPI stands in for a render at another."""
+	if abs(scale - 1.0) < 0.01:
+		return image
+	size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+	return image.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+
+@timed('ocr.preprocess')
+def choose_page_dpi(probe: Image.Image, probe_dpi: float = PROBE_DPI) -> Optional[int]:
+	"""Rendering DPI for a page from a low-resolution probe render; None for a blank page."""
+	ink = ink_mask(_gray(probe))
+	box = content_box(ink)
+	if box is None:
+		return None
+	top, bottom, left, right = box
+	ink = ink[top:bottom, left:right]
+	return _choose_dpi(deskewed_line_height(ink, estimate_skew(ink)), probe_dpi)
+
+
+@timed('ocr.preprocess')
+def prepare_page(image: Image.Image, rescale: bool = False) -> Optional[Image.Image]:
+	"""Binarized, border-cropped, deskewed page ready for Tesseract; None for a blank page.
+
+	With rescale, images whose lines are far from OCR_TARGET_LINE_PX are resized
+	(PDF pages are already rendered at a chosen DPI and skip this).
+	"""
+	ink = ink_mask(_gray(image))
+	box = content_box(ink)
+	if box is None:
+		return None
+	top, bottom, left, right = box
+	pad = max(4, int(OCR_TARGET_LINE_PX // 2))
+	ink = np.pad(ink[top:bottom, left:right], pad)
+	angle = estimate_skew(ink)
+	page = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+	if abs(angle) >= 0.2:
+		page = page.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+	if rescale:
+		line_px = deskewed_line_height(ink, angle)
+		scale = OCR_TARGET_LINE_PX / line_px if line_px else 1.0
+		if not 0.8 <= scale <= 1.25:
+			scale = min(2.0, max(0.25, scale))
+			page = page.resize((max(1, round(page.width * scale)), max(1, round(page.height * scale))), Image.LANCZOS)
+	return page
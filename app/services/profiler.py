@@ -0,0 +1,140 @@
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+import cProfile
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+
+
+# Profiling is only wired in when PROFILE_SECRET is set; otherwise no hook runs
+PROFILE_SECRET = os.environ.get('PROFILE_SECRET', '')
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', 'data/profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+PROFILE_HEADER = 'X-Profile'
+PROFILE_NAME = re.compile(r'^[\w.-]+\.(prof|folded)$')
+
+
+def is_enabled() -> bool:
+	return bool(PROFILE_SECRET)
+
+
+def is_authorized(request) -> bool:
+	"""True if the request carries the profiling secret in the X-Profile header.
+
+	Only the header is accepted: access logs record full URLs, query string included.
+	"""
+	if not PROFILE_SECRET:
+		return False
+	token = request.headers.get(PROFILE_HEADER) or ''
+	return hmac.compare_digest(token.encode('utf-8'), PROFILE_SECRET.encode('utf-8'))
+
+
+class SamplingProfiler:
+	"""Samples one thread's stack every `interval` seconds into collapsed-stack counts
+	(the `folded` format read by flamegraph.pl and speedscope)."""
+
+	def __init__(self, thread_id: int, interval: float = 0.005):
+		self.thread_id = thread_id
+		self.interval = interval
+		self.stacks: Counter = Counter()
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+
+	def start(self) -> None:
+		self._thread.start()
+
+	def stop(self) -> None:
+		self._stop.set()
+		self._thread.join()
+
+	def _run(self) -> None:
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self.thread_id)
+			stack: List[str] = []
+			while frame is not None:
+				code = frame.f_code
+				stack.append(f'{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}')
+				frame = frame.f_back
+			if stack:
+				self.stacks[';'.join(reversed(stack))] += 1
+
+	def dump(self, path: Path) -> None:
+		path.write_text(''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common()), encoding='utf-8')
+
+
+def _output_path(endpoint: str, suffix: str) -> Path:
+	PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+	slug = re.sub(r'[^\w.-]+', '_', endpoint or 'unmatched')
+	return PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{slug}_{os.urandom(3).hex()}.{suffix}"
+
+
+def _prune() -> None:
+	profiles = sorted(PROFILE_DIR.glob('*.*'), key=lambda p: p.stat().st_mtime, reverse=True)
+	for old in [p for p in profiles if PROFILE_NAME.match(p.name)][PROFILE_KEEP:]:
+		try:
+			old.unlink()
+		except OSError:
+			pass
+
+
+def list_profiles() -> List[Dict]:
+	if not PROFILE_DIR.exists():
+		return []
+	profiles = [p for p in PROFILE_DIR.iterdir() if PROFILE_NAME.match(p.name)]
+	profiles.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+	return [{'name': p.name, 'size': p.stat().st_size, 'created': p.stat().st_mtime} for p in profiles]
+
+
+def profile_path(name: str) -> Optional[Path]:
+	"""Resolved path of a stored profile, or None for unknown or unsafe names."""
+	if not PROFILE_NAME.match(name):
+		return None
+	path = PROFILE_DIR / name
+	return path.resolve() if path.is_file() else None
+
+
+def init_app(app) -> None:
+	"""Profile single requests that carry the secret.
+
+	`X-Profile: <secret>` runs cProfile and stores pstats output; adding
+	`X-Profile-Mode: sample` uses the stack sampler instead, which is cheaper
+	on long requests.
+	"""
+	if not is_enabled():
+		return
+	from flask import g, request
+
+	@app.before_request
+	def _start_profile():
+		if not is_authorized(request) or request.path.startswith('/admin/profiles'):
+			return
+		mode = request.headers.get('X-Profile-Mode') or 'cprofile'
+		if mode == 'sample':
+			profiler = SamplingProfiler(threading.get_ident())
+			profiler.start()
+		else:
+			profiler = cProfile.Profile()
+			profiler.enable()
+		g._profiler = profiler
+
+	@app.after_request
+	def _stop_profile(response):
+		profiler = g.pop('_profiler', None)
+		if profiler is None:
+			return response
+		if isinstance(profiler, SamplingProfiler):
+			profiler.stop()
+			path = _output_path(request.endpoint, 'folded')
+			profiler.dump(path)
+		else:
+			profiler.disable()
+			path = _output_path(request.endpoint, 'prof')
+			profiler.dump_stats(str(path))
+		_prune()
+		response.headers['X-Profile-Id'] = path.name
+		print(f"🔬 Profiled {request.method} {request.path} -> {path}")
+		return response
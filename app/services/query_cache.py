@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+import re
+import threading
+import time
+
+
+def normalize_query(query: str) -> str:
+	"""Case, whitespace and trailing punctuation don't change the answer."""
+	return re.sub(r"\s+", " ", query.strip().lower()).rstrip(' ?!.')
+
+
+class QueryCache:
+	"""Thread-safe LRU cache of chat answers keyed by (doc_id, normalized query, document version).
+
+	The version is the index's document_version(doc_id): re-indexing or deleting
+	a document changes it, so that document's older answers are never served
+	again and age out of the LRU, while writes to other documents leave them be.
+	Questions across all documents use the global index generation.
+	"""
+
+	def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+		self.max_entries = max_entries
+		self.ttl_seconds = ttl_seconds
+		self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	@staticmethod
+	def key(doc_id: Optional[str], query: str, version: Hashable) -> Tuple:
+		return (doc_id, normalize_query(query), version)
+
+	def get(self, key: Tuple) -> Optional[Any]:
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None or (self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds):
+				if entry is not None:
+					del self._entries[key]
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return entry[1]
+
+	def put(self, key: Tuple, value: Any) -> None:
+		with self._lock:
+			self._entries[key] = (time.monotonic(), value)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def invalidate_doc(self, doc_id: str) -> int:
+		with self._lock:
+			stale = [k for k in self._entries if k[0] == doc_id]
+			for k in stale:
+				del self._entries[k]
+			return len(stale)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+
+	def stats(self) -> dict:
+		with self._lock:
+			total = self.hits + self.misses
+			return {
+				'entries': len(self._entries),
+				'hits': self.hits,
+				'misses': self.misses,
+				'hit_rate': round(self.hits / total, 4) if total else 0.0,
+			}
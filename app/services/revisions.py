@@ -0,0 +1,163 @@
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import re
+import time
+
+from .exports import iter_stored_clauses
+from .segment import clause_hash
+
+
+def redline(old: str, new: str) -> str:
+	"""Word-level diff rendered as `[-removed-]{+added+}`."""
+	a = old.split()
+	b = new.split()
+	out: List[str] = []
+	for op, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+		if op == 'equal':
+			out.extend(a[i1:i2])
+			continue
+		if op in ('replace', 'delete'):
+			out.append('[-' + ' '.join(a[i1:i2]) + '-]')
+		if op in ('replace', 'insert'):
+			out.append('{+' + ' '.join(b[j1:j2]) + '+}')
+	return ' '.join(out)
+
+
+def _token_similarity(a: str, b: str) -> float:
+	aw = set(re.findall(r"[a-z0-9]+", a.lower()))
+	bw = set(re.findall(r"[a-z0-9]+", b.lower()))
+	if not aw or not bw:
+		return 0.0
+	return len(aw & bw) / len(aw | bw)
+
+
+def align_clauses(old: List[str], new: List[str], min_similarity: float = 0.5) -> List[Dict]:
+	"""Align a revised clause list to the previous one.
+
+	Identical clauses are matched by hash in order; inside each changed block,
+	clauses are paired greedily by token similarity and reported as modified,
+	the rest as removed or added.
+	"""
+	changes: List[Dict] = []
+	old_hashes = [clause_hash(c) for c in old]
+	new_hashes = [clause_hash(c) for c in new]
+	for op, i1, i2, j1, j2 in SequenceMatcher(None, old_hashes, new_hashes, autojunk=False).get_opcodes():
+		if op == 'equal':
+			for offset in range(i2 - i1):
+				changes.append({'status': 'unchanged', 'old_index': i1 + offset, 'new_index': j1 + offset})
+			continue
+		unmatched_old = list(range(i1, i2))
+		block: List[Dict] = []
+		for j in range(j1, j2):
+			best, best_sim = None, min_similarity
+			for i in unmatched_old:
+				sim = _token_similarity(old[i], new[j])
+				if sim >= best_sim:
+					best, best_sim = i, sim
+			if best is None:
+				block.append({'status': 'added', 'old_index': None, 'new_index': j, 'new': new[j]})
+			else:
+				unmatched_old.remove(best)
+				block.append({
+					'status': 'modified', 'old_index': best, 'new_index': j,
+					'similarity': round(best_sim, 3), 'old': old[best], 'new': new[j],
+					'redline': redline(old[best], new[j]),
+				})
+		for i in unmatched_old:
+			block.append({'status': 'removed', 'old_index': i, 'new_index': None, 'old': old[i]})
+		block.sort(key=lambda c: (c['new_index'] if c['new_index'] is not None else c['old_index']))
+		changes.extend(block)
+	return changes
+
+
+def change_summary(changes: List[Dict]) -> Dict[str, int]:
+	counts = {'unchanged': 0, 'modified': 0, 'added': 0, 'removed': 0}
+	for c in changes:
+		counts[c['status']] += 1
+	return counts
+
+
+def changed_text(changes: List[Dict]) -> str:
+	"""Text of the clauses that differ, for re-running LLM analysis on the edit only."""
+	parts: List[str] = []
+	for c in changes:
+		if c['status'] == 'modified':
+			parts.append(f"MODIFIED: {c['redline']}")
+		elif c['status'] == 'added':
+			parts.append(f"ADDED: {c['new']}")
+		elif c['status'] == 'removed':
+			parts.append(f"REMOVED: {c['old']}")
+	return '\n\n'.join(parts)
+
+
+def _normalized(text: str) -> str:
+	return ' '.join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def _risk_clause(risk: Dict, old: List[str]) -> Optional[int]:
+	"""Index of the (normalized) old clause a risk was raised on, or None if it names none."""
+	index = risk.get('clause_index')
+	if isinstance(index, int):
+		return index if 0 <= index < len(old) else None
+	quote = _normalized(str(risk.get('preview') or ''))
+	if len(quote) < 20:
+		return None
+	return next((i for i, clause in enumerate(old) if quote in clause), None)
+
+
+def risks_tied_to_clauses(risks: List[Dict], old: List[str]) -> bool:
+	"""Whether every risk names the clause it was raised on."""
+	normalized = [_normalized(c) for c in old]
+	return all(_risk_clause(risk, normalized) is not None for risk in risks)
+
+
+def carry_over_risks(risks: List[Dict], changes: List[Dict], old: List[str], keep_untied: bool = True) -> List[Dict]:
+	"""Previous risks that still hold after a revision.
+
+	Risks tied to a clause (by clause_index or by quoting it in preview)
+	follow it to its new position while it is unchanged and are dropped once
+	it is modified or removed; risks that name no clause stay if keep_untied.
+	"""
+	moved = {c['old_index']: c['new_index'] for c in changes if c['status'] == 'unchanged'}
+	normalized = [_normalized(c) for c in old]
+	kept: List[Dict] = []
+	for risk in risks:
+		index = _risk_clause(risk, normalized)
+		if index is None:
+			if keep_untied:
+				kept.append(dict(risk))
+			continue
+		if index not in moved:
+			continue
+		risk = dict(risk)
+		if 'clause_index' in risk:
+			risk['clause_index'] = moved[index]
+		kept.append(risk)
+	return kept
+
+
+def record_revision(processed_dir: Path, doc_id: str, changes: List[Dict]) -> Dict:
+	"""Append a version entry and save the change report next to the other artifacts."""
+	history_path = processed_dir / f'{doc_id}_versions.json'
+	history = json.loads(history_path.read_text(encoding='utf-8')) if history_path.exists() else [{'version': 1}]
+	entry = {'version': history[-1]['version'] + 1, 'time': time.time(), 'changes': change_summary(changes)}
+	history.append(entry)
+	history_path.write_text(json.dumps(history), encoding='utf-8')
+	(processed_dir / f'{doc_id}_changes.json').write_text(json.dumps({'version': entry['version'], 'changes': changes}), encoding='utf-8')
+	return entry
+
+
+def load_previous_clauses(processed_dir: Path, doc_id: str, dedup_index=None) -> Optional[List[str]]:
+	"""Clauses of the current version, from the dedup clause store or the processed artifact."""
+	if dedup_index is not None:
+		prior = dedup_index.get_document(doc_id)
+		if prior:
+			clauses = [dedup_index.clause_text(h) for h in prior['clause_hashes']]
+			if all(c is not None for c in clauses):
+				return clauses
+	path = processed_dir / f'{doc_id}_clauses.bin'
+	if path.exists():
+		return [c for c in iter_stored_clauses(path) if c]
+	return None
@@ -1,6 +1,8 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import re
 
+from .metrics import timed
+
 
 HIGH_RISK_PATTERNS = [
 	(r"indemnif(y|ication|ies)", "Indemnification obligations"),
@@ -22,19 +24,23 @@ MEDIUM_RISK_PATTERNS = [
 ]
 
 
-def analyze_risks(clauses: List[str]) -> List[Dict]:
+def score_clause(clause: str) -> Tuple[int, List[str]]:
+	score = 0
+	hits: List[str] = []
+	for pat, label in HIGH_RISK_PATTERNS:
+		if re.search(pat, clause, flags=re.I):
+			score += 3
+			hits.append(label)
+	for pat, label in MEDIUM_RISK_PATTERNS:
+		if re.search(pat, clause, flags=re.I):
+			score += 1
+			hits.append(label)
+	return score, hits
+
+
+def build_risk_results(clauses: List[str], scores: List[Tuple[int, List[str]]]) -> List[Dict]:
 	results: List[Dict] = []
-	for idx, clause in enumerate(clauses):
-		score = 0
-		hits: List[str] = []
-		for pat, label in HIGH_RISK_PATTERNS:
-			if re.search(pat, clause, flags=re.I):
-				score += 3
-				hits.append(label)
-		for pat, label in MEDIUM_RISK_PATTERNS:
-			if re.search(pat, clause, flags=re.I):
-				score += 1
-				hits.append(label)
+	for idx, (clause, (score, hits)) in enumerate(zip(clauses, scores)):
 		if score > 0:
 			results.append({
 				'clause_index': idx,
@@ -50,3 +56,6 @@ def analyze_risks(clauses: List[str]) -> List[Dict]:
 	return results
 
 
+@timed('risk.local')
+def analyze_risks(clauses: List[str]) -> List[Dict]:
+	return build_risk_results(clauses, [score_clause(c) for c in clauses])
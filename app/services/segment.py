@@ -1,10 +1,13 @@
+import hashlib
 import re
 from typing import List
 
+from .metrics import timed
 
 CLAUSE_SPLIT_REGEX = re.compile(r"(?:\n\s*\d+\.\s+)|(?:\n\s*[A-Z][A-Z ]{3,}\n)|(?:\n\s*-{3,}\s*\n)")
 
 
+@timed('segment')
 def segment_clauses(text: str) -> List[str]:
 	if not text:
 		return []
@@ -16,3 +19,6 @@ def segment_clauses(text: str) -> List[str]:
 	return clauses
 
 
+def clause_hash(clause: str) -> str:
+	# Whitespace-insensitive so reflowed boilerplate hashes the same
+	return hashlib.sha1(' '.join(clause.split()).encode('utf-8')).hexdigest()
@@ -1,20 +1,10 @@
-from pathlib import Path
-from typing import Optional
+from .lifecycle import remove_local_artifacts
 
 
-def delete_document_files(doc_id: str) -> None:
-	base = Path('data/processed')
-	uploads = Path('data/uploads')
-	for p in [
-		uploads / f'{doc_id}.bin',
-		base / f'{doc_id}_summary.bin',
-		base / f'{doc_id}_clauses.bin',
-		base / f'{doc_id}_chat.jsonl',
-	]:
-		try:
-			if p.exists():
-				p.unlink()
-		except Exception:
-			pass
-
+def delete_document_files(doc_id: str) -> int:
+	"""Remove every local file of a document (uploads, processed artifacts, manifest).
 
+	Index entries and GCS copies are left alone; LifecycleManager.delete does
+	the full cascade.
+	"""
+	return remove_local_artifacts(doc_id)
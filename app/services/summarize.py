@@ -3,6 +3,8 @@ import math
 import re
 from collections import defaultdict
 
+from .metrics import timed
+
 
 SENTENCE_REGEX = re.compile(r"(?<=[.!?])\s+")
 
@@ -84,6 +86,7 @@ def textrank_summary(text: str, max_sentences: int = 8) -> str:
 	return ' '.join(selected_sents)
 
 
+@timed('summarize.textrank')
 def summarize_text(text: str) -> str:
 	length = len(text.split())
 	if length < 400:
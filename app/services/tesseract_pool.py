@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from typing import Optional
+import os
+import queue
+import threading
+try:
+	import tesserocr  # type: ignore
+except Exception:
+	tesserocr = None
+
+from PIL import Image
+
+
+class TesseractPool:
+	"""Long-lived in-process Tesseract engines (tesserocr), checked out one per OCR worker.
+
+	Each engine loads its traineddata once; pages are handed over as raw 8-bit
+	buffers, so there is no temp PNG, subprocess or stdout parsing per page.
+	"""
+
+	def __init__(self, lang: str = 'eng', size: Optional[int] = None, tessdata: Optional[str] = None):
+		self.lang = lang
+		self.size = size or os.cpu_count() or 1
+		self.tessdata = tessdata
+		self._idle: 'queue.LifoQueue' = queue.LifoQueue()
+		self._created = 0
+		self._lock = threading.Lock()
+
+	def _new_engine(self):
+		if self.tessdata:
+			return tesserocr.PyTessBaseAPI(path=self.tessdata, lang=self.lang)
+		return tesserocr.PyTessBaseAPI(lang=self.lang)
+
+	@contextmanager
+	def engine(self):
+		try:
+			api = self._idle.get_nowait()
+		except queue.Empty:
+			with self._lock:
+				create = self._created < self.size
+				if create:
+					self._created += 1
+			if create:
+				try:
+					api = self._new_engine()
+				except Exception:
+					with self._lock:
+						self._created -= 1
+					raise
+			else:
+				api = self._idle.get()
+		try:
+			yield api
+		finally:
+			api.Clear()
+			self._idle.put(api)
+
+	def image_to_string(self, image: Image.Image) -> str:
+		gray = image if image.mode == 'L' else image.convert('L')
+		with self.engine() as api:
+			api.SetImageBytes(gray.tobytes(), gray.width, gray.height, 1, gray.width)
+			return api.GetUTF8Text()
+
+	def close(self) -> None:
+		while True:
+			try:
+				self._idle.get_nowait().End()
+			except queue.Empty:
+				return
+
+
+def create_tesseract_pool() -> Optional[TesseractPool]:
+	"""Engine pool per TESSERACT_BACKEND ('auto', 'tesserocr' or 'pytesseract'); None means use pytesseract."""
+	backend = os.environ.get('TESSERACT_BACKEND', 'auto').lower()
+	if backend == 'pytesseract' or tesserocr is None:
+		if backend == 'tesserocr':
+			print("⚠️  TESSERACT_BACKEND=tesserocr but tesserocr is not installed; using pytesseract")
+		return None
+	size = int(os.environ['OCR_ENGINES']) if os.environ.get('OCR_ENGINES') else None
+	return TesseractPool(lang=os.environ.get('TESSERACT_LANG', 'eng'), size=size, tessdata=os.environ.get('TESSDATA_PREFIX'))
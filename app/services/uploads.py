@@ -0,0 +1,81 @@
+from pathlib import Path
+from typing import Tuple
+import hashlib
+import os
+import tempfile
+
+from flask import Request
+
+
+UPLOAD_DIR = Path('data/uploads')
+# Parts are spooled next to their final location so committing them is a rename
+INCOMING_DIR = UPLOAD_DIR / '.incoming'
+CHUNK_SIZE = 1024 * 1024
+
+
+class HashingSpoolFile:
+	"""On-disk spool for one multipart file part that hashes bytes as they are written.
+
+	Werkzeug streams the request body into it chunk by chunk, so an upload
+	never sits in memory. commit() renames it into place; a part that is
+	never committed is deleted when the request closes its files.
+	"""
+
+	def __init__(self, directory: Path = INCOMING_DIR):
+		directory.mkdir(parents=True, exist_ok=True)
+		fd, name = tempfile.mkstemp(dir=str(directory), suffix='.part')
+		self.path = Path(name)
+		self.sha256 = hashlib.sha256()
+		self.size = 0
+		self.committed = False
+		self._file = os.fdopen(fd, 'w+b')
+
+	def write(self, data) -> int:
+		self.sha256.update(data)
+		self.size += len(data)
+		return self._file.write(data)
+
+	def commit(self, destination: Path) -> Path:
+		self._file.close()
+		os.replace(self.path, destination)
+		self.committed = True
+		return destination
+
+	def close(self) -> None:
+		self._file.close()
+		if not self.committed:
+			try:
+				self.path.unlink()
+			except OSError:
+				pass
+
+	def __getattr__(self, name):
+		return getattr(self._file, name)
+
+
+class StreamingRequest(Request):
+	"""Request class whose file uploads go straight to a hashing spool on disk."""
+
+	def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+		return HashingSpoolFile()
+
+
+def store_upload(file, destination: Path) -> Tuple[Path, str, int]:
+	"""Move an uploaded FileStorage to destination; returns (path, sha256 hex, size).
+
+	Spooled parts are renamed without copying; any other stream is copied in
+	CHUNK_SIZE pieces and hashed on the way.
+	"""
+	destination.parent.mkdir(parents=True, exist_ok=True)
+	stream = file.stream
+	if isinstance(stream, HashingSpoolFile) and not stream.committed:
+		return stream.commit(destination), stream.sha256.hexdigest(), stream.size
+	digest = hashlib.sha256()
+	size = 0
+	with open(destination, 'wb') as out:
+		for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+			digest.update(chunk)
+			size += len(chunk)
+			out.write(chunk)
+	return destination, digest.hexdigest(), size
+
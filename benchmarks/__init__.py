@@ -0,0 +1,4 @@
+"""Offline benchmarks for the local processing hot paths.
+
+Run with `python -m benchmarks --help`.
+"""
@@ -0,0 +1,36 @@
+from pathlib import Path
+import argparse
+import json
+import sys
+
+from .suite import BENCHMARKS, PROFILES, compare, run
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark segmentation, summarization, risk analysis, retrieval and text extraction on a synthetic corpus.')
+	parser.add_argument('--profile', choices=sorted(PROFILES), default='quick', help='quick (default) or full (up to 500 pages / 100k documents)')
+	parser.add_argument('--only', nargs='*', help=f"subset of benchmarks: {', '.join(BENCHMARKS)}")
+	parser.add_argument('--output', type=Path, help='write results JSON here (use it later as --baseline)')
+	parser.add_argument('--baseline', type=Path, help='compare medians against a previous results JSON')
+	parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a case counts as a regression (default 0.25 = 25%%)')
+	args = parser.parse_args()
+
+	results = run(args.profile, args.only)
+	if args.output:
+		args.output.parent.mkdir(parents=True, exist_ok=True)
+		args.output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+		print(f"Results written to {args.output}")
+
+	if not args.baseline:
+		return 0
+	report = compare(results, json.loads(args.baseline.read_text(encoding='utf-8')), args.tolerance)
+	regressions = [r for r in report if r['status'] == 'regression']
+	for r in report:
+		if r['status'] in ('regression', 'improvement'):
+			print(f"{r['status'].upper():<12} {r['case']:<55} {r['baseline_s'] * 1000:9.2f} ms -> {r['current_s'] * 1000:9.2f} ms (x{r['ratio']})")
+	print(f"{len(regressions)} regression(s) out of {len(report)} case(s)")
+	return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
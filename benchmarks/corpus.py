@@ -0,0 +1,165 @@
+from pathlib import Path
+from typing import List
+import random
+
+
+WORDS_PER_PAGE = 500
+
+PARTIES = [
+	('Acme Holdings LLC', 'Jordan Lee'),
+	('Northwind Traders Inc.', 'Sam Patel'),
+	('Blue River Properties', 'Alex Morgan'),
+	('Contoso Services Ltd.', 'Taylor Chen'),
+]
+
+HEADINGS = [
+	'DEFINITIONS', 'TERM AND TERMINATION', 'PAYMENT TERMS', 'CONFIDENTIALITY',
+	'INDEMNIFICATION', 'LIMITATION OF LIABILITY', 'INTELLECTUAL PROPERTY',
+	'DISPUTE RESOLUTION', 'GOVERNING LAW', 'NOTICES', 'ASSIGNMENT', 'MISCELLANEOUS',
+]
+
+BOILERPLATE = [
+	'This Agreement constitutes the entire agreement between the parties and supersedes all prior understandings.',
+	'If any provision of this Agreement is held invalid, the remaining provisions shall continue in full force and effect.',
+	'This Agreement may be executed in counterparts, each of which shall be deemed an original.',
+	'All notices under this Agreement shall be in writing and delivered to the addresses set forth above.',
+	'Neither party may assign this Agreement without the prior written consent of the other party.',
+	'This Agreement shall be governed by the laws of the State of Delaware without regard to conflict of law principles.',
+]
+
+RISK_PHRASES = [
+	'The {b} shall indemnify and hold harmless the {a} from any and all claims arising hereunder.',
+	'Any dispute shall be resolved exclusively by binding arbitration in Wilmington, Delaware.',
+	'This Agreement shall auto-renew for successive one-year terms unless terminated in writing.',
+	'The {b} agrees to a non-compete restriction for a period of {n} months after termination.',
+	'Late payments shall incur a late fee of {pct}% per month until paid in full.',
+	'The {a} may make a unilateral change to these terms upon notice to the {b}.',
+	'The parties agree that liquidated damages of ${amount} are a reasonable estimate of loss.',
+	'All work product shall be considered work for hire and any invention is hereby assigned to the {a}.',
+	'The services are provided as is and all warranties disclaimed to the fullest extent permitted by law.',
+	'Liability under this Agreement shall be unlimited for breaches of confidentiality.',
+]
+
+FILLER = [
+	'The {a} shall provide the services described in Schedule A within {n} days of the Effective Date.',
+	'The {b} must pay the fees of ${amount} within {n} business days of receiving an invoice.',
+	'Either party may terminate this Agreement upon {n} days written notice to the other party.',
+	'The {b} shall maintain records relating to the services for at least {n} years.',
+	'The {a} will use commercially reasonable efforts to meet the milestones set out in the project plan.',
+	'Each party shall comply with all applicable laws and regulations in performing its obligations.',
+	'The {b} is required to obtain insurance coverage of not less than ${amount} per occurrence.',
+	'Payments not disputed in good faith shall be made in USD by wire transfer.',
+	'The {a} may subcontract portions of the services with prior written approval of the {b}.',
+	'Force majeure events shall suspend performance for the duration of the event.',
+]
+
+
+def _sentence(rng: random.Random, templates: List[str], a: str, b: str) -> str:
+	return rng.choice(templates).format(
+		a=a, b=b,
+		n=rng.choice([5, 10, 15, 30, 45, 60, 90]),
+		pct=rng.choice([1, 1.5, 2, 5]),
+		amount=f"{rng.randrange(1, 500) * 1000:,}",
+	)
+
+
+def generate_contract(pages: int = 1, seed: int = 0, risk_ratio: float = 0.15) -> str:
+	"""Deterministic synthetic contract of roughly `pages` pages (~500 words each).
+
+	Contains numbered sections, ALL-CAPS headings on their own lines, recurring
+	boilerplate and phrases matched by the risk heuristics.
+	"""
+	rng = random.Random(f'{seed}:{pages}')
+	a, b = PARTIES[seed % len(PARTIES)]
+	lines = [
+		'SERVICES AGREEMENT',
+		f'This Services Agreement is entered into by {a} (the "Company") and {b} (the "Contractor").',
+	]
+	target = pages * WORDS_PER_PAGE
+	words = sum(len(line.split()) for line in lines)
+	section = 1
+	while words < target:
+		heading = HEADINGS[(section - 1) % len(HEADINGS)]
+		lines.append('')
+		lines.append(heading)
+		paragraph = []
+		for _ in range(rng.randint(3, 9)):
+			roll = rng.random()
+			if roll < risk_ratio:
+				paragraph.append(_sentence(rng, RISK_PHRASES, 'Company', 'Contractor'))
+			elif roll < risk_ratio + 0.15:
+				paragraph.append(rng.choice(BOILERPLATE))
+			else:
+				paragraph.append(_sentence(rng, FILLER, 'Company', 'Contractor'))
+		text = f"{section}. " + ' '.join(paragraph)
+		lines.append(text)
+		words += len(text.split()) + 1
+		section += 1
+	lines.append('')
+	lines.append('-----')
+	lines.append(f'IN WITNESS WHEREOF, the parties have executed this Agreement. {a} / {b}')
+	return '\n'.join(lines)
+
+
+def generate_corpus(documents: int, pages: int = 2, seed: int = 0) -> List[str]:
+	return [generate_contract(pages=pages, seed=seed + i) for i in range(documents)]
+
+
+def write_text_pdf(text: str, path: Path, lines_per_page: int = 55) -> Path:
+	"""Minimal PDF with a real text layer (no third-party writer needed)."""
+	wrapped: List[str] = []
+	for line in text.split('\n'):
+		while len(line) > 95:
+			cut = line.rfind(' ', 0, 95)
+			cut = cut if cut > 0 else 95
+			wrapped.append(line[:cut])
+			line = line[cut:].lstrip()
+		wrapped.append(line)
+	pages = [wrapped[i:i + lines_per_page] for i in range(0, len(wrapped), lines_per_page)] or [[]]
+
+	objects: List[bytes] = []
+	page_ids = [4 + 2 * i for i in range(len(pages))]
+	objects.append(b'<< /Type /Catalog /Pages 2 0 R >>')
+	objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {len(pages)} >>".encode('ascii'))
+	objects.append(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+	for i, page in enumerate(pages):
+		escaped = [l.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for l in page]
+		body = 'BT /F1 10 Tf 50 800 Td 13 TL ' + ' '.join(f'({l}) \'' for l in escaped) + ' ET'
+		content = body.encode('latin-1', 'replace')
+		objects.append(
+			f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {page_ids[i] + 1} 0 R >>'.encode('ascii')
+		)
+		objects.append(f'<< /Length {len(content)} >>\nstream\n'.encode('ascii') + content + b'\nendstream')
+
+	out = bytearray(b'%PDF-1.4\n')
+	offsets = []
+	for num, obj in enumerate(objects, start=1):
+		offsets.append(len(out))
+		out += f'{num} 0 obj\n'.encode('ascii') + obj + b'\nendobj\n'
+	xref = len(out)
+	out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('ascii')
+	for off in offsets:
+		out += f'{off:010d} 00000 n \n'.encode('ascii')
+	out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('ascii')
+	Path(path).write_bytes(bytes(out))
+	return Path(path)
+
+
+def write_text_image(text: str, path: Path, width: int = 1700, max_lines: int = 70) -> Path:
+	"""Render text onto a white page image, like a clean 200 DPI scan."""
+	from PIL import Image, ImageDraw
+	lines: List[str] = []
+	for line in text.split('\n'):
+		while len(line) > 110:
+			cut = line.rfind(' ', 0, 110)
+			cut = cut if cut > 0 else 110
+			lines.append(line[:cut])
+			line = line[cut:].lstrip()
+		lines.append(line)
+	lines = lines[:max_lines]
+	image = Image.new('L', (width, 60 + 30 * len(lines)), color=255)
+	draw = ImageDraw.Draw(image)
+	for i, line in enumerate(lines):
+		draw.text((60, 30 + 30 * i), line, fill=0)
+	image.save(path)
+	return Path(path)
@@ -0,0 +1,193 @@
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from app.services.segment import segment_clauses
+from app.services.summarize import summarize_text, textrank_summary
+from app.services.risk import analyze_risks
+from app.services.embeddings import EmbeddingIndex, LexicalScorer
+
+from .corpus import generate_contract, generate_corpus, write_text_image, write_text_pdf
+
+
+PROFILES = {
+	'quick': {'pages': [1, 10, 50], 'summary_pages': [1, 10], 'index_docs': [10, 1000], 'scan_max_docs': 1000, 'repeat': 3},
+	'full': {'pages': [1, 10, 100, 500], 'summary_pages': [1, 10, 100], 'index_docs': [10, 1000, 10000, 100000], 'scan_max_docs': 10000, 'repeat': 5},
+}
+
+QUERIES = ['termination notice period', 'indemnify and hold harmless', 'late fee payment', 'binding arbitration']
+
+# Each benchmark yields (case name, params, callable, repeat)
+Case = Tuple[str, dict, Callable[[], object], int]
+BENCHMARKS: Dict[str, Callable[[dict, Path], Iterator[Case]]] = {}
+
+
+def benchmark(name: str):
+	def register(fn):
+		BENCHMARKS[name] = fn
+		return fn
+	return register
+
+
+def measure(fn: Callable[[], object], repeat: int, min_sample_s: float = 0.05) -> dict:
+	"""Per-call timings over `repeat` samples; fast calls are looped (like timeit) so each sample lasts at least `min_sample_s`."""
+	start = time.perf_counter()
+	fn()
+	first = time.perf_counter() - start
+	loops = max(1, int(min_sample_s / first)) if first > 0 else 1000
+	times: List[float] = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for _ in range(loops):
+			fn()
+		times.append((time.perf_counter() - start) / loops)
+	times.sort()
+	return {
+		'repeat': repeat,
+		'loops': loops,
+		'min_s': times[0],
+		'median_s': statistics.median(times),
+		'p95_s': times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))],
+		'mean_s': statistics.fmean(times),
+	}
+
+
+@benchmark('segment_clauses')
+def bench_segment(profile: dict, workdir: Path) -> Iterator[Case]:
+	for pages in profile['pages']:
+		text = generate_contract(pages=pages)
+		yield f'segment_clauses[pages={pages}]', {'pages': pages, 'chars': len(text)}, lambda t=text: segment_clauses(t), profile['repeat']
+
+
+@benchmark('summarize')
+def bench_summarize(profile: dict, workdir: Path) -> Iterator[Case]:
+	for pages in profile['summary_pages']:
+		text = generate_contract(pages=pages)
+		yield f'summarize_text[pages={pages}]', {'pages': pages}, lambda t=text: summarize_text(t), profile['repeat']
+		yield f'textrank_summary[pages={pages}]', {'pages': pages}, lambda t=text: textrank_summary(t, max_sentences=8), profile['repeat']
+
+
+@benchmark('analyze_risks')
+def bench_risks(profile: dict, workdir: Path) -> Iterator[Case]:
+	for pages in profile['pages']:
+		clauses = segment_clauses(generate_contract(pages=pages))
+		yield f'analyze_risks[pages={pages}]', {'pages': pages, 'clauses': len(clauses)}, lambda c=clauses: analyze_risks(c), profile['repeat']
+
+
+def _clause_pool(size: int = 40) -> List[str]:
+	pool: List[str] = []
+	for text in generate_corpus(size, pages=2):
+		pool.extend(segment_clauses(text))
+	return pool
+
+
+def _populate_index_dir(index_dir: Path, documents: int, pool: List[str]) -> None:
+	"""Write a doc_offsets.json for `documents` docs in one go (add_document saves on every call)."""
+	rng = random.Random(documents)
+	scorer = LexicalScorer()
+	data = {}
+	for i in range(documents):
+		clauses = rng.sample(pool, min(len(pool), 20))
+		data[f'doc{i:06d}'] = {'clauses': clauses, 'idf': scorer._build_idf(clauses)}
+	index_dir.mkdir(parents=True, exist_ok=True)
+	(index_dir / 'doc_offsets.json').write_text(json.dumps(data), encoding='utf-8')
+
+
+@benchmark('embedding_index')
+def bench_index(profile: dict, workdir: Path) -> Iterator[Case]:
+	pool = _clause_pool()
+	extra = segment_clauses(generate_contract(pages=5, seed=999))
+	backends = {'json': EmbeddingIndex}
+	try:
+		from app.services.embeddings_sqlite import SQLiteEmbeddingIndex
+		backends['sqlite'] = SQLiteEmbeddingIndex
+	except Exception:
+		pass
+	for documents in profile['index_docs']:
+		for backend, cls in backends.items():
+			index_dir = workdir / f'index_{backend}_{documents}'
+			_populate_index_dir(index_dir, documents, pool)
+			index = cls(index_dir=index_dir)
+			# add_document grows its index on every repeat, so it gets a copy the search cases never see
+			add_dir = workdir / f'index_{backend}_{documents}_add'
+			_populate_index_dir(add_dir, documents, pool)
+			params = {'documents': documents, 'backend': backend}
+			counter = iter(range(10 ** 9))
+			yield (f'index.add_document[{backend},docs={documents}]', params,
+				lambda i=cls(index_dir=add_dir): i.add_document(f'bench{next(counter)}', extra), profile['repeat'])
+			yield (f'index.search_doc[{backend},docs={documents}]', params,
+				lambda i=index: [i.search(q, k=5, doc_id='doc000000') for q in QUERIES], profile['repeat'])
+			if documents > profile['scan_max_docs']:
+				# Cross-document search scans every clause; past this size one case takes minutes
+				continue
+			yield (f'index.search_all[{backend},docs={documents}]', params,
+				lambda i=index: [i.search(q, k=5) for q in QUERIES], profile['repeat'])
+
+
+@benchmark('extract_text')
+def bench_extract(profile: dict, workdir: Path) -> Iterator[Case]:
+	from app.services.ocr import extract_text_from_file
+	for pages in [p for p in profile['pages'] if p <= 100]:
+		pdf = write_text_pdf(generate_contract(pages=pages), workdir / f'native_{pages}.pdf')
+		yield f'extract_text.native_pdf[pages={pages}]', {'pages': pages}, lambda p=pdf: extract_text_from_file(str(p)), profile['repeat']
+	if shutil.which('tesseract') is None:
+		return
+	image = write_text_image(generate_contract(pages=1), workdir / 'scan.png')
+	yield 'extract_text.image[pages=1]', {'pages': 1}, lambda p=image: extract_text_from_file(str(p)), profile['repeat']
+	if shutil.which('pdftoppm') is None:
+		return
+	from PIL import Image
+	scans = [Image.open(write_text_image(generate_contract(pages=1, seed=i), workdir / f'scan_{i}.png')) for i in range(3)]
+	scanned_pdf = workdir / 'scanned_3.pdf'
+	scans[0].save(scanned_pdf, save_all=True, append_images=scans[1:])
+	yield 'extract_text.scanned_pdf[pages=3]', {'pages': 3}, lambda p=scanned_pdf: extract_text_from_file(str(p)), 1
+
+
+def run(profile_name: str = 'quick', only: Optional[List[str]] = None) -> dict:
+	profile = PROFILES[profile_name]
+	results: Dict[str, dict] = {}
+	with tempfile.TemporaryDirectory(prefix='ldd-bench-') as tmp:
+		workdir = Path(tmp)
+		for name, bench in BENCHMARKS.items():
+			if only and not any(o in name for o in only):
+				continue
+			for case, params, fn, repeat in bench(profile, workdir):
+				stats = measure(fn, repeat)
+				results[case] = {'benchmark': name, 'params': params, **stats}
+				print(f"{case:<55} median {stats['median_s'] * 1000:10.2f} ms")
+	return {
+		'meta': {
+			'profile': profile_name,
+			'python': platform.python_version(),
+			'platform': platform.platform(),
+			'cpu_count': os.cpu_count(),
+			'timestamp': time.time(),
+		},
+		'results': results,
+	}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25) -> List[dict]:
+	"""Per-case median ratio against a saved baseline; ratios above 1 + tolerance regress."""
+	report: List[dict] = []
+	for case, result in current['results'].items():
+		base = baseline.get('results', {}).get(case)
+		if base is None:
+			report.append({'case': case, 'status': 'new', 'current_s': result['median_s']})
+			continue
+		ratio = result['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+		if ratio > 1 + tolerance:
+			status = 'regression'
+		elif ratio < 1 - tolerance:
+			status = 'improvement'
+		else:
+			status = 'unchanged'
+		report.append({'case': case, 'status': status, 'baseline_s': base['median_s'], 'current_s': result['median_s'], 'ratio': round(ratio, 3)})
+	return report
@@ -0,0 +1,60 @@
+# Production server settings: `gunicorn -c gunicorn.conf.py wsgi:app`
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+# Preforked processes put CPU-bound summarization and risk scoring on every core
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count())))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+# The app and PRELOAD_MODULES are imported once in the master and shared copy-on-write
+# with the workers; the service modules that build clients on import stay lazy
+preload_app = True
+PRELOAD_MODULES = (
+	'numpy',
+	'PIL.Image',
+	'google.auth',
+	'google.cloud.storage',
+	'google.cloud.secretmanager',
+	'google.cloud.aiplatform',
+	'google.cloud.documentai',
+	'google.cloud.vision',
+	'google.generativeai',
+	'app.services.dense',
+	'app.services.embedding_pipeline',
+	'app.services.embeddings_sqlite',
+	'app.services.gcp_documentai',
+)
+# Recycle workers so memory held by OCR page bitmaps cannot grow without bound
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '500'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '50'))
+# Scanned PDFs can OCR for minutes; graceful_timeout bounds shutdown and recycling
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '60'))
+keepalive = 5
+accesslog = '-'
+if os.path.isdir('/dev/shm'):
+	worker_tmp_dir = '/dev/shm'
+
+
+def on_starting(server):
+	from app.services.lazy import preload_modules
+	loaded = preload_modules(PRELOAD_MODULES)
+	server.log.info('Preloaded %d of %d modules', len(loaded), len(PRELOAD_MODULES))
+
+
+def post_fork(server, worker):
+	# Threads and cloud clients must start in the worker, never in the preloaded master
+	from app.services import admission
+	from app.services.gcp_services import maybe_start_warmup
+	from app.routes import lifecycle
+	# ADMISSION_* limits are server-wide; each worker's lanes take their share
+	admission.split_between_workers(server.cfg.workers)
+	maybe_start_warmup()
+	lifecycle.maybe_start_sweeper()
+
+
+def worker_exit(server, worker):
+	from app.routes import flush_background_work
+	flush_background_work(timeout=graceful_timeout / 2)
@@ -5,6 +5,7 @@ app = create_app()
 
 
 if __name__ == '__main__':
+	# Development server; production runs `gunicorn -c gunicorn.conf.py wsgi:app`
 	import os
 	port = int(os.environ.get('PORT', 5000))
 	app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
@@ -0,0 +1,99 @@
+import pytest
+
+
+class FakeSummarizer:
+	"""Stands in for the Gemini summarization service and records what it was asked."""
+
+	def __init__(self, risks_for=None):
+		self.risks_for = risks_for or (lambda text: [])
+		self.risk_calls = []
+		self.summary_calls = []
+
+	def is_available(self):
+		return True
+
+	def combined_analysis_enabled(self):
+		return False
+
+	def summarize_with_gemini(self, text):
+		self.summary_calls.append(text)
+		return 'Fresh summary.'
+
+	def summarize_revision(self, prior_summary, edited):
+		self.summary_calls.append(edited)
+		return 'Revised summary.'
+
+	def analyze_legal_risks(self, text):
+		self.risk_calls.append(text)
+		return self.risks_for(text)
+
+
+@pytest.fixture
+def routes(tmp_path, monkeypatch):
+	"""app.routes with its lazy indexes reset and every relative data path under tmp_path."""
+	monkeypatch.chdir(tmp_path)
+	from app import routes
+	monkeypatch.setattr(routes, 'embedding_index', None)
+	monkeypatch.setattr(routes, 'dedup_index', None)
+	monkeypatch.setattr(routes, 'chatbot', None)
+	monkeypatch.setattr(routes, 'answer_cache', routes.QueryCache())
+	return routes
+
+
+@pytest.fixture
+def client(routes):
+	from app import create_app
+	return create_app(start_background=False).test_client()
+
+
+@pytest.fixture
+def summarizer(routes, monkeypatch):
+	fake = FakeSummarizer()
+	monkeypatch.setattr(routes, 'gcp_summarization_service', fake)
+	return fake
+
+
+CLAUSE_TEMPLATES = [
+	"Either party may terminate this agreement on {n} days written notice to the {party}.",
+	"The {party} shall indemnify and hold harmless the other party against all claims arising from {subject}.",
+	"A late fee of {n} percent applies to any payment the {party} makes after the due date.",
+	"Any dispute about {subject} shall be settled by binding arbitration in {city}.",
+	"The {party} shall keep all information about {subject} confidential for {n} years.",
+	"The liability of the {party} for {subject} is limited to the fees paid in the last {n} months.",
+	"Rent for the premises is due on day {n} of each month and is paid by the {party}.",
+	"This agreement about {subject} is governed by the laws of {city}.",
+]
+
+
+@pytest.fixture(scope='session')
+def clause_pool():
+	"""A few hundred distinct contract clauses built from templates, the same on every run."""
+	import random
+	rng = random.Random(0)
+	pool = set()
+	while len(pool) < 400:
+		pool.add(rng.choice(CLAUSE_TEMPLATES).format(
+			n=rng.randint(2, 120),
+			party=rng.choice(['tenant', 'landlord', 'supplier', 'buyer', 'contractor', 'client']),
+			subject=rng.choice(['the goods', 'the services', 'the premises', 'late delivery', 'the software', 'personal data']),
+			city=rng.choice(['London', 'New York', 'Ontario', 'Singapore', 'Delaware']),
+		))
+	return sorted(pool)
+
+
+@pytest.fixture(scope='session')
+def populate_index_dir(clause_pool):
+	"""Write a doc_offsets.json of `documents` documents with 20 clauses each, in one go."""
+	def populate(index_dir, documents):
+		import json
+		import random
+		from app.services.embeddings import LexicalScorer
+		rng = random.Random(documents)
+		scorer = LexicalScorer()
+		data = {}
+		for i in range(documents):
+			clauses = rng.sample(clause_pool, 20)
+			data[f'doc{i:06d}'] = {'clauses': clauses, 'idf': scorer._build_idf(clauses)}
+		index_dir.mkdir(parents=True, exist_ok=True)
+		(index_dir / 'doc_offsets.json').write_text(json.dumps(data), encoding='utf-8')
+	return populate
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+from app.services import profiler
+from app.services.admission import Lane
+
+
+def test_lane_share_splits_server_limits():
+	lane = Lane('upload', 8, 6, 1.0)
+	lane.share(4)
+	assert (lane.limit, lane.queue) == (2, 2)
+	# Shares round up to a usable slot and are always taken from the server-wide values
+	lane.share(16)
+	assert (lane.limit, lane.queue) == (1, 1)
+	lane.share(1)
+	assert (lane.limit, lane.queue) == (8, 6)
+
+	unlimited = Lane('chat', 0, 4, 1.0)
+	unlimited.share(4)
+	assert unlimited.limit == 0
+
+
+def test_profile_secret_only_in_header(monkeypatch):
+	monkeypatch.setattr(profiler, 'PROFILE_SECRET', 's3cret')
+	assert profiler.is_authorized(SimpleNamespace(headers={'X-Profile': 's3cret'}, args={}))
+	assert not profiler.is_authorized(SimpleNamespace(headers={}, args={'__profile': 's3cret'}))
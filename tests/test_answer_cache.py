@@ -0,0 +1,37 @@
+import pytest
+
+
+class CountingChatbot:
+	def __init__(self):
+		self.calls = []
+
+	def answer(self, query, doc_id=None):
+		self.calls.append((doc_id, query))
+		return f"answer {len(self.calls)}", []
+
+
+LEASE = ["The tenant pays rent of 1,000 dollars on the first day of each month.", "Either party may end the lease with notice."]
+LOAN = ["The borrower repays the loan in twelve monthly instalments.", "Late payments carry a fee of five percent."]
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_answers_survive_other_documents_writes(routes, client, monkeypatch, backend):
+	monkeypatch.setenv('INDEX_BACKEND', backend)
+	bot = CountingChatbot()
+	monkeypatch.setattr(routes, 'chatbot', bot)
+	index = routes.get_embedding_index()
+	index.add_document('lease', LEASE)
+
+	def ask():
+		return client.post('/chat', json={'query': 'When is rent due?', 'doc_id': 'lease'}).get_json()['answer']
+
+	assert ask() == 'answer 1'
+	assert ask() == 'answer 1'
+	# Another document's upload and delete leave the lease's answer cached
+	index.add_document('loan', LOAN)
+	index.remove_document('loan')
+	assert ask() == 'answer 1'
+	assert len(bot.calls) == 1
+	# Re-indexing the lease itself invalidates it
+	index.add_document('lease', LEASE[:1])
+	assert ask() == 'answer 2'
@@ -0,0 +1,35 @@
+import threading
+import time
+
+
+class SlowDocumentAI:
+	"""A Document AI batch job that outlives whatever timeout it is given."""
+
+	def __init__(self):
+		self.timeouts = []
+		self.vision_calls = 0
+
+	def documentai_enabled(self):
+		return True
+
+	def extract_text_with_documentai(self, source, timeout=None, cancel=None):
+		self.timeouts.append(timeout)
+		time.sleep(timeout)
+		return ''
+
+	def extract_text_with_vision(self, source, cancel=None):
+		self.vision_calls += 1
+		return ''
+
+
+def test_batch_ocr_wait_is_bounded(routes, monkeypatch, tmp_path):
+	service = SlowDocumentAI()
+	monkeypatch.setattr(routes, 'gcp_ocr_service', service)
+	monkeypatch.setattr(routes, 'OCR_CLOUD_TIMEOUT', 0.2)
+	scan = tmp_path / 'scan.pdf'
+	scan.write_bytes(b'%PDF-1.4')
+
+	assert routes.cloud_extract_text(str(scan), threading.Event()) == ''
+	assert service.timeouts == [0.2]
+	# The cloud budget is spent; the hedged extractor falls back to local OCR instead of Vision
+	assert service.vision_calls == 0
@@ -0,0 +1,55 @@
+from app.services.context_pack import ELLIPSIS, ContextPacker, estimate_tokens
+
+FILLER = 'The parties acknowledge the recitals set out above as accurate in every respect.'
+TERMINATION = 'Either party may terminate this lease on sixty days written notice.'
+LONG_CLAUSE = ' '.join([FILLER] * 4 + [TERMINATION] + [FILLER] * 4)
+
+
+def test_short_clauses_pass_through_whitespace_normalized():
+	packer = ContextPacker(budget_tokens=400)
+	assert packer.trim('rent', '  Rent is due\n\n monthly. ', 100) == 'Rent is due monthly.'
+
+
+def test_long_clause_keeps_query_sentences_in_reading_order():
+	packer = ContextPacker(budget_tokens=400)
+	excerpt = packer.trim('terminate on notice', LONG_CLAUSE, 30)
+	assert TERMINATION in excerpt
+	assert excerpt.startswith(ELLIPSIS) and excerpt.endswith(ELLIPSIS)
+	assert estimate_tokens(excerpt) <= 30 + 2
+
+
+def test_oversized_sentence_is_cut_to_its_head():
+	packer = ContextPacker(budget_tokens=400)
+	sentence = 'Rent ' + 'and other charges ' * 50 + 'are payable.'
+	excerpt = packer.trim('rent', sentence, 20)
+	assert excerpt == sentence[:80].rstrip() + ELLIPSIS
+
+
+def test_pack_orders_by_score_drops_repeats_and_respects_budget():
+	packer = ContextPacker(budget_tokens=120, clause_tokens=60)
+	clauses = [
+		FILLER,
+		TERMINATION,
+		'Either party may terminate this lease on sixty days notice in writing.',
+		'',
+		LONG_CLAUSE,
+		'Rent is payable monthly in advance.',
+	]
+	packed = packer.pack('terminate notice', clauses, scores=[0.1, 3.0, 2.5, 0.0, 2.0, 0.5])
+
+	# Near-duplicates and the long clause quoting the best one add nothing; empty clauses are skipped
+	assert packed == [TERMINATION, 'Rent is payable monthly in advance.', FILLER]
+
+
+def test_pack_trims_long_clauses_to_the_remaining_budget():
+	packer = ContextPacker(budget_tokens=60, clause_tokens=40)
+	packed = packer.pack('terminate notice', ['Rent is payable monthly in advance.', LONG_CLAUSE], scores=[1.0, 2.0])
+
+	assert TERMINATION in packed[0] and ELLIPSIS in packed[0]
+	assert sum(estimate_tokens(p) + 1 for p in packed) <= 60
+
+
+def test_tiny_remaining_budget_stops_packing():
+	packer = ContextPacker(budget_tokens=30, clause_tokens=30)
+	packed = packer.pack('rent', [FILLER, 'Rent is payable monthly in advance.'])
+	assert packed == [FILLER]
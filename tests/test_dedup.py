@@ -0,0 +1,42 @@
+from app.services.dedup import BANDS, NearDuplicateIndex
+
+
+SHARED = "Any dispute shall be resolved by binding arbitration seated in London under the LCIA rules."
+FIRST = "The Supplier shall indemnify the Buyer against all third party claims arising from the goods."
+SECOND = "Payment is due within thirty days of the invoice date by bank transfer to the Supplier."
+
+
+def _rows(index):
+	conn = index._conn()
+	return tuple(conn.execute(sql).fetchone()[0] for sql in (
+		"SELECT COUNT(*) FROM documents",
+		"SELECT COUNT(*) FROM clauses",
+		"SELECT COUNT(*) FROM signatures",
+		"SELECT COUNT(*) FROM bands",
+	))
+
+
+def test_remove_document_purges_unshared_clauses(tmp_path):
+	index = NearDuplicateIndex(tmp_path)
+	index.record_document('first', f"{FIRST}\n{SHARED}", [FIRST, SHARED])
+	index.record_document('second', f"{SECOND}\n{SHARED}", [SECOND, SHARED])
+	# 2 documents, 3 clauses, a sketch and BANDS bands for each document
+	assert _rows(index) == (2, 3, 2, 2 * BANDS)
+
+	assert index.remove_document('first')
+	assert _rows(index) == (1, 2, 1, BANDS)
+	assert index.clause_text(index.get_document('second')['clause_hashes'][1]) == SHARED
+
+	assert index.remove_document('second')
+	assert _rows(index) == (0, 0, 0, 0)
+	assert not index.remove_document('second')
+
+
+def test_revision_releases_clauses_it_no_longer_contains(tmp_path):
+	index = NearDuplicateIndex(tmp_path)
+	index.record_document('doc', f"{FIRST}\n{SHARED}", [FIRST, SHARED])
+	index.record_document('other', SHARED, [SHARED])
+	index.record_document('doc', f"{SECOND}\n{SHARED}", [SECOND, SHARED])
+
+	refs = dict(index._conn().execute('SELECT text, refs FROM clauses').fetchall())
+	assert refs == {SECOND: 1, SHARED: 2}
@@ -0,0 +1,84 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from app.services.dense import DenseIndex, HashingVectorizer
+
+
+def test_refresh_reloads_shards_revised_by_another_process(tmp_path):
+	writer = DenseIndex(tmp_path, vectorizer=HashingVectorizer())
+	reader = DenseIndex(tmp_path, vectorizer=HashingVectorizer())
+
+	writer.add_document('doc', ["The tenant pays rent on the first day of each month."])
+	assert [c for _, _, c in reader.search('rent', doc_id='doc')] == ["The tenant pays rent on the first day of each month."]
+
+	writer.add_document('doc', ["Either party may terminate this lease with sixty days notice."])
+	assert [c for _, _, c in reader.search('terminate notice', doc_id='doc')] == [
+		"Either party may terminate this lease with sixty days notice."]
+
+
+def test_concurrent_writers_never_lose_a_generation(tmp_path):
+	import threading
+
+	writers = [DenseIndex(tmp_path, vectorizer=HashingVectorizer()) for _ in range(4)]
+	threads = [threading.Thread(target=lambda w=w, n=n: [w.add_document(f'doc{n}-{i}', ['Rent is due monthly.']) for i in range(10)])
+	           for n, w in enumerate(writers)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+
+	reader = DenseIndex(tmp_path, vectorizer=HashingVectorizer())
+	assert len(reader._docs) == 40
+	assert all(w.document_version(None) == reader.generation for w in writers)
+
+
+def test_refresh_loads_only_changed_shards(tmp_path, monkeypatch):
+	writer = DenseIndex(tmp_path, vectorizer=HashingVectorizer())
+	reader = DenseIndex(tmp_path, vectorizer=HashingVectorizer())
+	for i in range(5):
+		writer.add_document(f'doc{i}', [f'Clause number {i} about rent.'])
+	reader.refresh()
+
+	loaded = []
+	original = DenseIndex._load_shard
+	monkeypatch.setattr(DenseIndex, '_load_shard', lambda self, doc_id: loaded.append(doc_id) or original(self, doc_id))
+	writer.add_document('doc2', ['Either party may terminate with notice.'])
+	writer.remove_document('doc4')
+	assert [c for _, _, c in reader.search('terminate notice', k=1)] == ['Either party may terminate with notice.']
+	assert loaded == ['doc2']
+	assert 'doc4' not in reader._docs
+
+
+def test_hybrid_keeps_the_same_clause_from_two_documents_apart(tmp_path):
+	from app.services.dense import HybridIndex
+	from app.services.embeddings import EmbeddingIndex
+
+	index = HybridIndex(EmbeddingIndex(tmp_path), DenseIndex(tmp_path, vectorizer=HashingVectorizer()))
+	boilerplate = 'This agreement is governed by the laws of the State of New York.'
+	index.add_document('a', [boilerplate, 'The tenant pays rent monthly.'])
+	index.add_document('b', [boilerplate, 'The buyer pays the purchase price at closing.'])
+
+	results = index.search('governed by the laws of New York', k=2, with_doc_id=True)
+	assert sorted((did, pos) for pos, _, _, did in results) == [('a', 0), ('b', 0)]
+
+
+def test_only_one_process_reindexes_stale_documents(tmp_path):
+	fcntl = pytest.importorskip('fcntl')
+	from app.services.embedding_pipeline import EmbeddingPipeline, VectorCache
+
+	old_model = HashingVectorizer()
+	old_model.model_version = 'other-model'
+	DenseIndex(tmp_path, vectorizer=old_model).add_document('doc', ['Rent is due monthly.'])
+	dense = DenseIndex(tmp_path, vectorizer=HashingVectorizer())
+	pipeline = EmbeddingPipeline(dense, VectorCache(tmp_path / 'vectors.sqlite3'), background=False)
+	lock_path = dense.dir / '_reindex.lock'
+
+	with open(lock_path, 'a+b') as held:
+		fcntl.flock(held.fileno(), fcntl.LOCK_EX)
+		assert pipeline.reindex_stale_once(lock_path) == 0
+		assert dense.stale_documents() == ['doc']
+		fcntl.flock(held.fileno(), fcntl.LOCK_UN)
+
+	assert pipeline.reindex_stale_once(lock_path) == 1
+	assert dense.stale_documents() == []
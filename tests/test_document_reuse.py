@@ -0,0 +1,53 @@
+CLAUSES = [
+	"The Supplier shall indemnify the Buyer against all third party claims arising from the goods.",
+	"Payment is due within thirty days of the invoice date by bank transfer to the Supplier.",
+	"Any dispute shall be resolved by binding arbitration seated in London under the LCIA rules.",
+	"This agreement is governed by the laws of England and Wales and the courts of London.",
+	"Either party may terminate this agreement on ninety days written notice to the other party.",
+	"The Supplier warrants that the goods conform to the specification for twelve months after delivery.",
+	"Neither party may assign this agreement without the prior written consent of the other party.",
+	"Notices must be in writing and delivered by hand or by recorded post to the registered office.",
+]
+EDITED = CLAUSES[:4] + [CLAUSES[4].replace('ninety', 'seven')] + CLAUSES[5:]
+RISKY = [CLAUSES[0], CLAUSES[2], CLAUSES[4], EDITED[4]]
+
+
+def _document(clauses):
+	return '\n'.join(f"{n}. {clause}" for n, clause in enumerate(clauses, 1))
+
+
+def _risks_for(text):
+	return [
+		{'risk_level': 'High', 'risk_percent': 90, 'description': f"Concern: {clause[:30]}", 'labels': ['High risk'],
+		 'preview': clause}
+		for clause in RISKY if clause in text
+	]
+
+
+def _upload(routes, client, text):
+	client.post('/process_text', data={'raw_text': text})
+	conn = routes.get_dedup_index()._conn()
+	doc_id = conn.execute('SELECT doc_id FROM documents ORDER BY created DESC LIMIT 1').fetchone()[0]
+	return routes.get_dedup_index().get_document(doc_id)
+
+
+def test_near_duplicate_reanalyzes_only_new_clauses(routes, client, summarizer):
+	summarizer.risks_for = _risks_for
+	first = _upload(routes, client, _document(CLAUSES))
+	assert [r['preview'] for r in first['risks']] == RISKY[:3]
+
+	second = _upload(routes, client, _document(EDITED))
+	assert summarizer.risk_calls[-1] == EDITED[4]
+	assert summarizer.summary_calls[-1] == _document(EDITED)
+	assert [r['preview'] for r in second['risks']] == [CLAUSES[0], CLAUSES[2], EDITED[4]]
+
+
+def test_identical_text_reuses_whole_analysis(routes, client, summarizer):
+	summarizer.risks_for = _risks_for
+	first = _upload(routes, client, _document(CLAUSES))
+	calls = len(summarizer.risk_calls), len(summarizer.summary_calls)
+
+	again = _upload(routes, client, _document(CLAUSES).replace('\n', '\n\n'))
+	assert again['doc_id'] != first['doc_id']
+	assert (len(summarizer.risk_calls), len(summarizer.summary_calls)) == calls
+	assert again['risks'] == first['risks'] and again['summary'] == first['summary']
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+documentai = pytest.importorskip('google.cloud.documentai')
+
+from app.services.gcp_documentai import DocumentAIBatchRunner
+
+
+class FakeBlob:
+	def __init__(self, bucket, name):
+		self.bucket = bucket
+		self.name = name
+
+	def upload_from_filename(self, path, content_type=None):
+		with open(path, 'rb') as fh:
+			self.bucket.objects[self.name] = fh.read()
+
+	def download_as_bytes(self):
+		return self.bucket.objects[self.name]
+
+	def delete(self):
+		del self.bucket.objects[self.name]
+
+
+class FakeBucket:
+	name = 'bucket'
+
+	def __init__(self):
+		self.objects = {}
+
+	def blob(self, name):
+		return FakeBlob(self, name)
+
+	def list_blobs(self, prefix):
+		return [FakeBlob(self, n) for n in sorted(self.objects) if n.startswith(prefix)]
+
+
+class FakeOperation:
+	def __init__(self):
+		self.finished = threading.Event()
+		self.cancelled = threading.Event()
+		self.error = None
+
+	def done(self):
+		return self.finished.is_set()
+
+	def exception(self):
+		return self.error
+
+	def cancel(self):
+		self.cancelled.set()
+
+
+class FakeDocumentAI:
+	"""batch_process_documents stand-in that hands back operations the test completes."""
+
+	def __init__(self):
+		self.requests = []
+		self.operations = []
+
+	def batch_process_documents(self, request):
+		self.requests.append(request)
+		self.operations.append(FakeOperation())
+		return self.operations[-1]
+
+
+def _write_shards(bucket, request, texts):
+	prefix = request['document_output_config']['gcs_output_config']['gcs_uri'].split('/', 3)[3]
+	# Listed in name order, which is not shard order
+	for index, name in ((2, 'a'), (0, 'b'), (1, 'c')):
+		document = documentai.Document(text=texts[index], shard_info={'shard_index': index})
+		bucket.objects[f'{prefix}0/{name}-{index}.json'] = documentai.Document.to_json(document).encode('utf-8')
+
+
+def _wait_idle(runner, timeout=5.0):
+	deadline = time.monotonic() + timeout
+	while runner._worker is not None and time.monotonic() < deadline:
+		time.sleep(0.01)
+	return runner._worker is None
+
+
+@pytest.fixture
+def runner(tmp_path):
+	source = tmp_path / 'contract.pdf'
+	source.write_bytes(b'%PDF-1.4')
+	runner = DocumentAIBatchRunner(FakeDocumentAI(), FakeBucket(), poll_interval=0.01, timeout=5)
+	runner.source = str(source)
+	return runner
+
+
+def test_completed_job_merges_shards_in_order_and_cleans_up(runner):
+	future = runner.submit(runner.source, 'processors/p', 'application/pdf')
+	_write_shards(runner.bucket, runner.documentai_client.requests[0], ['first ', 'second ', 'third'])
+	runner.documentai_client.operations[0].finished.set()
+
+	assert future.result(timeout=5) == 'first second third'
+	assert _wait_idle(runner)
+	assert runner.bucket.objects == {}
+
+
+def test_timed_out_job_is_cancelled(runner):
+	runner.timeout = 0.05
+	future = runner.submit(runner.source, 'processors/p', 'application/pdf')
+
+	with pytest.raises(TimeoutError):
+		future.result(timeout=5)
+	assert runner.documentai_client.operations[0].cancelled.is_set()
+
+
+def test_cancelling_the_future_cancels_the_operation(runner):
+	future = runner.submit(runner.source, 'processors/p', 'application/pdf')
+	assert future.cancel()
+
+	assert runner.documentai_client.operations[0].cancelled.wait(5)
+	assert _wait_idle(runner)
+	assert runner.bucket.objects == {}
+
+
+def test_failed_operation_surfaces_its_error(runner):
+	future = runner.submit(runner.source, 'processors/p', 'application/pdf')
+	operation = runner.documentai_client.operations[0]
+	operation.error = RuntimeError('quota exceeded')
+	operation.finished.set()
+
+	with pytest.raises(RuntimeError, match='quota exceeded'):
+		future.result(timeout=5)
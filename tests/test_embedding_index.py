@@ -0,0 +1,55 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from app.services.embeddings import EmbeddingIndex
+
+
+def _add_documents(index_dir, worker, count):
+	index = EmbeddingIndex(index_dir)
+	for i in range(count):
+		index.add_document(f'w{worker}-{i}', [f'Worker {worker} clause {i} about rent.'])
+
+
+def test_writers_in_several_processes_lose_no_documents(tmp_path):
+	pytest.importorskip('fcntl')
+	context = multiprocessing.get_context('fork')
+	reader = EmbeddingIndex(tmp_path)
+	processes = [context.Process(target=_add_documents, args=(tmp_path, w, 15)) for w in range(4)]
+	for p in processes:
+		p.start()
+	for p in processes:
+		p.join(60)
+	assert [p.exitcode for p in processes] == [0] * 4
+
+	# The reader loaded before any write; one search picks up every process's documents
+	assert reader.search('worker 3 clause 14', k=1, doc_id='w3-14')[0][2] == 'Worker 3 clause 14 about rent.'
+	assert len(reader.docid_to_offsets) == 60
+	assert reader.generation == 60
+
+
+def test_readers_keep_a_consistent_snapshot_while_threads_write(tmp_path):
+	index = EmbeddingIndex(tmp_path)
+	index.add_document('lease', ['The tenant pays rent monthly.'])
+	errors = []
+
+	def write():
+		for i in range(40):
+			index.add_document(f'doc{i}', [f'Clause {i}.'])
+			index.remove_document(f'doc{i}')
+
+	def read():
+		try:
+			for _ in range(200):
+				assert index.search('rent', k=1, doc_id='lease')[0][2] == 'The tenant pays rent monthly.'
+		except Exception as e:
+			errors.append(e)
+
+	threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	assert errors == []
+	assert list(index.docid_to_offsets) == ['lease']
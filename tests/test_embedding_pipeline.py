@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from app.services.dense import DenseIndex, HashingVectorizer
+from app.services.embedding_pipeline import EmbeddingPipeline, VectorCache
+
+
+def test_delete_racing_a_batch_write_leaves_no_vectors(tmp_path):
+	dense = DenseIndex(tmp_path, vectorizer=HashingVectorizer())
+	pipeline = EmbeddingPipeline(dense, VectorCache(tmp_path / 'vectors.sqlite3'), batch_window=0)
+	entered, gate = threading.Event(), threading.Event()
+	add_vectors = dense.add_vectors
+
+	def slow_add_vectors(*args):
+		entered.set()
+		gate.wait(5)
+		add_vectors(*args)
+
+	dense.add_vectors = slow_add_vectors
+	pipeline.submit('doc', ['The tenant pays rent monthly.'])
+	assert entered.wait(5)
+
+	def delete():
+		pipeline.cancel('doc')
+		dense.remove_document('doc')
+
+	deleter = threading.Thread(target=delete)
+	deleter.start()
+	# cancel() waits for the write already under way, then the delete removes it
+	deleter.join(0.2)
+	assert deleter.is_alive()
+	gate.set()
+	deleter.join(5)
+	assert pipeline.flush(5)
+
+	assert dense.search('rent', doc_id='doc') == []
+	assert pipeline._cancelled == set() and pipeline._pending == {}
+
+
+def test_cancel_without_queued_work_is_not_remembered(tmp_path):
+	pipeline = EmbeddingPipeline(DenseIndex(tmp_path, vectorizer=HashingVectorizer()),
+		VectorCache(tmp_path / 'vectors.sqlite3'), background=False)
+	pipeline.cancel('doc')
+	assert pipeline._cancelled == set()
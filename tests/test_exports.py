@@ -0,0 +1,32 @@
+import json
+
+from app.services import exports
+from app.services.revisions import load_previous_clauses
+
+CLAUSES = [
+	"1. Rent is payable monthly in advance.",
+	"2. Termination.\n\n(a) Either party may terminate on sixty days notice.\n\n(b) The landlord may terminate at once for non-payment.",
+	"3. This lease is governed by the laws of Ontario.",
+]
+
+
+def test_multi_paragraph_clause_exports_as_one_entry(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	exports.PROCESSED_DIR.mkdir(parents=True)
+	exports.write_clauses(exports.artifact_path('doc', 'clauses'), CLAUSES)
+	risk = {'risk_level': 'High', 'clause_index': 2, 'description': 'Governing law'}
+
+	path = exports.materialize_export('doc', 'clauses', 'ndjson', [risk])
+	rows = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+	assert [r['text'] for r in rows] == CLAUSES
+	assert [r['risk'] for r in rows] == [None, None, risk]
+	text = exports.artifact_path('doc', 'clauses').read_text(encoding='utf-8')
+	assert all(text[r['start']:r['end']] == r['text'] for r in rows)
+	assert load_previous_clauses(exports.PROCESSED_DIR, 'doc') == CLAUSES
+
+
+def test_artifacts_without_boundaries_still_split_on_blank_lines(tmp_path):
+	path = tmp_path / 'doc_clauses.bin'
+	path.write_text('\n\n'.join(CLAUSES[::2]), encoding='utf-8')
+	assert list(exports.iter_stored_clauses(path, chunk_size=7)) == CLAUSES[::2]
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from app.services.extraction import HedgedExtractor, is_good_text, text_quality
+
+GOOD = 'The tenant shall pay rent monthly in advance under the terms of this agreement. ' * 3
+GARBAGE = '~~ |1l| ;;; %% ## @@ ^^ ' * 10
+
+
+def _hanging(calls, name):
+	def extract(path, cancel):
+		calls.append(name)
+		cancel.wait(5)
+		return GOOD if not cancel.is_set() else ''
+	return extract
+
+
+def _returning(calls, name, text):
+	def extract(path, cancel):
+		calls.append(name)
+		return text
+	return extract
+
+
+def test_text_quality_separates_words_from_ocr_noise():
+	assert text_quality(GOOD) > 0.9
+	assert text_quality(GARBAGE) < 0.2
+	assert is_good_text(GOOD) and not is_good_text(GARBAGE) and not is_good_text('Rent.')
+
+
+def test_native_text_skips_ocr(tmp_path):
+	path = tmp_path / 'lease.txt'
+	path.write_text(GOOD, encoding='utf-8')
+	calls = []
+	extractor = HedgedExtractor(_returning(calls, 'cloud', GOOD), _returning(calls, 'local', GOOD))
+	assert extractor.extract(str(path)) == GOOD
+	assert calls == []
+
+
+def test_fast_cloud_result_wins_without_local_ocr():
+	calls = []
+	extractor = HedgedExtractor(_returning(calls, 'cloud', GOOD), _returning(calls, 'local', GOOD), hedge_delay=1.0)
+	assert extractor.extract('scan.png') == GOOD
+	assert calls == ['cloud']
+
+
+def test_slow_cloud_is_hedged_and_cancelled():
+	calls = []
+	cancelled = threading.Event()
+
+	def cloud(path, cancel):
+		calls.append('cloud')
+		cancel.wait(5)
+		if cancel.is_set():
+			cancelled.set()
+		return ''
+
+	extractor = HedgedExtractor(cloud, _returning(calls, 'local', GOOD), hedge_delay=0.05)
+	start = time.monotonic()
+	assert extractor.extract('scan.png') == GOOD
+	assert time.monotonic() - start < 2
+	assert cancelled.wait(2)
+	assert calls == ['cloud', 'local']
+
+
+def test_unusable_cloud_result_starts_local_ocr_at_once():
+	calls = []
+	extractor = HedgedExtractor(_returning(calls, 'cloud', GARBAGE), _returning(calls, 'local', GOOD), hedge_delay=10)
+	start = time.monotonic()
+	assert extractor.extract('scan.png') == GOOD
+	assert time.monotonic() - start < 2
+
+
+def test_lone_cloud_call_is_abandoned_after_timeout():
+	calls = []
+	local_text = 'Rent ~~ |1l| ;;; %% ## @@ ^^'
+	extractor = HedgedExtractor(_hanging(calls, 'cloud'), _returning(calls, 'local', local_text),
+		hedge_delay=0, cloud_timeout=0.2)
+	start = time.monotonic()
+	assert extractor.extract('scan.png') == local_text
+	assert time.monotonic() - start < 2
+
+
+def test_unavailable_cloud_goes_straight_to_local():
+	calls = []
+	extractor = HedgedExtractor(_returning(calls, 'cloud', GOOD), _returning(calls, 'local', GOOD),
+		cloud_available=lambda: False)
+	assert extractor.extract('scan.png') == GOOD
+	assert calls == ['local']
@@ -0,0 +1,60 @@
+import io
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+gcp_ocr = pytest.importorskip('app.services.gcp_ocr')
+
+
+def _page(n):
+	# The page number is carried in the image width so both OCR paths can read it back
+	buffer = io.BytesIO()
+	Image.new('L', (10 + n, 8), 255).save(buffer, format='PNG')
+	return buffer.getvalue()
+
+
+class FakeVision:
+	"""batch_annotate_images stand-in: earlier batches answer last, and every page
+	whose number is a multiple of 5 comes back with an error."""
+
+	def __init__(self):
+		self.batches = []
+		self.active = 0
+		self.peak = 0
+		self._lock = threading.Lock()
+
+	def batch_annotate_images(self, requests):
+		numbers = [Image.open(io.BytesIO(r['image']['content'])).width - 10 for r in requests]
+		with self._lock:
+			self.batches.append(numbers)
+			self.active += 1
+			self.peak = max(self.peak, self.active)
+			delay = max(0.0, 0.2 - 0.05 * len(self.batches))
+		time.sleep(delay)
+		with self._lock:
+			self.active -= 1
+		return SimpleNamespace(responses=[
+			SimpleNamespace(
+				error=SimpleNamespace(message='deadline exceeded' if n % 5 == 0 else ''),
+				full_text_annotation=SimpleNamespace(text=f'vision {n}'),
+				text_annotations=[],
+			)
+			for n in numbers
+		])
+
+
+def test_vision_batches_keep_order_cap_and_fall_back_per_page(monkeypatch):
+	monkeypatch.setattr(gcp_ocr, 'VISION_BATCH_SIZE', 3)
+	monkeypatch.setattr(gcp_ocr, 'VISION_MAX_IN_FLIGHT', 2)
+	monkeypatch.setattr(gcp_ocr, 'ocr_image', lambda image: f'local {image.width - 10}')
+	vision = FakeVision()
+	service = gcp_ocr.GCPOCRService(vision_client=vision, documentai_client=object())
+
+	texts = service.ocr_pages_with_vision(_page(n) for n in range(11))
+
+	assert texts == [f"{'local' if n % 5 == 0 else 'vision'} {n}" for n in range(11)]
+	assert sorted(vision.batches) == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9, 10]]
+	assert vision.peak == 2
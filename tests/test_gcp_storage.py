@@ -0,0 +1,99 @@
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+gcp_storage = pytest.importorskip('app.services.gcp_storage')
+
+
+class FakeStore:
+	"""Objects shared by every client, plus a record of listing calls and batch sizes."""
+
+	def __init__(self, names):
+		self.objects = {name: len(name) for name in names}
+		self.listings = []
+		self.batches = []
+		self.lock = threading.Lock()
+
+
+class FakeBucket:
+	def __init__(self, client, name):
+		self.client = client
+		self.name = name
+
+	def exists(self):
+		return True
+
+	def blob(self, name):
+		return SimpleNamespace(name=name, delete=lambda: self.client.delete(name))
+
+
+class FakeClient:
+	def __init__(self, store):
+		self.store = store
+		self._http = requests.Session()
+		self._batch = None
+
+	def bucket(self, name):
+		return FakeBucket(self, name)
+
+	def list_blobs(self, bucket, prefix, page_size, page_token, fields):
+		self.store.listings.append(fields)
+		with self.store.lock:
+			names = sorted(n for n in self.store.objects if n.startswith(prefix))
+		start = int(page_token or 0)
+		page = [SimpleNamespace(name=n, size=self.store.objects.get(n), time_created=None, updated=None, metadata=None)
+			for n in names[start:start + page_size]]
+		more = start + page_size < len(names)
+		return SimpleNamespace(pages=iter([page]), next_page_token=str(start + page_size) if more else None)
+
+	def delete(self, name):
+		if self._batch is not None:
+			self._batch.append(name)
+			return
+		with self.store.lock:
+			del self.store.objects[name]
+
+	@contextmanager
+	def batch(self, raise_exception=True):
+		self._batch = []
+		try:
+			yield
+		finally:
+			names, self._batch = self._batch, None
+			with self.store.lock:
+				self.store.batches.append(len(names))
+				for name in names:
+					# raise_exception=False: objects already gone do not fail the batch
+					self.store.objects.pop(name, None)
+
+
+@pytest.fixture
+def store():
+	return FakeStore([f'documents/doc/file{i:03d}' for i in range(250)] + ['documents/other/keep'])
+
+
+@pytest.fixture
+def storage(store):
+	return gcp_storage.GCPStorageService(bucket_name='docs', storage_client=FakeClient(store),
+		client_factory=lambda: FakeClient(store))
+
+
+def test_folder_delete_streams_names_and_batches_deletes(storage, store):
+	assert storage.delete_document_folder('doc')
+
+	assert list(store.objects) == ['documents/other/keep']
+	assert sorted(store.batches) == [50, 100, 100]
+	# Names are listed page by page with only the name field sent back
+	assert store.listings == ['items(name),nextPageToken']
+
+
+def test_paged_listing_resumes_from_a_token(storage, store):
+	first, token = storage.list_documents_page('doc', page_size=100)
+	assert [d['name'] for d in first] == [f'documents/doc/file{i:03d}' for i in range(100)]
+	rest = list(storage.iter_documents('doc', page_size=100, page_token=token))
+	assert len(rest) == 150 and rest[-1]['name'] == 'documents/doc/file249'
+	assert storage.list_documents_page('doc', page_size=1000)[1] is None
+	assert set(store.listings) == {f'items({gcp_storage.LIST_FIELDS}),nextPageToken'}
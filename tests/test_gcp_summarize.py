@@ -0,0 +1,72 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+gcp_summarize = pytest.importorskip('app.services.gcp_summarize')
+
+
+class FakeGemini:
+	def __init__(self, reply, json_mode=True):
+		self.reply = reply
+		self.json_mode = json_mode
+		self.calls = []
+
+	def generate_content(self, prompt, generation_config=None):
+		self.calls.append((prompt, generation_config))
+		if generation_config and not self.json_mode:
+			raise ValueError('Unknown field for GenerationConfig: response_mime_type')
+		return SimpleNamespace(text=self.reply)
+
+
+def _service(model, structured=False):
+	service = gcp_summarize.GCPSummarizationService.__new__(gcp_summarize.GCPSummarizationService)
+	service.gemini_model = model
+	service._structured_output = structured
+	return service
+
+
+REPLY = {
+	'summary': ' A one-year lease. ',
+	'risks': [
+		{'risk_level': 'high', 'description': 'Uncapped liability', 'clause': 'The tenant is liable for all losses.'},
+		{'risk_level': 'severe', 'description': 'Short notice'},
+		{'description': ''},
+		'not a risk',
+	],
+	'clauses': [{'type': 'Payment Terms', 'description': 'Rent monthly', 'importance': 'low'}],
+}
+
+
+def test_combined_reply_is_decoded_in_one_call():
+	model = FakeGemini('```json\n' + json.dumps(REPLY) + '\n```')
+	analysis = _service(model).analyze_document('lease text', include_clauses=True)
+
+	assert len(model.calls) == 1
+	assert analysis['summary'] == 'A one-year lease.'
+	assert [(r['risk_level'], r['risk_percent'], r['preview']) for r in analysis['risks']] == [
+		('High', 100, 'The tenant is liable for all losses.'), ('Medium', 60, 'Short notice')]
+	assert analysis['clauses'] == [
+		{'type': 'Payment Terms', 'description': 'Rent monthly', 'details': '', 'importance': 'Low'}]
+
+
+@pytest.mark.parametrize('reply', ['{"summary": "cut off', '[]', '{"summary": "  ", "risks": []}', ''])
+def test_malformed_reply_falls_back_to_separate_prompts(reply):
+	assert _service(FakeGemini(reply)).analyze_document('lease text') is None
+
+
+def test_sdk_without_json_mode_gets_the_schema_in_the_prompt():
+	model = FakeGemini(json.dumps(REPLY), json_mode=False)
+	service = _service(model, structured=True)
+
+	assert service.analyze_document('lease text')['summary'] == 'A one-year lease.'
+	assert service.analyze_document('lease text')['summary'] == 'A one-year lease.'
+	# JSON mode is tried once; afterwards only the prompt asks for JSON
+	assert [config is None for _, config in model.calls] == [False, True, True]
+	assert 'Respond with only a JSON object' in model.calls[-1][0]
+
+
+def test_pinned_sdk_is_detected_without_a_failed_call():
+	import google.generativeai as genai
+	if genai.__version__ == '0.3.2':
+		assert not gcp_summarize.supports_json_mode()
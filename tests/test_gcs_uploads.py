@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+import requests
+
+gcp_storage = pytest.importorskip('app.services.gcp_storage')
+from app.services.gcp_storage_pipeline import StorageUploadPipeline
+
+
+class StubBlob:
+	def __init__(self, bucket, name):
+		self.bucket = bucket
+		self.name = name
+		self.metadata = None
+
+	def exists(self):
+		return self.name in self.bucket.objects
+
+	def upload_from_filename(self, path):
+		self.bucket.store(self.name, open(path, 'rb').read())
+
+	def upload_from_string(self, content, content_type=None):
+		self.bucket.store(self.name, content.encode('utf-8'))
+
+
+class StubBucket:
+	def __init__(self, name):
+		self.name = name
+		self.objects = {}
+		self._lock = threading.Lock()
+
+	def exists(self):
+		return True
+
+	def blob(self, name):
+		return StubBlob(self, name)
+
+	def store(self, name, data):
+		with self._lock:
+			self.objects[name] = data
+
+
+class StubClient:
+	def __init__(self, bucket):
+		self._bucket = bucket
+		self._http = requests.Session()
+
+	def bucket(self, name):
+		return self._bucket
+
+
+@pytest.fixture
+def storage():
+	bucket = StubBucket('docs')
+	return gcp_storage.GCPStorageService(bucket_name='docs', storage_client=StubClient(bucket),
+		client_factory=lambda: StubClient(bucket))
+
+
+def _pool_size(client):
+	return client._http.get_adapter('https://storage.googleapis.com/')._pool_maxsize
+
+
+def test_connection_pool_on_shared_and_thread_clients(storage):
+	assert _pool_size(storage.storage_client) == storage.pool_size
+	clients = []
+	thread = threading.Thread(target=lambda: clients.append(storage._thread_client()))
+	thread.start()
+	thread.join()
+	assert clients[0] is not storage.storage_client
+	assert _pool_size(clients[0]) == storage.pool_size
+
+
+def _artifacts(pipeline, tmp_path):
+	original = tmp_path / 'lease.pdf'
+	original.write_bytes(b'%PDF-1.4 lease')
+	return [
+		pipeline.file_artifact(str(original), 'original'),
+		pipeline.text_artifact('Extracted lease text', 'extracted_text'),
+		pipeline.text_artifact('A short summary', 'summary'),
+	]
+
+
+EXPECTED = {
+	'documents/d1/original_d1': b'%PDF-1.4 lease',
+	'documents/d1/extracted_text_d1.txt': b'Extracted lease text',
+	'documents/d1/summary_d1.txt': b'A short summary',
+}
+
+
+def test_sync_upload(storage, tmp_path):
+	pipeline = StorageUploadPipeline(storage, spool_dir=str(tmp_path / 'spool'), mode='sync')
+	pipeline.submit('d1', _artifacts(pipeline, tmp_path))
+	assert storage.bucket.objects == EXPECTED
+	assert pipeline.pending_jobs() == 0
+
+
+def test_background_upload_drains_spool(storage, tmp_path):
+	pipeline = StorageUploadPipeline(storage, spool_dir=str(tmp_path / 'spool'), mode='background')
+	pipeline.submit('d1', _artifacts(pipeline, tmp_path))
+	spool = tmp_path / 'spool'
+	deadline = time.monotonic() + 10
+	# A job leaves the spool (*.json, then *.inflight while claimed) only once every artifact is uploaded
+	while list(spool.glob('*.json*')) and time.monotonic() < deadline:
+		time.sleep(0.05)
+	assert not list(spool.glob('*.json*'))
+	assert storage.bucket.objects == EXPECTED
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from app.services.embeddings import EmbeddingIndex
+from app.services.embeddings_sqlite import SQLiteEmbeddingIndex
+
+QUERIES = ['termination notice period', 'indemnify and hold harmless', 'late fee payment', 'binding arbitration']
+
+
+@pytest.fixture(scope='module')
+def indexes(tmp_path_factory, populate_index_dir):
+	"""Both backends over one corpus of 300 documents, 6000 clauses: well past the default cap."""
+	index_dir = tmp_path_factory.mktemp('index')
+	populate_index_dir(index_dir, 300)
+	return EmbeddingIndex(index_dir), SQLiteEmbeddingIndex(index_dir), SQLiteEmbeddingIndex(index_dir, max_candidates=0)
+
+
+def _top(index, query, **kwargs):
+	return [(position, round(score, 9), clause) for position, score, clause in index.search(query, k=5, **kwargs)]
+
+
+@pytest.mark.parametrize('query', QUERIES + ['rent', 'terminate notice days', 'liability unlimited confidentiality', 'the party shall pay'])
+def test_sqlite_matches_json_past_candidate_cap(indexes, query):
+	json_index, capped, uncapped = indexes
+	assert capped._count_documents() * 20 > capped.max_candidates
+	expected = _top(json_index, query)
+	assert _top(capped, query) == expected
+	assert _top(uncapped, query) == expected
+	assert _top(capped, query, doc_id='doc000042') == _top(json_index, query, doc_id='doc000042')
+
+
+def test_idf_cache_survives_concurrent_searches_and_writes(tmp_path, clause_pool):
+	index = SQLiteEmbeddingIndex(tmp_path)
+	for i in range(20):
+		index.add_document(f'doc{i}', clause_pool[i * 10:(i + 1) * 10])
+	expected = {q: index.search(q, k=5) for q in QUERIES}
+	errors = []
+
+	def search():
+		try:
+			for _ in range(30):
+				for q in QUERIES:
+					assert index.search(q, k=5) == expected[q]
+		except Exception as e:
+			errors.append(e)
+
+	def write():
+		# Documents with no clauses bump the generation (resetting the cache) without changing results
+		for i in range(30):
+			index.add_document(f'empty{i}', [])
+
+	threads = [threading.Thread(target=search) for _ in range(4)] + [threading.Thread(target=write)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	assert errors == []
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from app.services import lazy
+from app.services.lazy import LazyService
+
+
+def test_app_starts_without_importing_google_clients():
+	code = (
+		"import sys\n"
+		"from app import create_app\n"
+		"create_app(start_background=False)\n"
+		"heavy = ('google.cloud.storage', 'google.cloud.documentai', 'google.cloud.aiplatform', 'google.generativeai',\n"
+		"         'app.services.gcp_config', 'app.services.gcp_ocr', 'app.services.gcp_summarize')\n"
+		"print(sorted(m for m in heavy if m in sys.modules))\n"
+	)
+	root = Path(__file__).resolve().parents[1]
+	out = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, timeout=120)
+	assert out.returncode == 0, out.stderr
+	assert out.stdout.strip().splitlines()[-1] == '[]'
+
+
+def test_service_is_built_once_on_first_use(tmp_path, monkeypatch):
+	(tmp_path / 'slow_service.py').write_text(
+		"import time\n"
+		"built = []\n"
+		"class Service:\n"
+		"    def __init__(self):\n"
+		"        time.sleep(0.1)\n"
+		"        built.append(self)\n"
+		"        self.name = 'slow'\n"
+		"service = Service()\n",
+		encoding='utf-8',
+	)
+	monkeypatch.syspath_prepend(str(tmp_path))
+	proxy = LazyService('slow_service:service')
+	assert not proxy.lazy_loaded()
+
+	names = []
+	threads = [threading.Thread(target=lambda: names.append(proxy.name)) for _ in range(8)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+
+	import slow_service
+	assert names == ['slow'] * 8 and len(slow_service.built) == 1
+	proxy.name = 'renamed'
+	assert slow_service.service.name == 'renamed'
+	report = lazy.startup_report({'service': proxy})
+	assert report['services']['service']['initialized']
+	assert report['services']['service']['trigger'] == 'request'
@@ -0,0 +1,120 @@
+import json
+import time
+
+import pytest
+
+from app.services import exports, lifecycle
+from app.services.dedup import NearDuplicateIndex
+from app.services.embeddings import EmbeddingIndex
+from app.services.lifecycle import LifecycleManager, record_artifacts
+from app.services.query_cache import QueryCache
+
+CLAUSES = ["The tenant pays rent monthly.", "Either party may end the lease with sixty days notice."]
+
+
+class FakeStorage:
+	def __init__(self):
+		self.deleted = []
+
+	def is_available(self):
+		return True
+
+	def delete_document_folder(self, doc_id):
+		self.deleted.append(doc_id)
+
+
+class FakeUploadPipeline:
+	def __init__(self):
+		self.discarded = []
+
+	def discard_jobs(self, doc_id):
+		self.discarded.append(doc_id)
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	index, dedup, cache = EmbeddingIndex(tmp_path / 'index'), NearDuplicateIndex(tmp_path / 'index'), QueryCache()
+	manager = LifecycleManager(
+		indexes=lambda: [index, dedup], storage=FakeStorage(), upload_pipeline=FakeUploadPipeline(),
+		on_delete=[cache.invalidate_doc, exports.remove_exports], ttl_days=1, sweep_ops=0,
+	)
+	return manager, index, dedup, cache
+
+
+def _store(doc_id, index, dedup, cache):
+	lifecycle.PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+	lifecycle.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+	upload = lifecycle.UPLOAD_DIR / f'{doc_id}_lease.txt'
+	upload.write_text('\n'.join(CLAUSES), encoding='utf-8')
+	summary = lifecycle.PROCESSED_DIR / f'{doc_id}_summary.bin'
+	summary.write_text('A lease.', encoding='utf-8')
+	exports.write_clauses(exports.artifact_path(doc_id, 'clauses'), CLAUSES)
+	record_artifacts(doc_id, [upload, summary, exports.artifact_path(doc_id, 'clauses')])
+	exports.materialize_export(doc_id, 'clauses', 'json')
+	index.add_document(doc_id, CLAUSES)
+	dedup.record_document(doc_id, '\n'.join(CLAUSES) + doc_id, CLAUSES, summary='A lease.', risks=[])
+	cache.put(cache.key(doc_id, 'When is rent due?', 1), 'Monthly.')
+
+
+def _files(doc_id):
+	return sorted(p.name for d in (lifecycle.PROCESSED_DIR, lifecycle.UPLOAD_DIR, exports.EXPORT_CACHE_DIR)
+		for p in d.glob(f'{doc_id}_*'))
+
+
+def test_delete_removes_the_document_everywhere(setup):
+	manager, index, dedup, cache = setup
+	for doc_id in ('lease', 'other'):
+		_store(doc_id, index, dedup, cache)
+	assert len(_files('lease')) == 6
+
+	assert manager.delete('lease')
+
+	assert _files('lease') == []
+	assert index.document_version('lease') is None
+	assert dedup.get_document('lease') is None
+	assert cache.get(cache.key('lease', 'When is rent due?', 1)) is None
+	assert manager.storage.deleted == ['lease'] and manager.upload_pipeline.discarded == ['lease']
+	# The other document is untouched, shared clauses included
+	assert len(_files('other')) == 6
+	assert index.search('rent', doc_id='other')
+	assert dedup.clause_text(dedup.get_document('other')['clause_hashes'][0]) == CLAUSES[0]
+	assert cache.get(cache.key('other', 'When is rent due?', 1)) == 'Monthly.'
+
+
+def test_delete_rejects_ids_that_could_escape_the_data_dirs(setup):
+	manager = setup[0]
+	assert not manager.delete('../lease')
+	assert manager.storage.deleted == []
+
+
+def test_sweep_removes_only_expired_documents(setup):
+	manager, index, dedup, cache = setup
+	for doc_id in ('old', 'new'):
+		_store(doc_id, index, dedup, cache)
+	manifest = lifecycle.manifest_path('old')
+	data = lifecycle.load_manifest('old')
+	data['updated'] = time.time() - 2 * 86400
+	manifest.write_text(json.dumps(data), encoding='utf-8')
+
+	assert manager._sweep_locked() == 1
+	assert _files('old') == []
+	assert index.document_version('old') is None
+	assert len(_files('new')) == 6
+
+
+def test_sweep_yields_while_another_process_holds_the_lock(setup):
+	fcntl = pytest.importorskip('fcntl')
+	manager, index, dedup, cache = setup
+	_store('old', index, dedup, cache)
+	manifest = lifecycle.manifest_path('old')
+	data = lifecycle.load_manifest('old')
+	data['updated'] = 0
+	manifest.write_text(json.dumps(data), encoding='utf-8')
+
+	with open(lifecycle.PROCESSED_DIR / '.sweep.lock', 'a+b') as held:
+		fcntl.flock(held.fileno(), fcntl.LOCK_EX)
+		assert manager._sweep_locked() == 0
+		assert len(_files('old')) == 6
+		fcntl.flock(held.fileno(), fcntl.LOCK_UN)
+	assert manager._sweep_locked() == 1
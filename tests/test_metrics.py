@@ -0,0 +1,44 @@
+import pytest
+
+from app.services import metrics
+from app.services.metrics import MetricsRegistry
+
+
+def test_histograms_are_cumulative_and_labels_escaped():
+	registry = MetricsRegistry(buckets=(0.1, 1.0))
+	registry.describe('stage_seconds', 'histogram', 'Stage time.')
+	for value in (0.05, 0.5, 0.5, 3.0):
+		registry.observe('stage_seconds', value, stage='ocr')
+	registry.inc('errors_total', stage='say "hi"\n')
+	registry.register_collector(lambda: [('queue_depth', 'gauge', 'Queued jobs.', {'lane': 'upload'}, 3)])
+	registry.register_collector(lambda: 1 / 0)
+
+	lines = registry.render().splitlines()
+	assert lines[lines.index('# TYPE stage_seconds histogram') + 1:] == [
+		'stage_seconds_bucket{stage="ocr",le="0.1"} 1',
+		'stage_seconds_bucket{stage="ocr",le="1.0"} 3',
+		'stage_seconds_bucket{stage="ocr",le="+Inf"} 4',
+		'stage_seconds_sum{stage="ocr"} 4.05',
+		'stage_seconds_count{stage="ocr"} 4',
+	]
+	assert 'errors_total{stage="say \\"hi\\"\\n"} 1' in lines
+	assert '# TYPE queue_depth gauge' in lines and 'queue_depth{lane="upload"} 3' in lines
+
+
+@pytest.mark.skipif(not metrics.ENABLED, reason='METRICS_ENABLED=0')
+def test_timed_stages_count_errors_and_requests_are_exported(client):
+	@metrics.timed('test.stage')
+	def stage(fail):
+		if fail:
+			raise ValueError('boom')
+		return 'ok'
+
+	assert stage(False) == 'ok'
+	with pytest.raises(ValueError):
+		stage(True)
+	client.get('/health')
+
+	body = client.get('/metrics').get_data(as_text=True)
+	assert 'ldd_stage_seconds_count{stage="test.stage"} ' in body
+	assert 'ldd_stage_errors_total{stage="test.stage"} ' in body
+	assert 'ldd_requests_total{endpoint="health",status="200"} ' in body
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip('numpy')
+from PIL import Image, ImageDraw, ImageFont
+
+from app.services import preprocess
+
+
+def _page(width, angle=0.0):
+	"""A page of evenly spaced text lines, optionally scanned at an angle."""
+	image = Image.new('L', (width, int(width * 1.3)), 255)
+	draw = ImageDraw.Draw(image)
+	font = ImageFont.load_default(size=width // 48)
+	for n in range(18):
+		draw.text((width // 12, width // 10 + n * width // 20),
+			f"The tenant shall pay rent monthly and keep the premises in good repair {n}", fill=0, font=font)
+	return image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255) if angle else image
+
+
+@pytest.mark.parametrize('angle', [3.0, -4.0])
+def test_skewed_page_keeps_its_line_height(angle):
+	straight = preprocess.choose_page_dpi(_page(850))
+	assert abs(preprocess.choose_page_dpi(_page(850, angle)) - straight) <= 25
+
+	page = preprocess.prepare_page(_page(1200, angle), rescale=True)
+	line_px = preprocess.line_height(preprocess.ink_mask(preprocess._gray(page)))
+	assert 0.8 * preprocess.OCR_TARGET_LINE_PX <= line_px <= 1.25 * preprocess.OCR_TARGET_LINE_PX
+
+
+def test_pdf_pages_are_rendered_once_at_their_scan_resolution(tmp_path, monkeypatch):
+	from app.services import ocr
+
+	scan = tmp_path / 'scan.pdf'
+	_page(850).save(scan, resolution=200.0)
+	assert [round(dpi) for dpi in ocr.pdf_image_dpis(str(scan))] == [200]
+
+	renders, ocr_sizes = [], []
+
+	def render(path, number, dpi, **kwargs):
+		renders.append((number, dpi))
+		return _page(850 * dpi // 200)
+
+	monkeypatch.setattr(ocr, 'pdf_page_count', lambda path, **kwargs: 2)
+	monkeypatch.setattr(ocr, 'pdf_image_dpis', lambda path: [200.0, None])
+	monkeypatch.setattr(ocr, 'render_pdf_page', render)
+	monkeypatch.setattr(ocr, 'ocr_image', lambda page: ocr_sizes.append(page.size) or 'text')
+
+	assert ocr._ocr_pdf_pages(str(scan), {}) == ['text', 'text']
+	assert renders == [(1, 200), (2, preprocess.OCR_MAX_DPI)]
+	# Both renders are resized to the same line height, whatever they were rendered at
+	assert abs(ocr_sizes[0][0] - ocr_sizes[1][0]) <= 0.1 * ocr_sizes[0][0]
@@ -0,0 +1,7 @@
+def test_profile_secret_is_accepted_only_in_the_header(client, monkeypatch):
+	from app.services import profiler
+	monkeypatch.setattr(profiler, 'PROFILE_SECRET', 'sesame')
+
+	assert client.get('/admin/profiles?__profile=sesame').status_code == 404
+	assert client.get('/admin/profiles', headers={'X-Profile': 'wrong'}).status_code == 404
+	assert client.get('/admin/profiles', headers={'X-Profile': 'sesame'}).status_code == 200
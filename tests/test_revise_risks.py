@@ -0,0 +1,58 @@
+from app.services.revisions import align_clauses, carry_over_risks
+
+
+CLAUSES = [
+	"The Tenant shall indemnify the Landlord against all claims arising from use of the premises.",
+	"Rent of 1,000 dollars is payable on the first day of each month by bank transfer.",
+	"Any dispute shall be resolved by binding arbitration in the county where the premises are located.",
+]
+
+
+def _document(clauses):
+	return '\n'.join(f"{n}. {clause}" for n, clause in enumerate(clauses, 1))
+
+
+def _risks_for(text):
+	risks = [
+		{'risk_level': 'High', 'risk_percent': 90, 'description': f"Risk in: {clause[:20]}", 'labels': ['High risk'],
+		 'preview': clause}
+		for clause in CLAUSES if clause in text
+	]
+	if 'MODIFIED' in text:
+		risks.append({'risk_level': 'Medium', 'risk_percent': 60, 'description': 'Rent went up', 'labels': ['Medium risk'],
+			'preview': 'Rent went up'})
+	return risks
+
+
+def test_carry_over_drops_risks_of_edited_clauses():
+	edited = list(CLAUSES)
+	edited[1] = edited[1].replace('1,000', '1,500')
+	changes = align_clauses(CLAUSES, edited)
+	risks = [
+		{'clause_index': 0, 'score': 3, 'labels': ['Indemnification obligations'], 'preview': CLAUSES[0]},
+		{'risk_level': 'Medium', 'description': 'Rent', 'labels': [], 'preview': CLAUSES[1]},
+		{'risk_level': 'Low', 'description': 'General concern about the document', 'labels': []},
+	]
+	kept = carry_over_risks(risks, changes, CLAUSES)
+	assert [r['labels'] for r in kept] == [['Indemnification obligations'], []]
+	assert kept[0]['clause_index'] == 0
+	assert carry_over_risks(risks, changes, CLAUSES, keep_untied=False) == kept[:1]
+
+
+def test_revising_one_clause_keeps_other_risks(routes, client, summarizer):
+	summarizer.risks_for = _risks_for
+
+	response = client.post('/process_text', data={'raw_text': _document(CLAUSES)})
+	assert response.status_code == 200
+	doc_id = next(iter(routes.get_dedup_index()._conn().execute('SELECT doc_id FROM documents')))[0]
+	assert len(routes.get_dedup_index().get_document(doc_id)['risks']) == 3
+
+	revised = list(CLAUSES)
+	revised[1] = revised[1].replace('1,000', '1,500')
+	response = client.post(f'/revise/{doc_id}', data={'raw_text': _document(revised)})
+	assert response.status_code == 200
+
+	# Only the edited clause went back to the model, and the untouched clauses kept their risks
+	assert 'MODIFIED' in summarizer.risk_calls[-1] and CLAUSES[0] not in summarizer.risk_calls[-1]
+	previews = [r['preview'] for r in routes.get_dedup_index().get_document(doc_id)['risks']]
+	assert previews == [CLAUSES[0], CLAUSES[2], 'Rent went up']
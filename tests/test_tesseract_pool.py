@@ -0,0 +1,97 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from app.services import tesseract_pool
+from app.services.tesseract_pool import TesseractPool, create_tesseract_pool
+
+
+class FakeEngine:
+	created = []
+
+	def __init__(self, lang, path=None):
+		self.lang = lang
+		self.path = path
+		self.cleared = 0
+		self.ended = False
+		self.image = None
+		FakeEngine.created.append(self)
+
+	def SetImageBytes(self, data, width, height, bytes_per_pixel, bytes_per_line):
+		self.image = (len(data), width, height, bytes_per_pixel, bytes_per_line)
+
+	def GetUTF8Text(self):
+		time.sleep(0.01)
+		return 'page text'
+
+	def Clear(self):
+		self.cleared += 1
+
+	def End(self):
+		self.ended = True
+
+
+def _failing_for_missing(init):
+	def start(self, lang, path=None):
+		if lang == 'missing':
+			raise RuntimeError('Failed loading language')
+		init(self, lang, path)
+	return start
+
+
+@pytest.fixture
+def fake_tesserocr(monkeypatch):
+	FakeEngine.created = []
+	monkeypatch.setattr(FakeEngine, '__init__', FakeEngine.__init__)
+	monkeypatch.setattr(tesseract_pool, 'tesserocr', SimpleNamespace(PyTessBaseAPI=FakeEngine))
+	return FakeEngine
+
+
+def test_engines_are_capped_and_reused_across_threads(fake_tesserocr):
+	pool = TesseractPool(size=2, tessdata='/opt/tessdata')
+	image = Image.new('RGB', (30, 20), 'white')
+	results = []
+	threads = [threading.Thread(target=lambda: results.append(pool.image_to_string(image))) for _ in range(12)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+
+	assert results == ['page text'] * 12
+	assert len(fake_tesserocr.created) == 2
+	engine = fake_tesserocr.created[0]
+	assert (engine.lang, engine.path) == ('eng', '/opt/tessdata')
+	# Pages are handed over as one byte per pixel grayscale
+	assert engine.image == (600, 30, 20, 1, 30)
+	assert sum(e.cleared for e in fake_tesserocr.created) == 12
+
+	pool.close()
+	assert all(e.ended for e in fake_tesserocr.created)
+
+
+def test_failed_engine_start_frees_its_slot(fake_tesserocr):
+	pool = TesseractPool(size=1)
+	pool.lang = 'missing'
+	fake_tesserocr.__init__ = _failing_for_missing(fake_tesserocr.__init__)
+	with pytest.raises(RuntimeError):
+		with pool.engine():
+			pass
+	pool.lang = 'eng'
+	with pool.engine() as api:
+		assert api.lang == 'eng'
+
+
+def test_backend_selection(fake_tesserocr, monkeypatch):
+	monkeypatch.setenv('TESSERACT_BACKEND', 'pytesseract')
+	assert create_tesseract_pool() is None
+	monkeypatch.setenv('TESSERACT_BACKEND', 'auto')
+	monkeypatch.setenv('OCR_ENGINES', '3')
+	monkeypatch.setenv('TESSERACT_LANG', 'eng+fra')
+	pool = create_tesseract_pool()
+	assert (pool.size, pool.lang) == (3, 'eng+fra')
+	monkeypatch.setattr(tesseract_pool, 'tesserocr', None)
+	monkeypatch.setenv('TESSERACT_BACKEND', 'tesserocr')
+	assert create_tesseract_pool() is None
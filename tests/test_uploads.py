@@ -0,0 +1,49 @@
+import hashlib
+import io
+
+from flask import Flask, request
+from werkzeug.datastructures import FileStorage
+
+from app.services import uploads
+from app.services.uploads import HashingSpoolFile, StreamingRequest, store_upload
+
+PAYLOAD = b'%PDF-1.4 lease ' * 200_000
+
+
+def test_multipart_parts_are_spooled_hashed_and_renamed(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	app = Flask(__name__)
+	app.request_class = StreamingRequest
+	stored = {}
+
+	@app.post('/upload')
+	def upload():
+		stream = request.files['document'].stream
+		stored['spooled'] = isinstance(stream, HashingSpoolFile)
+		stored['result'] = store_upload(request.files['document'], uploads.UPLOAD_DIR / 'lease.pdf')
+		# Never committed, so it must be deleted with the request
+		stored['other'] = request.files['other'].stream.path
+		return ''
+
+	response = app.test_client().post('/upload', content_type='multipart/form-data', data={
+		'document': (io.BytesIO(PAYLOAD), 'lease.pdf'),
+		'other': (io.BytesIO(b'unused'), 'other.txt'),
+	})
+
+	assert response.status_code == 200
+	assert stored['spooled']
+	path, sha256, size = stored['result']
+	assert path.read_bytes() == PAYLOAD
+	assert (sha256, size) == (hashlib.sha256(PAYLOAD).hexdigest(), len(PAYLOAD))
+	assert not stored['other'].exists()
+	assert list(uploads.INCOMING_DIR.iterdir()) == []
+
+
+def test_plain_streams_are_copied_in_chunks(tmp_path, monkeypatch):
+	monkeypatch.setattr(uploads, 'CHUNK_SIZE', 4096)
+	file = FileStorage(io.BytesIO(PAYLOAD), filename='lease.pdf')
+
+	path, sha256, size = store_upload(file, tmp_path / 'nested' / 'lease.pdf')
+
+	assert path.read_bytes() == PAYLOAD
+	assert (sha256, size) == (hashlib.sha256(PAYLOAD).hexdigest(), len(PAYLOAD))
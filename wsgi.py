@@ -0,0 +1,5 @@
+from app import create_app
+
+
+# Warm-up and retention threads are started per worker by gunicorn.conf.py after the fork
+app = create_app(start_background=False)